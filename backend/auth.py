@@ -2,15 +2,18 @@ import os
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 # --- NEW TOP-LEVEL IMPORTS ---
 import models # Import models module at the top
-from database import get_db # Import get_db dependency function at the top
+from database import get_async_db, get_db # Async endpoints authenticate on get_async_db, sync endpoints on get_db
 # --- END NEW IMPORTS ---
 
 # --- Configuration ---
@@ -18,6 +21,8 @@ from database import get_db # Import get_db dependency function at the top
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256") # Default algorithm if not set
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")) # Default 30 mins
+# Comma-separated user IDs allowed to call the /admin/ endpoints
+ADMIN_USER_IDS = {int(uid) for uid in os.getenv("ADMIN_USER_IDS", "").split(",") if uid.strip()}
 
 if SECRET_KEY is None:
     # In production, this should absolutely be set. For local dev, provide a fallback ONLY if needed.
@@ -28,6 +33,10 @@ if SECRET_KEY is None:
 # Password Hashing Setup (Using Argon2 first, fallback to bcrypt)
 pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
 
+# Stored instead of a real hash for accounts that must not log in with a password
+# (e.g. bulk-seeded MovieLens users). It is not a valid hash, so nothing verifies against it.
+LOGIN_DISABLED_HASH = "!login-disabled"
+
 # OAuth2 Scheme Setup (Defines how clients send the token)
 # tokenUrl="token" means the client should POST to the /token endpoint to get a token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -36,6 +45,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def verify_password(plain_password, hashed_password):
     """Checks if the plain password matches the stored hash."""
+    if hashed_password == LOGIN_DISABLED_HASH:
+        return False
     try:
         return pwd_context.verify(plain_password, hashed_password)
     except Exception as e:
@@ -68,37 +79,52 @@ class TokenData(BaseModel): # Now BaseModel is defined via import
     user_id: Optional[int] = None # Changed from username to user_id for DB lookup
 
 # --- Dependency Functions (Used by API endpoints) ---
-
-# MODIFICATION: Changed Depends("database.get_db") to Depends(get_db)
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """
-    Dependency to get the current user from the token.
-    Decodes token, validates user_id, fetches user from DB.
-    """
-    # REMOVED: Local imports are no longer needed here
-    # import models
-    # from database import get_db
-
-    credentials_exception = HTTPException(
+# Two families, one per session type, so a request only ever draws on one
+# connection pool: async endpoints use get_current_*_user (AsyncSession from
+# get_async_db), sync endpoints use get_current_*_user_sync, which loads the user
+# through the same get_db session the endpoint itself receives (FastAPI resolves
+# a dependency once per request), so auth and handler share one connection.
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _token_user_id(token: str) -> int:
+    """Decodes the token and returns its user id, raising 401 if it is invalid."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id_str: str = payload.get("sub") # "sub" is the standard claim for subject (user identifier)
         if user_id_str is None:
-            raise credentials_exception
+            raise _credentials_exception()
         token_data = TokenData(user_id=int(user_id_str)) # Validate and convert user_id
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
     except (ValueError, TypeError): # Handle case where user_id isn't an int
-         raise credentials_exception
+         raise _credentials_exception()
+    return token_data.user_id
+
 
-    # Use the models module imported at the top level
-    user = db.query(models.User).filter(models.User.id == token_data.user_id).first()
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """
+    Dependency to get the current user from the token.
+    Decodes token, validates user_id, fetches user from DB.
+    """
+    user = await db.get(models.User, _token_user_id(token))
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return user
+
+
+def get_current_user_sync(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """get_current_user for sync endpoints: the user is loaded through the endpoint's own get_db session."""
+    user = db.get(models.User, _token_user_id(token))
+    if user is None:
+        raise _credentials_exception()
+    db.expunge(user) # Detached, so the endpoint's commits do not expire it and force a reload
     return user
 
 # MODIFICATION: Imported models at top, so type hint models.User should work directly
@@ -111,19 +137,38 @@ async def get_current_active_user(current_user: models.User = Depends(get_curren
     #     raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+def get_current_active_user_sync(current_user: models.User = Depends(get_current_user_sync)):
+    """get_current_active_user for sync endpoints."""
+    return current_user
+
+def _require_admin(current_user: models.User) -> models.User:
+    if current_user.id not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
+
+async def get_current_admin_user(current_user: models.User = Depends(get_current_active_user)):
+    """
+    Dependency for admin-only endpoints.
+    A user is an admin if their ID is listed in the ADMIN_USER_IDS environment variable.
+    """
+    return _require_admin(current_user)
+
+def get_current_admin_user_sync(current_user: models.User = Depends(get_current_active_user_sync)):
+    """get_current_admin_user for sync endpoints."""
+    return _require_admin(current_user)
+
 # --- Authentication Logic ---
 
-# MODIFICATION: Removed local import models
-def authenticate_user(db: Session, email: str, password: str) -> Optional[models.User]:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[models.User]:
     """
     Authenticates a user by email and password.
     Returns the user object if authentication succeeds, otherwise returns None.
     """
-    # Use the models module imported at the top level
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = (await db.execute(select(models.User).where(models.User.email == email))).scalars().first()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    # Password hashing is deliberately slow; keep it off the event loop
+    if not await run_in_threadpool(verify_password, password, user.hashed_password):
         return None
     return user
 
@@ -0,0 +1,109 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine, text
+from database import engine
+from migrations import MODEL_INDEXES, run_migrations
+
+# --- Index Benchmark ---
+# Prints the query plan and median latency of the hot rating/watchlist queries,
+# first with the indexes from MODEL_INDEXES and then without them. The schema is
+# left unchanged: on PostgreSQL the "without" run drops the indexes inside a
+# transaction that is rolled back (DROP INDEX locks the tables until then, so run
+# this against a copy or a quiet database); on SQLite it runs on a temporary copy
+# made with VACUUM INTO, because pysqlite commits DDL immediately.
+#
+#   python benchmark_indexes.py [--repeat 20]
+
+QUERIES = {
+    "rating count of a user": "SELECT count(*) FROM ratings WHERE user_id = :user_id",
+    "ratings of a user": "SELECT movie_id, score FROM ratings WHERE user_id = :user_id",
+    "top-rated movie of a user": "SELECT movie_id FROM ratings WHERE user_id = :user_id ORDER BY score DESC, id LIMIT 1",
+    "ratings of a movie": "SELECT count(*), avg(score) FROM ratings WHERE movie_id = :movie_id",
+    "popularity aggregate": "SELECT movie_id, count(id), sum(score) FROM ratings GROUP BY movie_id",
+    "watchlist of a user": "SELECT id, movie_id, added_at FROM watchlist_items WHERE user_id = :user_id ORDER BY added_at DESC",
+}
+
+
+def explain(conn, sql: str, params: dict) -> list:
+    if engine.dialect.name == "postgresql":
+        rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params)
+        return [row[0] for row in rows]
+    rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)
+    return [row[-1] for row in rows]
+
+
+def median_ms(conn, sql: str, params: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(text(sql), params).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def sample_params(conn) -> dict:
+    """The user with the most ratings (worst case) and the most-rated movie."""
+    user_id = conn.execute(text("SELECT user_id FROM ratings GROUP BY user_id ORDER BY count(*) DESC LIMIT 1")).scalar()
+    movie_id = conn.execute(text("SELECT movie_id FROM ratings GROUP BY movie_id ORDER BY count(*) DESC LIMIT 1")).scalar()
+    return {"user_id": user_id or 0, "movie_id": movie_id or 0}
+
+
+def report(conn, label: str, params: dict, repeat: int):
+    print(f"\n=== {label} ===")
+    for name, sql in QUERIES.items():
+        elapsed = median_ms(conn, sql, params, repeat)
+        print(f"\n-- {name}: {elapsed:.2f} ms (median of {repeat})")
+        for line in explain(conn, sql, params):
+            print(f"   {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query plans and timings for the rating/watchlist indexes.")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per query for the median timing")
+    args = parser.parse_args()
+
+    run_migrations(engine) # Make sure the indexes exist for the "with" run
+    print(f"Database: {engine.dialect.name}")
+    with engine.connect() as conn:
+        params = sample_params(conn)
+        print(f"Sample user_id={params['user_id']}, movie_id={params['movie_id']}")
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+        else:
+            conn.execute(text("ANALYZE ratings"))
+            conn.execute(text("ANALYZE watchlist_items"))
+        conn.commit()
+
+        report(conn, "With indexes", params, args.repeat)
+        conn.rollback()
+
+        if engine.dialect.name == "postgresql":
+            try:
+                for name in MODEL_INDEXES:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                report(conn, "Without indexes", params, args.repeat)
+            finally:
+                conn.rollback() # Restores the dropped indexes
+            return
+
+    with tempfile.TemporaryDirectory() as directory:
+        copy_path = os.path.join(directory, "benchmark.db")
+        with engine.connect() as conn:
+            conn.execute(text("VACUUM INTO :path"), {"path": copy_path})
+        copy_engine = create_engine(f"sqlite:///{copy_path}")
+        try:
+            with copy_engine.connect() as conn:
+                for name in MODEL_INDEXES:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                conn.execute(text("ANALYZE"))
+                conn.commit()
+                report(conn, "Without indexes", params, args.repeat)
+        finally:
+            copy_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
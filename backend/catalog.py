@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional
+import models
+import model_store
+
+# --- Configuration ---
+# Every movie row held in memory as a compact record, keyed by id, together with
+# its MovieResponse JSON, so movie details, existence checks and recommendation
+# hydration do not query the database. The catalog barely changes after seeding.
+# It is reloaded when:
+#   - the version file at CATALOG_VERSION_PATH changes (notify_catalog_changed(),
+#     called by the seeder and the admin movie endpoint, from any process);
+#   - the movies table's (count, max id) signature changes, checked at most every
+#     CATALOG_REFRESH_SECONDS as a safety net for writes that did not notify.
+# Ids missing from the catalog are read through from the database.
+# The version file is also what the other movie-derived caches (search and genre
+# indexes, content index, popularity rows) key on through version_tag(), so one
+# notification reaches all of them in every worker.
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+CATALOG_READ_BATCH_SIZE = 500 # Ids per read-through query for movies missing from the catalog
+CATALOG_VERSION_PATH = os.getenv("CATALOG_VERSION_PATH", os.path.join(model_store.MODEL_ARTIFACT_DIR, "catalog", "VERSION"))
+
+
+class MovieRecord:
+    """One movie row plus its pre-serialized MovieResponse JSON."""
+    __slots__ = ("id", "title", "description", "release_year", "genres", "poster_url", "json")
+
+    def __init__(self, id: int, title: str, description: Optional[str], release_year: Optional[int],
+                 genres: Optional[str], poster_url: Optional[str]):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.release_year = release_year
+        self.genres = genres
+        self.poster_url = poster_url
+        # Same bytes as MovieResponse.model_dump_json(): field order, compact separators, raw UTF-8
+        self.json = json.dumps(
+            {"title": title, "description": description, "release_year": release_year,
+             "genres": genres, "poster_url": poster_url, "id": id},
+            separators=(",", ":"), ensure_ascii=False,
+        ).encode("utf-8")
+
+    @classmethod
+    def from_row(cls, row) -> "MovieRecord":
+        return cls(row["id"], row["title"], row["description"], row["release_year"], row["genres"], row["poster_url"])
+
+
+@dataclass
+class MovieCatalog:
+    movies: Dict[int, MovieRecord]  # movie id -> record
+    signature: tuple                # (movie count, max movie id) when loaded
+    version: Optional[tuple]        # Version file identity when loaded (None if there was none)
+    checked_at: float               # time.monotonic() of the last signature check
+
+    def get_many(self, movie_ids: Iterable[int]) -> List[MovieRecord]:
+        """Records for the ids, in the given order; unknown ids are skipped."""
+        return [self.movies[movie_id] for movie_id in movie_ids if movie_id in self.movies]
+
+
+movie_catalog: Optional[MovieCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+# --- Change Notification ---
+
+def _current_version() -> Optional[tuple]:
+    """Identity of the version file; a stat call, cheap enough for every lookup."""
+    try:
+        stat = os.stat(CATALOG_VERSION_PATH)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+def version_tag() -> str:
+    """The current catalog version as a string ("" before the first notification)."""
+    version = _current_version()
+    return f"{version[0]}-{version[1]}" if version is not None else ""
+
+
+def notify_catalog_changed():
+    """Tells every process serving the catalog to reload it. Call after changing movies."""
+    global movie_catalog
+    os.makedirs(os.path.dirname(CATALOG_VERSION_PATH), exist_ok=True)
+    temp_path = f"{CATALOG_VERSION_PATH}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as version_file:
+        version_file.write(f"{time.time_ns()} {os.getpid()}\n")
+    os.replace(temp_path, CATALOG_VERSION_PATH) # New inode, so readers always see a new version
+    movie_catalog = None
+
+
+# --- Loading ---
+
+def _catalog_signature(db: Session) -> tuple:
+    count, max_id = db.execute(select(func.count(models.Movie.id), func.max(models.Movie.id))).one()
+    return (count, max_id)
+
+
+def load_catalog(db: Session, signature: tuple, version: Optional[tuple]) -> MovieCatalog:
+    table = models.Movie.__table__
+    movies = {row["id"]: MovieRecord.from_row(row) for row in db.execute(select(table)).mappings()}
+    return MovieCatalog(movies, signature, version, time.monotonic())
+
+
+def get_catalog(db: Session) -> MovieCatalog:
+    """The in-memory catalog, reloaded if it was notified of a change or the movies table changed."""
+    global movie_catalog
+    version = _current_version()
+    catalog = movie_catalog
+    if catalog is not None and catalog.version == version and time.monotonic() - catalog.checked_at < CATALOG_REFRESH_SECONDS:
+        return catalog
+    with _catalog_lock:
+        catalog = movie_catalog
+        if catalog is not None and catalog.version == version:
+            if time.monotonic() - catalog.checked_at < CATALOG_REFRESH_SECONDS:
+                return catalog
+            signature = _catalog_signature(db)
+            if catalog.signature == signature:
+                catalog.checked_at = time.monotonic()
+                return catalog
+        else:
+            signature = _catalog_signature(db)
+        start_time = time.time()
+        catalog = load_catalog(db, signature, version)
+        movie_catalog = catalog
+        print(f"Catalog: Loaded {len(catalog.movies)} movies in {time.time() - start_time:.2f} seconds.") # Keep essential status messages
+        return catalog
+
+
+def get_loaded_movie(movie_id: int) -> Optional[MovieRecord]:
+    """
+    The movie from the loaded catalog if that is current, without touching the
+    database or taking a lock (safe on the event loop). None means "ask get_movie".
+    """
+    catalog = movie_catalog
+    if catalog is None or catalog.version != _current_version() or time.monotonic() - catalog.checked_at >= CATALOG_REFRESH_SECONDS:
+        return None
+    return catalog.movies.get(movie_id)
+
+
+def get_movie(db: Session, movie_id: int) -> Optional[MovieRecord]:
+    """One movie from the catalog, read through from the database if it is not loaded (None if it does not exist)."""
+    catalog = get_catalog(db)
+    record = catalog.movies.get(movie_id)
+    if record is None:
+        table = models.Movie.__table__
+        row = db.execute(select(table).where(table.c.id == movie_id)).mappings().first()
+        if row is not None:
+            record = MovieRecord.from_row(row)
+            catalog.movies[movie_id] = record
+    return record
+
+
+def get_movies(db: Session, movie_ids: Iterable[int]) -> Dict[int, MovieRecord]:
+    """
+    Several movies from the catalog; the ones that are not loaded are read through
+    in one query per CATALOG_READ_BATCH_SIZE ids. Ids that do not exist are left out.
+    """
+    catalog = get_catalog(db)
+    movie_ids = list(dict.fromkeys(movie_ids))
+    records = {movie_id: catalog.movies[movie_id] for movie_id in movie_ids if movie_id in catalog.movies}
+    missing = [movie_id for movie_id in movie_ids if movie_id not in records]
+    table = models.Movie.__table__
+    for start in range(0, len(missing), CATALOG_READ_BATCH_SIZE):
+        for row in db.execute(select(table).where(table.c.id.in_(missing[start:start + CATALOG_READ_BATCH_SIZE]))).mappings():
+            record = MovieRecord.from_row(row)
+            catalog.movies[record.id] = record
+            records[record.id] = record
+    return records
+
+
+def invalidate_catalog():
+    """Forces the next lookup in this process to reload the catalog."""
+    global movie_catalog
+    movie_catalog = None
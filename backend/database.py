@@ -1,5 +1,13 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv # Import load_dotenv
@@ -26,22 +34,146 @@ if DATABASE_URL is None:
 
 print(f"DATABASE_URL loaded: {'postgresql://.../...@...' if DATABASE_URL.startswith('postgresql') else DATABASE_URL}") # Mask credentials in log
 
+# --- Engine Configuration ---
+# Connection pool (applies to the sync and the async engine, each has its own pool):
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))               # Connections kept open
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))        # Extra connections allowed under load
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))      # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))      # Reconnect after this many seconds (-1: never)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"     # Test connections on checkout (drops dead ones)
+# PostgreSQL: per-statement limit in milliseconds (0: none)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+# SQLite pragmas, set on every new connection (empty value: leave SQLite's default)
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),      # Readers do not block the writer
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),     # Safe with WAL, far fewer fsyncs than FULL
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-65536"),       # Negative: KiB, so 64 MiB per connection
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),  # Wait this long for a lock instead of failing
+}
+# A checkout that starts while every connection is in use and the overflow is exhausted,
+# and takes longer than this, counts as a wait in the pool stats. Opening a new
+# connection is counted separately (connects), not as a wait.
+DB_POOL_WAIT_THRESHOLD_SECONDS = float(os.getenv("DB_POOL_WAIT_THRESHOLD_SECONDS", "0.001"))
+
+
+class PoolStats:
+    """Checkout counters for one engine's pool (see pool_statistics)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_checkout(self, elapsed: float, at_capacity: bool, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            if at_capacity and elapsed > DB_POOL_WAIT_THRESHOLD_SECONDS:
+                self.waits += 1
+                self.wait_seconds += elapsed
+                self.max_wait_seconds = max(self.max_wait_seconds, elapsed)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds, 6),
+                "max_wait_seconds": round(self.max_wait_seconds, 6),
+            }
+
+
+pool_stats = {"sync": PoolStats(), "async": PoolStats()}
+
+
+def _instrumented_pool(pool_class, stats: PoolStats):
+    """pool_class that times every checkout through the public Pool.connect() into stats."""
+    class InstrumentedPool(pool_class):
+        def __init__(self, *args, max_overflow: int = DB_MAX_OVERFLOW, **kwargs):
+            super().__init__(*args, max_overflow=max_overflow, **kwargs)
+            self.max_overflow_limit = max_overflow
+
+        def at_capacity(self) -> bool:
+            """No idle connection and no overflow left: a checkout has to wait for a return."""
+            return self.max_overflow_limit >= 0 and self.checkedin() == 0 and self.overflow() >= self.max_overflow_limit
+
+        def connect(self):
+            at_capacity = self.at_capacity()
+            start = time.perf_counter()
+            try:
+                connection = super().connect()
+            except exc.TimeoutError:
+                stats.record_checkout(time.perf_counter() - start, at_capacity=True, timed_out=True)
+                raise
+            stats.record_checkout(time.perf_counter() - start, at_capacity)
+            return connection
+    InstrumentedPool.__name__ = InstrumentedPool.__qualname__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
+
+
+def _count_connects(engine, stats: PoolStats):
+    event.listen(engine, "connect", lambda dbapi_connection, connection_record: stats.record_connect())
+
+
+def _engine_options(kind: str, pool_class) -> dict:
+    """create_engine keyword arguments for the "sync" or "async" engine."""
+    options = {}
+    if DATABASE_URL.startswith("sqlite") and make_url(DATABASE_URL).database in (None, "", ":memory:"):
+        return options # In-memory SQLite keeps SQLAlchemy's single-connection pool
+    options.update(
+        poolclass=_instrumented_pool(pool_class, pool_stats[kind]),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    if DATABASE_URL.startswith("postgresql") and DB_STATEMENT_TIMEOUT_MS > 0:
+        if kind == "async":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}} # asyncpg
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"} # libpq
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        if value:
+            cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
 # --- SQLAlchemy Engine Setup ---
 # Note: connect_args={"check_same_thread": False} is ONLY for SQLite. Remove it for PostgreSQL.
 if DATABASE_URL.startswith("postgresql"):
-    # For PostgreSQL, no extra connect_args needed typically
-    engine = create_engine(DATABASE_URL)
-    print("Connecting to PostgreSQL database.")
+    engine = create_engine(DATABASE_URL, **_engine_options("sync", QueuePool))
+    print(f"Connecting to PostgreSQL database (pool size {DB_POOL_SIZE}, max overflow {DB_MAX_OVERFLOW}).")
 elif DATABASE_URL.startswith("sqlite"):
     # Handle SQLite connection if used as a fallback (ensure path is correct relative to project root)
     # The path in .env should be relative like 'sqlite:///movies.db'
     # db_path = os.path.join(os.path.dirname(__file__), '..', DATABASE_URL.split("///")[1]) # Path relative to root
     # engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
     # Simpler if DATABASE_URL is just `sqlite:///movies.db` and run from root:
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, **_engine_options("sync", QueuePool))
+    event.listen(engine, "connect", _set_sqlite_pragmas)
     print(f"Connecting to SQLite database at: {DATABASE_URL}")
 else:
     raise ValueError(f"Unsupported database type in DATABASE_URL: {DATABASE_URL}")
+_count_connects(engine, pool_stats["sync"])
 
 
 # SessionLocal is used to create database sessions
@@ -57,4 +189,91 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --- Async Engine ---
+# Read-heavy endpoints use an AsyncSession on the same database, so a request
+# waiting on a query does not hold a worker thread: asyncpg for PostgreSQL,
+# aiosqlite for SQLite. Sync helpers can run on it through AsyncSession.run_sync.
+def _async_database_url(url: str) -> URL:
+    if url.startswith("postgresql"):
+        async_url = make_url(url).set(drivername="postgresql+asyncpg")
+        query = dict(async_url.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode") # asyncpg spells libpq's sslmode as ssl
+        return async_url.set(query=query)
+    return make_url(url).set(drivername="sqlite+aiosqlite")
+
+
+async_engine = create_async_engine(_async_database_url(DATABASE_URL), **_engine_options("async", AsyncAdaptedQueuePool))
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+_count_connects(async_engine.sync_engine, pool_stats["async"])
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    """FastAPI dependency that provides an AsyncSession."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# --- Query Counting ---
+# Counts the SQL statements executed inside track_queries() in the current
+# context (e.g. one request), so tests and the X-DB-Query-Count header can catch
+# endpoints whose number of database round trips creeps up.
+class QueryCounter:
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
+_query_counter: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.count += 1
+
+
+event.listen(engine, "before_cursor_execute", _count_query)
+event.listen(async_engine.sync_engine, "before_cursor_execute", _count_query)
+
+
+@contextmanager
+def track_queries():
+    """Counts the statements executed in this context until exit, including threadpool work awaited from it."""
+    counter = QueryCounter()
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
+# --- Pool Statistics ---
+
+def _pool_status(pool, stats: PoolStats) -> dict:
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool): # Includes AsyncAdaptedQueuePool
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=DB_MAX_OVERFLOW,
+            timeout_seconds=DB_POOL_TIMEOUT,
+        )
+    status.update(stats.as_dict())
+    return status
+
+
+def pool_statistics() -> dict:
+    """Current pool usage and checkout counters of the sync and async engines."""
+    return {
+        "sync": _pool_status(engine.pool, pool_stats["sync"]),
+        "async": _pool_status(async_engine.sync_engine.pool, pool_stats["async"]),
+    }
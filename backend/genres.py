@@ -0,0 +1,234 @@
+import bisect
+import os
+import threading
+import time
+import numpy as np
+from dataclasses import dataclass
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import catalog
+import models
+import pagination
+
+# --- Configuration ---
+# Genres live in the genres table, linked to movies through movie_genres.
+# Genre filters are answered from a bitmap per genre, held in memory: bit i is set
+# when the movie at position i of the listing order (release_year DESC NULLS LAST,
+# title, id) has the genre, packed 8 movies per byte, so "Action and Comedy" is a
+# bitwise AND of two arrays. A filtered listing page is the next set bits of that AND
+# after the cursor's position; search results are filtered by looking up each
+# id's position. The bitmaps are rebuilt after a catalog change notification from
+# any worker, or when the movies or their links change (checked at most every
+# GENRE_INDEX_REFRESH_SECONDS).
+GENRE_INDEX_REFRESH_SECONDS = float(os.getenv("GENRE_INDEX_REFRESH_SECONDS", "60"))
+GENRE_SCAN_BYTES = 4096 # Bitmap bytes (8 listing positions each) unpacked per step of a page scan
+GENRE_BATCH_SIZE = 500 # Movie ids per DELETE ... IN (...)
+NO_GENRE_VALUES = {"", "n/a", "(no genres listed)"}
+
+
+def split_genres(value: Optional[str]) -> List[str]:
+    """'Adventure|Animation' -> ['Adventure', 'Animation']; placeholders give []."""
+    if value is None:
+        return []
+    names = [name.strip() for name in str(value).split("|")]
+    return list(dict.fromkeys(name for name in names if name.lower() not in NO_GENRE_VALUES))
+
+
+def parse_genre_filter(value: str) -> List[str]:
+    """Genre names from a filter parameter such as 'Action,Comedy' (',' or '|' separated)."""
+    return [name.strip() for name in value.replace("|", ",").split(",") if name.strip()]
+
+
+# --- Writing ---
+
+def sync_movie_genres(engine: Engine, movies: Iterable[Tuple[int, Optional[str]]]) -> int:
+    """
+    Replaces the genre links of the given (movie id, genres string) pairs,
+    creating genres that do not exist yet. Returns the number of links written.
+    """
+    movies = [(int(movie_id), value) for movie_id, value in movies]
+    if not movies:
+        return 0
+    genre_table = models.Genre.__table__
+    links_table = models.movie_genres
+    with engine.begin() as conn:
+        genre_ids = {name: genre_id for genre_id, name in conn.execute(select(genre_table.c.id, genre_table.c.name))}
+        wanted = {name for _, value in movies for name in split_genres(value)}
+        missing = sorted(wanted - genre_ids.keys())
+        if missing:
+            conn.execute(insert(genre_table), [{"name": name} for name in missing])
+            genre_ids = {name: genre_id for genre_id, name in conn.execute(select(genre_table.c.id, genre_table.c.name))}
+
+        movie_ids = [movie_id for movie_id, _ in movies]
+        for start in range(0, len(movie_ids), GENRE_BATCH_SIZE):
+            conn.execute(delete(links_table).where(links_table.c.movie_id.in_(movie_ids[start:start + GENRE_BATCH_SIZE])))
+        links = [
+            {"movie_id": movie_id, "genre_id": genre_ids[name]}
+            for movie_id, value in movies
+            for name in split_genres(value)
+        ]
+        if links:
+            conn.execute(insert(links_table), links)
+    return len(links)
+
+
+# --- Genre Bitmaps ---
+
+def _sort_key(release_year: Optional[int], title: str, movie_id: int) -> tuple:
+    """Python version of the listing order (release_year DESC NULLS LAST, title, id)."""
+    return (release_year is None, -(release_year or 0), title, movie_id)
+
+
+@dataclass
+class GenreIndex:
+    genre_ids: Dict[str, int]        # lower-cased name -> genre id
+    bitmaps: Dict[int, np.ndarray]   # genre id -> packed bits (uint8) over listing positions
+    listing_ids: np.ndarray          # int64, movie ids in listing order
+    positions: np.ndarray            # int64, movie id -> listing position (-1: no such movie)
+    listing_keys: List[tuple]        # (release_year, title) per listing position
+    signature: tuple                 # _index_signature() when built
+    version: str                     # catalog.version_tag() when built
+    checked_at: float                # time.monotonic() of the last signature check
+
+    def resolve(self, names: Sequence[str]) -> Optional[List[int]]:
+        """Genre ids for the names (case-insensitive), or None if any name is unknown."""
+        ids = [self.genre_ids.get(name.lower()) for name in names]
+        return None if any(genre_id is None for genre_id in ids) else ids
+
+    def _intersection(self, genre_ids: Sequence[int]) -> np.ndarray:
+        return np.bitwise_and.reduce([self.bitmaps[genre_id] for genre_id in genre_ids])
+
+    def filter(self, movie_ids: Sequence[int], names: Sequence[str]) -> List[int]:
+        """The given movie ids (order kept) that have every one of the genres; no genres keeps them all."""
+        if not names:
+            return list(movie_ids)
+        genre_ids = self.resolve(names)
+        if genre_ids is None:
+            return []
+        return self.filter_by_ids(movie_ids, genre_ids)
+
+    def filter_by_ids(self, movie_ids: Sequence[int], genre_ids: Sequence[int]) -> List[int]:
+        """filter() for already resolved genre ids."""
+        if not genre_ids:
+            return list(movie_ids)
+        ids = np.asarray(movie_ids, dtype=np.int64)
+        position = np.full(ids.size, -1, dtype=np.int64)
+        in_range = (ids >= 0) & (ids < self.positions.size)
+        position[in_range] = self.positions[ids[in_range]]
+        known = position >= 0
+        keep = np.zeros(ids.size, dtype=bool)
+        bits = self._intersection(genre_ids)
+        candidate = position[known]
+        keep[known] = ((bits[candidate >> 3] >> (7 - (candidate & 7))) & 1) == 1 # packbits is big-endian within a byte
+        return ids[keep].tolist()
+
+    def _position_after(self, after: pagination.MovieSortKey) -> int:
+        """The first listing position after a cursor's sort key."""
+        release_year, title, movie_id = after
+        if 0 <= movie_id < self.positions.size:
+            position = int(self.positions[movie_id])
+            if position >= 0 and self.listing_keys[position] == (release_year, title):
+                return position + 1
+        # The cursor's movie was deleted or edited since: place its old key among the current ones
+        target = _sort_key(release_year, title, movie_id)
+        return bisect.bisect_right(range(len(self.listing_keys)), target,
+                                   key=lambda position: _sort_key(*self.listing_keys[position], int(self.listing_ids[position])))
+
+    def listing_page(self, genre_ids: Sequence[int], after: Optional[pagination.MovieSortKey], skip: int, limit: int) -> List[int]:
+        """
+        Ids of the movies that have every one of genre_ids, in listing order: `limit` of them
+        after the cursor's sort key, or after skipping `skip` of them when there is no cursor.
+        """
+        if limit <= 0:
+            return []
+        start = self._position_after(after) if after is not None else 0
+        skip = 0 if after is not None else max(skip, 0)
+        bits = self._intersection(genre_ids)
+        wanted = skip + limit
+        found: List[np.ndarray] = []
+        n_found = 0
+        # Scan the AND of the bitmaps from the start position until the page is filled
+        for byte_start in range(start >> 3, bits.size, GENRE_SCAN_BYTES):
+            hits = np.flatnonzero(np.unpackbits(bits[byte_start:byte_start + GENRE_SCAN_BYTES])) + byte_start * 8
+            hits = hits[hits >= start]
+            found.append(hits)
+            n_found += hits.size
+            if n_found >= wanted:
+                break
+        positions = np.concatenate(found)[skip:wanted] if found else np.empty(0, dtype=np.int64)
+        return self.listing_ids[positions].tolist()
+
+
+genre_index: Optional[GenreIndex] = None
+_genre_index_lock = threading.Lock()
+
+
+def _index_signature(db: Session) -> tuple:
+    """(link count, max linked movie id, movie count, max movie id) in one round trip."""
+    links = models.movie_genres
+    movie = models.Movie
+    return tuple(db.execute(select(
+        select(func.count()).select_from(links).scalar_subquery(),
+        select(func.max(links.c.movie_id)).scalar_subquery(),
+        select(func.count(movie.id)).scalar_subquery(),
+        select(func.max(movie.id)).scalar_subquery(),
+    )).one())
+
+
+def build_genre_index(db: Session, signature: tuple, version: str = "") -> GenreIndex:
+    genre_table = models.Genre.__table__
+    links = models.movie_genres
+    movie = models.Movie
+    genre_ids = {name.lower(): genre_id for genre_id, name in db.execute(select(genre_table.c.id, genre_table.c.name))}
+    listing = db.execute(
+        select(movie.id, movie.release_year, movie.title)
+        .order_by(movie.release_year.desc().nullslast(), movie.title, movie.id)
+    ).all()
+    listing_ids = np.array([row[0] for row in listing], dtype=np.int64)
+    listing_keys = [(row[1], row[2]) for row in listing]
+    positions = np.full(int(listing_ids.max()) + 1 if listing_ids.size else 0, -1, dtype=np.int64)
+    positions[listing_ids] = np.arange(listing_ids.size)
+
+    # Plain tuples: NumPy converts Row objects through the slow generic sequence path
+    rows = np.array([tuple(row) for row in db.execute(select(links.c.genre_id, links.c.movie_id))], dtype=np.int64).reshape(-1, 2)
+    rows = rows[rows[:, 1] < positions.size]
+    rows = np.column_stack((rows[:, 0], positions[rows[:, 1]]))
+    rows = rows[rows[:, 1] >= 0] # Links of movies that are gone
+    bitmaps = {}
+    for genre_id in genre_ids.values():
+        bits = np.zeros(listing_ids.size, dtype=bool)
+        bits[rows[rows[:, 0] == genre_id, 1]] = True
+        bitmaps[genre_id] = np.packbits(bits)
+    return GenreIndex(genre_ids, bitmaps, listing_ids, positions, listing_keys, signature, version, time.monotonic())
+
+
+def get_genre_index(db: Session) -> GenreIndex:
+    """The genre bitmaps, rebuilt after a catalog change notification or if the movies or their genre links changed."""
+    global genre_index
+    version = catalog.version_tag()
+    index = genre_index
+    if index is not None and index.version == version and time.monotonic() - index.checked_at < GENRE_INDEX_REFRESH_SECONDS:
+        return index
+    with _genre_index_lock:
+        index = genre_index
+        if index is not None and index.version == version:
+            if time.monotonic() - index.checked_at < GENRE_INDEX_REFRESH_SECONDS:
+                return index
+            signature = _index_signature(db)
+            if index.signature == signature:
+                index.checked_at = time.monotonic()
+                return index
+        else:
+            signature = _index_signature(db)
+        index = build_genre_index(db, signature, version)
+        genre_index = index
+        print(f"Genres: Built bitmaps for {len(index.bitmaps)} genres over {index.listing_ids.size} movies.") # Keep essential status messages
+        return index
+
+
+def invalidate_genre_index():
+    """Forces the next filter in this process to rebuild (other workers follow catalog.notify_catalog_changed)."""
+    global genre_index
+    genre_index = None
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+# --- Load Test ---
+# Fires concurrent requests at a running API and reports latency percentiles and
+# throughput per endpoint. To compare two versions of the server, start both (one
+# uvicorn worker each, same database) and pass the second one as --compare-url; each
+# endpoint is then run against both, one after the other, and printed side by side:
+#
+#   uvicorn main:app --port 8000                       # e.g. the new version
+#   (cd ../old/backend && uvicorn main:app --port 8001) # e.g. a checkout of the old one
+#   python load_test.py --url http://localhost:8000 --compare-url http://localhost:8001 \
+#       --user-id 1 --concurrency 50 --requests 2000
+#
+# --user-id mints an access token with this process's SECRET_KEY (it must match
+# the server's); alternatively pass a token from POST /token/ with --token.
+DEFAULT_ENDPOINTS = ["/movies/1", "/movies/?limit=50", "/movies/?search=star&limit=20", "/users/me/ratings", "/recommendations/"]
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_endpoint(client: httpx.AsyncClient, path: str, total: int, concurrency: int, headers: dict) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining: # Shared iterator: workers take requests until all are sent
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "path": path,
+        "requests": total,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1] if latencies else float("nan"),
+        "mean_ms": statistics.fmean(latencies) if latencies else float("nan"),
+        "requests_per_second": total / elapsed if elapsed > 0 else float("nan"),
+    }
+
+
+async def main_async(args):
+    headers = {}
+    token = args.token
+    if token is None and args.user_id is not None:
+        import auth # Needs the same environment (DATABASE_URL, SECRET_KEY) as the server
+        token = auth.create_access_token({"sub": str(args.user_id)})
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    urls = [args.url] + ([args.compare_url] if args.compare_url else [])
+    clients = [httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) for url in urls]
+    try:
+        print(f"{' vs '.join(urls)}: {args.requests} requests per endpoint, {args.concurrency} concurrent")
+        columns = f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'req/s':>8} {'errors':>7}"
+        print(f"{'endpoint':<36} " + " | ".join([columns] * len(urls)))
+        for path in args.endpoints or DEFAULT_ENDPOINTS:
+            results = []
+            for client in clients:
+                await run_endpoint(client, path, min(args.concurrency, args.requests), args.concurrency, headers) # Warm-up
+                results.append(await run_endpoint(client, path, args.requests, args.concurrency, headers))
+            print(f"{path:<36} " + " | ".join(
+                f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['max_ms']:>8.1f} "
+                f"{result['requests_per_second']:>8.1f} {result['errors']:>7}"
+                for result in results
+            ))
+    finally:
+        for client in clients:
+            await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent latency test against a running API.")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--compare-url", help="Second server to run the same requests against, printed side by side")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--token", help="Bearer token for authenticated endpoints")
+    parser.add_argument("--user-id", type=int, help="Mint a token for this user id instead of passing --token")
+    parser.add_argument("endpoints", nargs="*", help=f"Paths to test (default: {' '.join(DEFAULT_ENDPOINTS)})")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,37 @@
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, Query, BackgroundTasks, status
+from fastapi import FastAPI, Depends, HTTPException, Query, BackgroundTasks, Response, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 import sqlalchemy # Import sqlalchemy for exc
-from sqlalchemy import create_engine, text # Added text
-from sqlalchemy.orm import sessionmaker, relationship, Session, joinedload # Added joinedload
+from sqlalchemy import create_engine, select, text # Added text
+from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, HttpUrl
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta, timezone # Added timezone
+import asyncio
+import contextvars
+import functools
 import os
+import subprocess
+import threading
 import time # Added time
 import sys # Added sys for exit
 
 # Use DB URL from database.py logic (reads from env var)
 # Ensure database.py loads .env correctly using load_dotenv from dotenv
-from database import DATABASE_URL, engine as db_engine, Base, SessionLocal, get_db
+from database import DATABASE_URL, engine as db_engine, Base, SessionLocal, get_db, get_async_db, track_queries, pool_statistics
 import models # Use models from models.py
 import auth # Use auth logic from auth.py
 import ml_engine # Use ML logic from ml_engine.py
+import rec_cache # Per-user recommendation result cache
+import popularity # In-memory popularity ranking for cold-start users
+import genres # Normalized genres and per-genre bitmaps
+import pagination # Keyset cursors for movie listings
+import catalog # In-memory movie records and pre-serialized JSON
+import search as movie_search # Full-text movie search (named to avoid clashing with the `search` query parameter)
+from migrations import run_migrations # Idempotent schema upgrades for existing databases
 
 # --- Pydantic Schemas (API Validation) ---
 
@@ -82,6 +96,26 @@ class WatchlistItemResponse(BaseModel):
          from_attributes = True
 
 
+class MovieUpdate(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    release_year: Optional[int] = None
+    genres: Optional[str] = None
+    poster_url: Optional[str] = None
+
+
+# --- Batch Recommendation Schemas ---
+class BatchRecommendationRequest(BaseModel):
+    user_ids: List[int]
+    num_recs: int = 12
+
+class BatchRecommendationResponse(BaseModel):
+    recommendations: Dict[int, List[int]] # user_id -> recommended movie IDs
+    users_processed: int
+    elapsed_seconds: float
+    users_per_second: float
+
+
 # --- FastAPI App ---
 print("--- Initializing FastAPI App ---")
 app = FastAPI(
@@ -96,14 +130,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"], # Keyset pagination cursor and search match count for GET /movies/
 )
 
+# --- Query Count Instrumentation ---
+# With DB_QUERY_COUNT_HEADER=1 every response carries X-DB-Query-Count, the number
+# of SQL statements the request executed, so tests can assert an endpoint's budget.
+DB_QUERY_COUNT_HEADER = os.getenv("DB_QUERY_COUNT_HEADER", "0") == "1"
+
+if DB_QUERY_COUNT_HEADER:
+    @app.middleware("http")
+    async def add_query_count_header(request, call_next):
+        with track_queries() as counter:
+            response = await call_next(request)
+        response.headers["X-DB-Query-Count"] = str(counter.count)
+        return response
+
+# --- Out-of-Process Seeding ---
+SEED_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed.py")
+
+def _wait_for_seeder(process: subprocess.Popen):
+    """Waits for the seeder process, then loads the models from the seeded data."""
+    return_code = process.wait()
+    print(f"Seeder process exited with code {return_code}.")
+    sys.stdout.flush()
+    db = SessionLocal()
+    try:
+        movie_count = db.execute(text("SELECT count(id) FROM movies")).scalar_one_or_none() or 0
+        if movie_count == 0:
+            print("Database still empty after seeding, skipping model training.")
+            return
+        ml_engine.load_or_train_collaborative_model(db)
+        ml_engine.load_or_build_content_index(db)
+        popularity.refresh_popularity_index(db)
+        print(f"Models ready after seeding {movie_count} movies.")
+    except Exception as e:
+        print(f"ERROR loading models after seeding: {e}")
+    finally:
+        db.close()
+        sys.stdout.flush()
+
+def start_seeder_process():
+    """Runs `seed.py --incremental` as a child process and loads the models when it finishes."""
+    try:
+        process = subprocess.Popen([sys.executable, SEED_SCRIPT, "--incremental"], cwd=os.path.dirname(SEED_SCRIPT))
+    except OSError as e:
+        print(f"ERROR: Could not start the seeder process: {e}")
+        return
+    print(f"Started incremental seeder (pid {process.pid}); the server stays available while it runs.")
+    threading.Thread(target=_wait_for_seeder, args=(process,), name="seeder-watch", daemon=True).start()
+
+
 # --- Startup Event ---
 @app.on_event("startup")
 def on_startup():
     """
     Check if DB is populated, train ML model.
-    TEMPORARY: Run seeder if DB is empty.
+    If the DB is empty, start the incremental seeder in a separate process.
     """
     print("Running startup event...")
     db: Optional[Session] = None # Initialize db to None
@@ -111,6 +194,7 @@ def on_startup():
         # Create tables if they don't exist
         print("Ensuring database tables exist...")
         Base.metadata.create_all(bind=db_engine)
+        run_migrations(db_engine)
         print("Tables checked/created.")
 
         db = SessionLocal() # Get a new session
@@ -123,40 +207,11 @@ def on_startup():
         if movie_count == 0:
             print("-" * 50)
             print("WARNING: Database appears to be empty.")
-            # --- TEMPORARY SEED LOGIC (UNCOMMENTED FOR RENDER SEEDING) ---
-            print("Attempting to run the seeder script...")
-            print("This will take a long time and the server will be unresponsive.")
+            # Seed in a separate process so this one keeps serving requests;
+            # models are loaded once the seeder exits.
+            start_seeder_process()
             print("-" * 50)
-            sys.stdout.flush() # Ensure messages are printed before long task
-            try:
-                # IMPORTANT: Import seeder function *inside* here
-                from seed import seed_database
-                seed_database() # Run the full seeding process
-                print("-" * 50)
-                print("Seeding process attempted. Restarting ML model training check.")
-                print("-" * 50)
-                sys.stdout.flush()
-                # Re-check count after seeding
-                # Ensure db session is still valid or get a new one if needed
-                if not db.is_active:
-                    db = SessionLocal()
-                movie_count = db.execute(movie_count_query).scalar_one_or_none() or 0
-                print(f"Movie count after seeding attempt: {movie_count}")
-
-            except ImportError:
-                print(f"\n" + "="*20 + " ERROR DURING SEEDING IMPORT " + "="*20)
-                print("Could not import the seeder function. Make sure seed.py exists.")
-                print("="*60 + "\n")
-                sys.stdout.flush()
-            except Exception as seed_error:
-                print(f"\n" + "="*20 + " ERROR DURING SEEDING EXECUTION " + "="*20)
-                print(f"An error occurred while trying to run the seeder: {seed_error}")
-                print("The database might be partially seeded or still empty.")
-                print("Please check the seeder script and logs.")
-                print("="*60 + "\n")
-                sys.stdout.flush()
-                # Allow server to continue starting even if seeding fails
-            # --- END TEMPORARY SEED LOGIC ---
+            sys.stdout.flush()
         else:
             print(f"Database already populated with {movie_count} movies.")
 
@@ -175,13 +230,22 @@ def on_startup():
             # Consider if the background task wrapper can be used even in startup.
             # For simplicity now, call directly, but be aware of timeout risks.
             try:
-                # ml_engine.train_collaborative_model_task() # Call the wrapper task - Needs careful session handling
-                ml_engine.train_collaborative_model(db) # Call directly for now
+                # Loads the saved model artifact if it is still fresh, otherwise trains and saves one
+                ml_engine.load_or_train_collaborative_model(db)
                 end_time = time.time()
-                print(f"Model training complete. Time taken: {end_time - start_time:.2f} seconds")
+                print(f"Model ready. Time taken: {end_time - start_time:.2f} seconds")
             except Exception as train_error:
                 print(f"ERROR during model training: {train_error}")
 
+            # Fit (or load) the content index once so recommendation requests only score a single row
+            try:
+                ml_engine.load_or_build_content_index(db)
+            except Exception as index_error:
+                print(f"ERROR building content index: {index_error}")
+
+            # Cold-start ranking; refreshed in the background when it gets old
+            popularity.refresh_popularity_index(db)
+
         else:
             print("Skipping model training as database is empty.")
 
@@ -210,6 +274,13 @@ def on_startup():
         sys.stdout.flush()
 
 
+@app.on_event("shutdown")
+def on_shutdown():
+    """Stop the background retraining process and the scoring threads."""
+    ml_engine.retrain_scheduler.shutdown()
+    ml_engine.scoring_executor.shutdown(wait=False)
+
+
 # --- API Endpoints ---
 
 @app.get("/", summary="Root")
@@ -267,11 +338,11 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
 @app.post("/token/", response_model=auth.Token, summary="Login and get an access token")
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Handles user login via form data and returns a JWT token."""
     print(f"Login attempt for username (email): {form_data.username}")
-    user = auth.authenticate_user(db, email=form_data.username, password=form_data.password)
+    user = await auth.authenticate_user(db, email=form_data.username, password=form_data.password)
     if not user:
         print(f"Login failed for: {form_data.username}")
         raise HTTPException(
@@ -293,44 +364,148 @@ async def read_users_me(current_user: models.User = Depends(auth.get_current_act
 
 # --- Movie Endpoints ---
 
+def list_movies(db: Session, search: Optional[str], genre: Optional[str], skip: int, limit: int,
+                after: Optional[pagination.MovieSortKey]) -> Tuple[List[MovieResponse], Optional[str], Optional[int]]:
+    """
+    One page of the movie listing, the cursor for the next page (None if this is the last)
+    and, for searches, the total number of matches.
+    """
+    query = db.query(models.Movie)
+    genre_names = genres.parse_genre_filter(genre) if genre else []
+    genre_ids = []
+    if genre_names:
+        genre_index = genres.get_genre_index(db)
+        genre_ids = genre_index.resolve(genre_names)
+        if genre_ids is None:
+            return [], None, (0 if search else None) # Unknown genre
+
+    page = movie_search.search_movies(db, search, skip, limit, genre_ids) if search else None
+    if page is not None:
+        # The search backend applied the genre filter and skip/limit; only this page's rows are loaded
+        movie_map = {movie.id: movie for movie in query.filter(models.Movie.id.in_(page.movie_ids))} if page.movie_ids else {}
+        movies = [movie_map[movie_id] for movie_id in page.movie_ids if movie_id in movie_map]
+        return [MovieResponse.model_validate(movie) for movie in movies], None, page.total
+
+    if genre_ids:
+        # The page is read off the AND of the genre bitmaps and hydrated from the in-memory catalog
+        movies = catalog.get_catalog(db).get_many(genre_index.listing_page(genre_ids, after, skip, limit))
+    elif after is not None or skip == 0:
+        movies = pagination.keyset_page(query, after, limit)
+    else:
+        query = query.order_by(models.Movie.release_year.desc().nullslast(), models.Movie.title, models.Movie.id)
+        movies = query.offset(skip).limit(limit).all()
+    next_cursor = pagination.encode_cursor(movies[-1]) if movies and len(movies) == limit else None
+    return [MovieResponse.model_validate(movie) for movie in movies], next_cursor, None
+
+
 @app.get("/movies/", response_model=List[MovieResponse], summary="Get Movies (with Search and Genre Filter)")
 def get_movies(
     search: Optional[str] = Query(None, description="Search term for movie titles"),
-    genre: Optional[str] = Query(None, description="Filter movies by genre"),
+    genre: Optional[str] = Query(None, description="Filter movies by genre; several genres separated by commas must all match"),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Continue after this cursor (from the X-Next-Cursor header); replaces skip"),
+    response: Response = None,
     db: Session = Depends(get_db)
 ):
-    """Fetches a list of movies, optionally filtered by search term or genre."""
-    try:
-        query = db.query(models.Movie)
+    """
+    Fetches a list of movies, optionally filtered by search term or genre.
+    With a search term, results come from the full-text index, best match first
+    (each word matches as a prefix, so partial words work for autocomplete);
+    `skip`/`limit` page through them and X-Total-Count reports how many match.
+    Listings without a search term return an X-Next-Cursor header when more
+    results may follow; passing it back as `cursor` fetches the next page in
+    constant time, unlike a large `skip`.
+    """
+    after = None
+    if cursor:
         if search:
-            query = query.filter(models.Movie.title.ilike(f"%{search}%"))
-        if genre:
-            if hasattr(models.Movie, 'genres'):
-                 query = query.filter(models.Movie.genres.ilike(f"%{genre}%"))
-            else:
-                 print("Warning: Movie model does not have 'genres' attribute for filtering.")
+            raise HTTPException(status_code=400, detail="cursor cannot be combined with search; use skip.")
+        try:
+            after = pagination.decode_cursor(cursor)
+        except pagination.InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        query = query.order_by(models.Movie.release_year.desc().nullslast(), models.Movie.title)
-        movies = query.offset(skip).limit(limit).all()
-        return [MovieResponse.model_validate(movie) for movie in movies]
+    try:
+        # Stays a sync endpoint (worker thread): the search and genre indexes take locks while they refresh
+        movies, next_cursor, total_count = list_movies(db, search, genre, skip, limit, after)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        if total_count is not None:
+            response.headers["X-Total-Count"] = str(total_count)
+        return movies
     except Exception as e:
          print(f"Error fetching movies: {e}")
          raise HTTPException(status_code=500, detail="Could not fetch movies.")
 
 
 @app.get("/movies/{movie_id}", response_model=MovieResponse, summary="Get Movie by ID")
-def get_movie_by_id(movie_id: int, db: Session = Depends(get_db)):
-    """Fetches details for a single movie by its ID."""
+async def get_movie_by_id(movie_id: int):
+    """Fetches details for a single movie by its ID (pre-serialized JSON from the in-memory catalog)."""
     try:
-        movie = db.query(models.Movie).filter(models.Movie.id == movie_id).first()
-        if not movie:
-            raise HTTPException(status_code=404, detail="Movie not found")
-        return MovieResponse.model_validate(movie)
+        movie = catalog.get_loaded_movie(movie_id) or await run_in_threadpool(load_movie, movie_id)
     except Exception as e:
          print(f"Error fetching movie {movie_id}: {e}")
          raise HTTPException(status_code=500, detail="Could not fetch movie details.")
+    if movie is None:
+        raise HTTPException(status_code=404, detail="Movie not found")
+    return Response(content=movie.json, media_type="application/json")
+
+
+@app.patch("/admin/movies/{movie_id}", response_model=MovieResponse, summary="Update a Movie")
+def update_movie(
+    movie_id: int,
+    changes: MovieUpdate,
+    db: Session = Depends(get_db),
+    admin_user: models.User = Depends(auth.get_current_admin_user_sync)
+):
+    """Admin only. Updates the given fields of a movie and tells every worker to reload its movie catalog."""
+    movie = db.query(models.Movie).filter(models.Movie.id == movie_id).first()
+    if not movie:
+        raise HTTPException(status_code=404, detail="Movie not found")
+    updates = changes.model_dump(exclude_unset=True)
+    if "title" in updates and not updates["title"]:
+        raise HTTPException(status_code=400, detail="title must not be empty.")
+
+    try:
+        for field, value in updates.items():
+            setattr(movie, field, value)
+        db.commit()
+        db.refresh(movie)
+        if "genres" in updates:
+            genres.sync_movie_genres(db_engine, [(movie.id, movie.genres)])
+    except Exception as e:
+        db.rollback()
+        print(f"Error updating movie {movie_id}: {e}")
+        raise HTTPException(status_code=500, detail="Error updating movie.")
+
+    # Every cache that holds movie fields. The notification bumps the catalog version that the catalog,
+    # search and genre indexes, content index and popularity rows of every worker check; the calls
+    # below only make this worker's copies current before the response goes out.
+    catalog.notify_catalog_changed()
+    movie_search.invalidate_memory_index()
+    genres.invalidate_genre_index()
+    ml_engine.invalidate_content_index()
+    popularity.refresh_top_movies(db)
+    rec_cache.recommendation_cache.invalidate_all()
+    print(f"Admin {admin_user.id} updated movie {movie_id}: {sorted(updates)}")
+    return MovieResponse.model_validate(movie)
+
+def load_movie(movie_id: int) -> Optional[catalog.MovieRecord]:
+    """catalog.get_movie with its own session, for async endpoints (call through run_in_threadpool)."""
+    db = SessionLocal()
+    try:
+        return catalog.get_movie(db, movie_id)
+    finally:
+        db.close()
+
+def load_movies(movie_ids: List[int]) -> Dict[int, catalog.MovieRecord]:
+    """catalog.get_movies with its own session, for async endpoints (call through run_in_threadpool)."""
+    db = SessionLocal()
+    try:
+        return catalog.get_movies(db, movie_ids)
+    finally:
+        db.close()
 
 # --- Rating Endpoints ---
 
@@ -339,10 +514,10 @@ def create_or_update_rating(
     rating: RatingCreate,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: models.User = Depends(auth.get_current_active_user_sync)
 ):
     """Creates a new rating or updates an existing one for the current user."""
-    movie = db.query(models.Movie).filter(models.Movie.id == rating.movie_id).first()
+    movie = catalog.get_movie(db, rating.movie_id)
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found")
 
@@ -370,8 +545,14 @@ def create_or_update_rating(
         db.commit()
         db.refresh(db_rating)
 
-        print("Rating submitted. Queuing model retrain in background.")
-        # Ensure the background task function handles its own DB session
+        # Fold the user's ratings into the live model so their next recommendations reflect this rating
+        user_ratings = db.query(models.Rating.movie_id, models.Rating.score).filter(models.Rating.user_id == current_user.id).all()
+        ml_engine.fold_in_user_ratings(current_user.id, [(movie_id, score) for movie_id, score in user_ratings])
+        # Cached results are keyed on the user's ratings, so this only frees the outdated entry early
+        rec_cache.recommendation_cache.invalidate_user(current_user.id)
+
+        print("Rating submitted. Scheduling model retrain in background.")
+        # Only marks the model stale; full retrains are debounced, rate-limited and run in a separate process
         background_tasks.add_task(ml_engine.train_collaborative_model_task)
 
         return RatingResponse.model_validate(db_rating)
@@ -387,14 +568,14 @@ def create_or_update_rating(
 
 
 @app.get("/users/me/ratings", response_model=List[RatingResponse], summary="Get current user's ratings")
-def get_user_ratings(
-    db: Session = Depends(get_db),
+async def get_user_ratings(
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """Fetches all movie ratings submitted by the currently authenticated user."""
     try:
-        ratings = db.query(models.Rating).filter(models.Rating.user_id == current_user.id).all()
-        return [RatingResponse.model_validate(rating) for rating in ratings]
+        result = await db.execute(select(models.Rating).where(models.Rating.user_id == current_user.id))
+        return [RatingResponse.model_validate(rating) for rating in result.scalars()]
     except Exception as e:
          print(f"Error fetching ratings for user {current_user.id}: {e}")
          raise HTTPException(status_code=500, detail="Could not fetch user ratings.")
@@ -402,55 +583,88 @@ def get_user_ratings(
 
 # --- Recommendation Endpoint ---
 
-@app.get("/recommendations/", response_model=List[MovieResponse], summary="Get Hybrid Recommendations")
-def get_recommendations(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
-):
+def get_popular_movies(db: Session, rated_movie_ids: set, limit: int) -> List[MovieResponse]:
     """
-    Get hybrid recommendations for the current logged-in user.
-    Uses cold-start strategy if user has few ratings.
+    Most popular movies the user has not rated, sliced from the in-memory popularity index.
+    Until the index has been built, falls back to the newest movies from the database.
     """
-    user_id = current_user.id
-    print(f"Getting recommendations for user_id: {user_id}")
+    popular_movies = popularity.get_popular_movies(limit, exclude_ids=rated_movie_ids)
+    if not popular_movies:
+        popular_movies = (
+            db.query(models.Movie)
+            .filter(models.Movie.id.notin_(rated_movie_ids))
+            .order_by(models.Movie.id.desc())
+            .limit(limit)
+            .all()
+        )
+    return [MovieResponse.model_validate(movie) for movie in popular_movies]
+
+
+async def run_in_scoring_pool(func, *args):
+    """Runs blocking ML work on ml_engine.scoring_executor, keeping this request's context (query counter)."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(ml_engine.scoring_executor, functools.partial(context.run, func, *args))
+
+
+def compute_recommendations(user_id: int, user_ratings: ml_engine.UserRatings) -> List[MovieResponse]:
+    """Scores and hydrates one user's recommendations (blocking: runs in the scoring pool)."""
+    db = SessionLocal() # Only used for periodic catalog checks and fallbacks; connects lazily
     try:
         min_ratings_for_ml = 5
-        user_rating_count = db.query(models.Rating).filter(models.Rating.user_id == user_id).count()
+        user_rating_count = len(user_ratings.movie_ids)
+        rated_movie_ids = set(user_ratings.movie_ids)
         print(f"User {user_id} has {user_rating_count} ratings.")
 
         if user_rating_count < min_ratings_for_ml:
             print(f"User {user_id} has fewer than {min_ratings_for_ml} ratings. Using cold-start (popular movies).")
-            rated_movie_ids_query = db.query(models.Rating.movie_id).filter(models.Rating.user_id == user_id)
-            rated_movie_ids = {row[0] for row in rated_movie_ids_query.all()}
             print(f"User {user_id} has rated movie IDs: {rated_movie_ids}")
 
-            popular_movies_query = (
-                db.query(models.Movie)
-                .filter(models.Movie.id.notin_(rated_movie_ids))
-                .order_by(models.Movie.id.desc())
-                .limit(20)
-            )
-            recommendations = popular_movies_query.all()
+            recommendations = get_popular_movies(db, rated_movie_ids, limit=20)
             print(f"Cold start recommendations (first few IDs): {[m.id for m in recommendations[:5]]}")
 
         else:
             print(f"User {user_id} has enough ratings. Using hybrid ML engine.")
-            recommended_movie_ids = ml_engine.get_hybrid_recommendations(user_id, db, num_recs=12)
+            recommended_movie_ids = ml_engine.get_hybrid_recommendations(user_id, db, num_recs=12, user_ratings=user_ratings)
 
             if not recommended_movie_ids:
-                 print(f"ML engine returned no recs for user {user_id}. Falling back to simple list.")
-                 rated_movie_ids_query = db.query(models.Rating.movie_id).filter(models.Rating.user_id == user_id)
-                 rated_movie_ids = {row[0] for row in rated_movie_ids_query.all()}
-                 fallback_movies = db.query(models.Movie).filter(models.Movie.id.notin_(rated_movie_ids)).order_by(models.Movie.id.desc()).limit(12).all()
-                 recommendations = fallback_movies
+                 print(f"ML engine returned no recs for user {user_id}. Falling back to popular movies.")
+                 recommendations = get_popular_movies(db, rated_movie_ids, limit=12)
             else:
-                 recommended_movies = db.query(models.Movie).filter(models.Movie.id.in_(recommended_movie_ids)).all()
-                 movie_map = {movie.id: movie for movie in recommended_movies}
-                 ordered_recs = [movie_map[movie_id] for movie_id in recommended_movie_ids if movie_id in movie_map]
-                 recommendations = ordered_recs
+                 # Hydrated from the in-memory catalog, in ranking order
+                 recommendations = catalog.get_catalog(db).get_many(recommended_movie_ids)
                  print(f"ML recommendations (first few IDs): {recommended_movie_ids[:5]}")
 
-        final_recs = [MovieResponse.model_validate(movie) for movie in recommendations[:12]]
+        return [MovieResponse.model_validate(movie) for movie in recommendations[:12]]
+    finally:
+        db.close()
+
+
+@app.get("/recommendations/", response_model=List[MovieResponse], summary="Get Hybrid Recommendations")
+async def get_recommendations(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    Get hybrid recommendations for the current logged-in user.
+    Uses cold-start strategy if user has few ratings.
+    """
+    user_id = current_user.id
+    print(f"Getting recommendations for user_id: {user_id}")
+    start_time = time.time()
+    try:
+        # One query for the count, the rated ids and the top-rated movie; scoring then runs off the event loop.
+        # run_sync executes on the event loop thread, so only code that takes no locks may go through it.
+        user_ratings = await db.run_sync(lambda session: ml_engine.get_user_ratings(user_id, session))
+
+        # Served from the cache until the model, the user's ratings or the catalog change (in any worker)
+        cache_version = (ml_engine.model_cache_key(), user_ratings.stamp, catalog.version_tag())
+        cached_recs = rec_cache.recommendation_cache.get(user_id, cache_version)
+        if cached_recs is not None:
+            print(f"Returning {len(cached_recs)} cached recommendations.")
+            return cached_recs
+
+        final_recs = await run_in_scoring_pool(compute_recommendations, user_id, user_ratings)
+        rec_cache.recommendation_cache.put(user_id, cache_version, final_recs, time.time() - start_time)
         print(f"Returning {len(final_recs)} recommendations.")
         return final_recs
 
@@ -459,16 +673,74 @@ def get_recommendations(
          raise HTTPException(status_code=500, detail="Could not generate recommendations.")
 
 
+@app.post("/admin/recommendations/batch", response_model=BatchRecommendationResponse, summary="Get Hybrid Recommendations for Many Users")
+def get_batch_recommendations(
+    request: BatchRecommendationRequest,
+    db: Session = Depends(get_db),
+    admin_user: models.User = Depends(auth.get_current_admin_user_sync)
+):
+    """
+    Admin only. Returns hybrid recommendation movie IDs for every requested user.
+    Intended for offline jobs (e.g. the nightly email); throughput is reported in users/second.
+    At most BATCH_MAX_USERS users per request; larger jobs send several requests.
+    """
+    if not request.user_ids:
+        raise HTTPException(status_code=400, detail="user_ids must not be empty.")
+    if len(request.user_ids) > ml_engine.BATCH_MAX_USERS:
+        raise HTTPException(status_code=422, detail=f"At most {ml_engine.BATCH_MAX_USERS} user_ids per request.")
+    if not (1 <= request.num_recs <= 100):
+        raise HTTPException(status_code=400, detail="num_recs must be between 1 and 100.")
+
+    try:
+        start_time = time.time()
+        recommendations = ml_engine.get_batch_hybrid_recommendations(request.user_ids, db, num_recs=request.num_recs)
+        elapsed = time.time() - start_time
+        users_per_second = len(recommendations) / elapsed if elapsed > 0 else float(len(recommendations))
+        print(f"Batch recommendations for {len(recommendations)} users in {elapsed:.2f} seconds ({users_per_second:.1f} users/second).")
+        return BatchRecommendationResponse(
+            recommendations=recommendations,
+            users_processed=len(recommendations),
+            elapsed_seconds=elapsed,
+            users_per_second=users_per_second,
+        )
+    except Exception as e:
+         print(f"Error getting batch recommendations: {e}")
+         raise HTTPException(status_code=500, detail="Could not generate batch recommendations.")
+
+
+@app.get("/admin/metrics/recommendation-cache", summary="Recommendation Cache Metrics")
+def get_recommendation_cache_metrics(admin_user: models.User = Depends(auth.get_current_admin_user)):
+    """Admin only. Hit ratio, entry count, invalidations and compute time saved by the recommendation cache."""
+    return {"model_version": ml_engine.model_version, "model_key": ml_engine.model_cache_key(), **rec_cache.recommendation_cache.stats()}
+
+
+@app.get("/admin/metrics/database", summary="Database Pool Metrics")
+def get_database_pool_metrics(admin_user: models.User = Depends(auth.get_current_admin_user)):
+    """Admin only. Checked-out connections, overflow, new connections, checkout waits and timeouts of the sync and async connection pools."""
+    return pool_statistics()
+
+
 # --- Watchlist Endpoints ---
 
+def watchlist_item_response(item: models.WatchlistItem, movie: catalog.MovieRecord) -> WatchlistItemResponse:
+    """Watchlist item with its movie taken from the catalog instead of a joined load."""
+    return WatchlistItemResponse(
+        id=item.id,
+        user_id=item.user_id,
+        movie_id=item.movie_id,
+        added_at=item.added_at,
+        movie=MovieResponse.model_validate(movie),
+    )
+
+
 @app.post("/watchlist/", response_model=WatchlistItemResponse, status_code=status.HTTP_201_CREATED, summary="Add movie to watchlist")
 def add_to_watchlist(
     item: WatchlistItemCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: models.User = Depends(auth.get_current_active_user_sync)
 ):
     """Adds a movie to the currently authenticated user's watchlist."""
-    movie = db.query(models.Movie).filter(models.Movie.id == item.movie_id).first()
+    movie = catalog.get_movie(db, item.movie_id)
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found")
 
@@ -477,29 +749,23 @@ def add_to_watchlist(
         models.WatchlistItem.movie_id == item.movie_id
     ).first()
     if existing_item:
-        existing_item_with_movie = db.query(models.WatchlistItem).options(
-            joinedload(models.WatchlistItem.movie)
-        ).filter(models.WatchlistItem.id == existing_item.id).one()
-        return WatchlistItemResponse.model_validate(existing_item_with_movie)
+        return watchlist_item_response(existing_item, movie)
 
     db_item = models.WatchlistItem(user_id=current_user.id, movie_id=item.movie_id, added_at=datetime.now(timezone.utc))
     try:
         db.add(db_item)
         db.commit()
         db.refresh(db_item)
-        db_item_with_movie = db.query(models.WatchlistItem).options(
-            joinedload(models.WatchlistItem.movie)
-        ).filter(models.WatchlistItem.id == db_item.id).one()
-        return WatchlistItemResponse.model_validate(db_item_with_movie)
+        return watchlist_item_response(db_item, movie)
     except sqlalchemy.exc.IntegrityError as e:
          db.rollback()
          print(f"Watchlist add IntegrityError: {e}")
          existing_item = db.query(models.WatchlistItem).filter(
              models.WatchlistItem.user_id == current_user.id,
              models.WatchlistItem.movie_id == item.movie_id
-         ).options(joinedload(models.WatchlistItem.movie)).first()
+         ).first()
          if existing_item:
-              return WatchlistItemResponse.model_validate(existing_item)
+              return watchlist_item_response(existing_item, movie)
          else:
              raise HTTPException(status_code=500, detail="Database error adding to watchlist.")
     except Exception as e:
@@ -512,7 +778,7 @@ def add_to_watchlist(
 def remove_from_watchlist(
     movie_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: models.User = Depends(auth.get_current_active_user_sync)
 ):
     """Removes a movie from the currently authenticated user's watchlist."""
     item = db.query(models.WatchlistItem).filter(
@@ -534,20 +800,24 @@ def remove_from_watchlist(
 
 
 @app.get("/users/me/watchlist", response_model=List[WatchlistItemResponse], summary="Get current user's watchlist")
-def get_user_watchlist(
-    db: Session = Depends(get_db),
+async def get_user_watchlist(
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """Fetches all movies in the currently authenticated user's watchlist."""
     try:
-        watchlist_items = (
-            db.query(models.WatchlistItem)
-            .options(joinedload(models.WatchlistItem.movie))
-            .filter(models.WatchlistItem.user_id == current_user.id)
+        result = await db.execute(
+            select(models.WatchlistItem)
+            .where(models.WatchlistItem.user_id == current_user.id)
             .order_by(models.WatchlistItem.added_at.desc())
-            .all()
         )
-        return [WatchlistItemResponse.model_validate(item) for item in watchlist_items]
+        watchlist_items = result.scalars().all()
+        movies = {item.movie_id: catalog.get_loaded_movie(item.movie_id) for item in watchlist_items}
+        missing = [movie_id for movie_id, movie in movies.items() if movie is None]
+        if missing:
+            # One session and one batched read-through for every movie the loaded catalog could not answer
+            movies.update(await run_in_threadpool(load_movies, missing))
+        return [watchlist_item_response(item, movies[item.movie_id]) for item in watchlist_items if movies.get(item.movie_id) is not None]
     except Exception as e:
          print(f"Error fetching watchlist for user {current_user.id}: {e}")
          raise HTTPException(status_code=500, detail="Could not fetch watchlist.")
@@ -0,0 +1,171 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from genres import sync_movie_genres
+import models
+
+# --- Schema Migrations ---
+# Base.metadata.create_all only creates missing tables, so databases created by
+# an older version of the app need their existing tables brought up to date.
+# Every step checks the live schema first and does nothing if it is already
+# applied, so run_migrations is safe to call on every startup.
+
+
+def _column_names(engine: Engine, table: str) -> set:
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+
+def add_rating_timestamp(engine: Engine) -> bool:
+    """ratings.rated_at: when the rating was made (MovieLens timestamp for seeded rows)."""
+    if "rated_at" in _column_names(engine, "ratings"):
+        return False
+    column_type = "TIMESTAMP WITH TIME ZONE" if engine.dialect.name == "postgresql" else "DATETIME"
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE ratings ADD COLUMN rated_at {column_type}"))
+    return True
+
+
+def backfill_rating_timestamps(engine: Engine) -> bool:
+    """
+    ratings.rated_at for rows stored without one: rows older than the column, and ratings
+    written on a migrated database before the model had a client-side default. They get
+    the migration time, the age popularity.py already assumed for them. PostgreSQL also
+    gets the column default create_all declares; once it has it the backfill is done
+    (SQLite cannot change a column default, so the NULL check runs every time there).
+    """
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            column = next(column for column in inspect(conn).get_columns("ratings") if column["name"] == "rated_at")
+            if column.get("default") is not None:
+                return False
+            conn.execute(text("ALTER TABLE ratings ALTER COLUMN rated_at SET DEFAULT now()"))
+            conn.execute(text("UPDATE ratings SET rated_at = now() WHERE rated_at IS NULL"))
+            return True
+        return conn.execute(text("UPDATE ratings SET rated_at = CURRENT_TIMESTAMP WHERE rated_at IS NULL")).rowcount > 0
+
+
+# --- Movie Search Index ---
+# PostgreSQL: a generated tsvector column over the title with a GIN index.
+# SQLite: an external-content FTS5 table kept in sync by triggers.
+# If neither can be created, search.py falls back to an in-memory inverted index.
+MOVIE_FTS_TABLE = "movies_fts"
+
+
+def add_movie_search_index(engine: Engine) -> bool:
+    """Full-text index over movie titles for search.py (dialect specific)."""
+    if engine.dialect.name == "postgresql":
+        if "search_vector" in _column_names(engine, "movies"):
+            return False
+        with engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE movies ADD COLUMN search_vector tsvector "
+                "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(title, ''))) STORED"
+            ))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_movies_search_vector ON movies USING GIN (search_vector)"))
+        return True
+
+    if engine.dialect.name == "sqlite":
+        if MOVIE_FTS_TABLE in inspect(engine).get_table_names():
+            return False
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {MOVIE_FTS_TABLE} USING fts5("
+                    "title, content='movies', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER {MOVIE_FTS_TABLE}_ai AFTER INSERT ON movies BEGIN "
+                    f"INSERT INTO {MOVIE_FTS_TABLE}(rowid, title) VALUES (new.id, new.title); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER {MOVIE_FTS_TABLE}_ad AFTER DELETE ON movies BEGIN "
+                    f"INSERT INTO {MOVIE_FTS_TABLE}({MOVIE_FTS_TABLE}, rowid, title) VALUES ('delete', old.id, old.title); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER {MOVIE_FTS_TABLE}_au AFTER UPDATE OF title ON movies BEGIN "
+                    f"INSERT INTO {MOVIE_FTS_TABLE}({MOVIE_FTS_TABLE}, rowid, title) VALUES ('delete', old.id, old.title); "
+                    f"INSERT INTO {MOVIE_FTS_TABLE}(rowid, title) VALUES (new.id, new.title); END"
+                ))
+                # Index the rows that already exist
+                conn.execute(text(f"INSERT INTO {MOVIE_FTS_TABLE}({MOVIE_FTS_TABLE}) VALUES ('rebuild')"))
+        except Exception as e:
+            print(f"SQLite FTS5 unavailable ({e}), movie search will use the in-memory index.") # Keep essential warnings
+            return False
+        return True
+
+    return False
+
+
+def drop_movie_search_index(engine: Engine):
+    """
+    Removes the SQLite FTS5 table and its triggers. Must run before reflecting
+    and dropping all tables, because FTS5 shadow tables cannot be dropped directly.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        for suffix in ("ai", "ad", "au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {MOVIE_FTS_TABLE}_{suffix}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {MOVIE_FTS_TABLE}"))
+
+
+def populate_movie_genres(engine: Engine) -> bool:
+    """Fills genres/movie_genres (created by create_all) from the pipe-delimited movies.genres strings."""
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT 1 FROM movie_genres LIMIT 1")).first() is not None:
+            return False
+        movies = conn.execute(text("SELECT id, genres FROM movies WHERE genres IS NOT NULL")).all()
+    if not movies:
+        return False
+    return sync_movie_genres(engine, movies) > 0
+
+
+def add_movie_listing_index(engine: Engine) -> bool:
+    """Composite index matching the movie listing order, for keyset pagination (pagination.py)."""
+    if "ix_movies_listing" in {index["name"] for index in inspect(engine).get_indexes("movies")}:
+        return False
+    nulls_last = " NULLS LAST" if engine.dialect.name == "postgresql" else "" # SQLite sorts NULLs last in DESC order already
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_movies_listing ON movies (release_year DESC{nulls_last}, title, id)"))
+    return True
+
+
+# Indexes declared on the models; create_all only adds them to new tables
+MODEL_INDEXES = [
+    "ix_ratings_user_id_score",
+    "ix_ratings_movie_id",
+    "ix_watchlist_items_user_id_added_at",
+]
+
+
+def add_model_indexes(engine: Engine) -> bool:
+    """Creates the MODEL_INDEXES that an existing database is missing."""
+    inspector = inspect(engine)
+    created = False
+    for table in (models.Rating.__table__, models.WatchlistItem.__table__):
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in MODEL_INDEXES and index.name not in existing:
+                index.create(engine)
+                created = True
+    return created
+
+
+MIGRATIONS = [
+    ("add_rating_timestamp", add_rating_timestamp),
+    ("backfill_rating_timestamps", backfill_rating_timestamps),
+    ("add_movie_search_index", add_movie_search_index),
+    ("populate_movie_genres", populate_movie_genres),
+    ("add_movie_listing_index", add_movie_listing_index),
+    ("add_model_indexes", add_model_indexes),
+]
+
+
+def run_migrations(engine: Engine):
+    """Applies every migration step that the database still needs."""
+    for name, migrate in MIGRATIONS:
+        try:
+            if migrate(engine):
+                print(f"Migration applied: {name}") # Keep essential status messages
+        except Exception as e:
+            print(f"ERROR applying migration {name}: {e}") # Keep essential errors
+            raise
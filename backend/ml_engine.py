@@ -1,58 +1,247 @@
-import pandas as pd
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from surprise import Dataset, Reader, SVD
+from surprise import SVD
 from surprise.model_selection import train_test_split
 import models # <-- Absolute import
-from typing import List
+import model_store # Versioned on-disk model artifacts
+import catalog # Catalog version, bumped whenever movie fields are edited
+from rating_store import RatingStore, build_rating_store
+from training_snapshot import export_ratings_snapshot, load_ratings_snapshot
+import rec_cache # Cleared whenever a new model is published
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import multiprocessing
+import os
+import threading
 import time # For potential rate limiting if needed in future API calls
 import traceback # Keep traceback for error reporting
 
-# --- Content-Based Filtering ---
+# --- Content Index ---
+# The TF-IDF matrix is fitted once per catalog version and kept in memory. The
+# version combines the movies table's (count, max id) with catalog.version_tag(),
+# so in-place edits (which keep count and max id) also lead to a rebuild.
+# TfidfVectorizer L2-normalises each row, so the cosine similarity between two
+# movies is just the dot product of their rows.
 
-def get_content_recommendations(movie_id: int, db: Session, num_recs: int = 10) -> List[int]:
+@dataclass
+class ContentIndex:
+    """Fitted TF-IDF matrix over the movie catalog, one row per movie."""
+    movie_ids: np.ndarray            # row -> movie id
+    id_to_row: Dict[int, int]        # movie id -> row
+    tfidf_matrix: sparse.csr_matrix  # (n_movies, n_terms), L2-normalised rows
+    signature: Tuple[int, int, str]  # (movie count, max movie id, catalog version) at build time
+    neighbor_rows: Optional[np.ndarray] = None   # (n_movies, K) int32, see compute_similarity_table
+    neighbor_scores: Optional[np.ndarray] = None # (n_movies, K) float32
+
+
+content_index: Optional[ContentIndex] = None
+_content_index_lock = threading.Lock()
+CONTENT_INDEX_CHECK_SECONDS = float(os.getenv("CONTENT_INDEX_CHECK_SECONDS", "60")) # How often requests re-check the catalog signature
+_content_index_checked_at = 0.0
+
+
+def _catalog_signature(db: Session) -> Tuple[int, int, str]:
+    """Cheap fingerprint of the movies table and catalog version used to detect catalog changes."""
+    version = catalog.version_tag() # Read first: an edit committed meanwhile then still forces a rebuild later
+    count, max_id = db.query(func.count(models.Movie.id), func.max(models.Movie.id)).one()
+    return (int(count or 0), int(max_id or 0), version)
+
+
+def build_content_index(db: Session) -> Optional[ContentIndex]:
     """
-    Generates content-based recommendations for a given movie.
-    Based on movie 'genres' and 'description'.
+    Fits the TF-IDF matrix over the whole catalog and publishes it as the current index.
+    Based on movie 'title', 'genres' and 'description'.
     """
-    try:
-        movies = db.query(models.Movie).all()
-        if not movies:
-            return []
+    global content_index
+    start_time = time.time()
+    signature = _catalog_signature(db)
+    rows = (
+        db.query(models.Movie.id, models.Movie.title, models.Movie.genres, models.Movie.description)
+        .order_by(models.Movie.id)
+        .all()
+    )
+    if not rows:
+        print("Content-Based: No movies found in DB to build index.") # Keep essential warnings
+        content_index = None
+        return None
+
+    movie_ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+    text_features = [
+        f"{row.title or ''} {row.genres or ''} {row.description or ''}".strip()
+        for row in rows
+    ]
+
+    tfidf = TfidfVectorizer(stop_words='english')
+    tfidf_matrix = tfidf.fit_transform(text_features).tocsr()
+
+    index = ContentIndex(
+        movie_ids=movie_ids,
+        id_to_row={int(movie_id): row for row, movie_id in enumerate(movie_ids)},
+        tfidf_matrix=tfidf_matrix,
+        signature=signature,
+    )
+    content_index = index
+    print(f"Content index built for {len(movie_ids)} movies in {time.time() - start_time:.2f} seconds") # Keep essential status messages
+    build_similarity_table_in_background(index)
+    return index
+
+
+def get_content_index(db: Session) -> Optional[ContentIndex]:
+    """
+    Returns the current content index, rebuilding it only if the catalog changed.
+    A catalog change notification is seen immediately; the movies table itself is
+    checked at most every CONTENT_INDEX_CHECK_SECONDS.
+    """
+    global content_index, _content_index_checked_at
+    index = content_index
+    if (index is not None and index.signature[2] == catalog.version_tag()
+            and time.monotonic() - _content_index_checked_at < CONTENT_INDEX_CHECK_SECONDS):
+        return index
+    signature = _catalog_signature(db)
+    _content_index_checked_at = time.monotonic()
+    if index is not None and index.signature == signature:
+        return index
+    with _content_index_lock:
+        # Another request may have rebuilt the index while we waited for the lock
+        index = content_index
+        if index is not None and index.signature == signature:
+            return index
+        # Another worker may already have published an index for this catalog
+        index = load_content_artifact(signature)
+        if index is not None:
+            content_index = index
+            return index
+        return build_content_index(db)
+
+
+def invalidate_content_index():
+    """
+    Drops this process's content index so the next lookup rebuilds it. Call after
+    catalog.notify_catalog_changed(), which makes other workers rebuild theirs.
+    """
+    global content_index
+    content_index = None
 
-        movie_data = []
-        for movie in movies:
-            text_features = f"{movie.title or ''} {movie.genres or ''} {movie.description or ''}"
-            movie_data.append({
-                'id': movie.id,
-                'text_features': text_features.strip()
-            })
 
-        df = pd.DataFrame(movie_data)
+def _top_n_indices(scores: np.ndarray, n: int) -> np.ndarray:
+    """
+    Indices of the n highest scores, best first.
+    Ties are broken by the lower index, like a stable descending sort.
+    """
+    n = min(n, scores.size)
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    kth_score = -np.partition(-scores, n - 1)[n - 1]
+    above = np.flatnonzero(scores > kth_score)
+    ties = np.flatnonzero(scores == kth_score)[:n - above.size]
+    candidates = np.concatenate([above, ties])
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+# --- Similar-Movie Table ---
+# Top-K neighbours for every movie, computed offline in row blocks so that peak
+# memory is bounded by SIMILARITY_CHUNK_SIZE x n_movies, not n_movies x n_movies.
+
+SIMILARITY_TOP_K = int(os.getenv("SIMILARITY_TOP_K", "50"))
+SIMILARITY_CHUNK_SIZE = int(os.getenv("SIMILARITY_CHUNK_SIZE", "512"))
 
-        if movie_id not in df['id'].values:
-            print(f"Content-Based: Movie ID {movie_id} not found.") # Keep essential warnings
-            return []
 
+def compute_similarity_table(tfidf_matrix: sparse.csr_matrix, top_k: int = SIMILARITY_TOP_K,
+                             chunk_size: int = SIMILARITY_CHUNK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (neighbor_rows, neighbor_scores), both shaped (n_movies, top_k).
+    Row i lists the rows most similar to movie i, best first, excluding i itself.
+    """
+    n_movies = tfidf_matrix.shape[0]
+    top_k = max(0, min(top_k, n_movies - 1))
+    neighbor_rows = np.zeros((n_movies, top_k), dtype=np.int32)
+    neighbor_scores = np.zeros((n_movies, top_k), dtype=np.float32)
+    matrix_t = tfidf_matrix.T.tocsc()
+
+    for start in range(0, n_movies, chunk_size):
+        end = min(start + chunk_size, n_movies)
+        block = tfidf_matrix[start:end].dot(matrix_t).toarray()
+        block[np.arange(end - start), np.arange(start, end)] = -1.0 # Exclude each movie itself
+        for offset, row_scores in enumerate(block):
+            top_rows = _top_n_indices(row_scores, top_k)
+            neighbor_rows[start + offset] = top_rows
+            neighbor_scores[start + offset] = row_scores[top_rows]
+
+    return neighbor_rows, neighbor_scores
+
+
+def build_similarity_table(index: ContentIndex) -> ContentIndex:
+    """
+    Computes the top-K table for an index and publishes a copy of the index carrying it.
+    Runs off the request path; lookups fall back to single-row scoring until it lands.
+    """
+    global content_index
+    start_time = time.time()
+    neighbor_rows, neighbor_scores = compute_similarity_table(index.tfidf_matrix)
+    with_table = replace(index, neighbor_rows=neighbor_rows, neighbor_scores=neighbor_scores)
+    # Only publish if the catalog was not rebuilt while we were computing
+    with _content_index_lock:
+        published = content_index is index
+        if published:
+            content_index = with_table
+    print(f"Similarity table ({neighbor_rows.shape[1]} neighbours per movie) built in {time.time() - start_time:.2f} seconds") # Keep essential status messages
+    if published:
+        save_content_artifact(with_table)
+    return with_table
+
+
+def build_similarity_table_in_background(index: ContentIndex) -> threading.Thread:
+    """Starts the top-K job on a daemon thread so callers are not blocked."""
+    def _run():
         try:
-            idx = df.index[df['id'] == movie_id].tolist()[0]
-        except IndexError:
-             print(f"Content-Based: Could not find index for movie_id {movie_id}.") # Keep essential warnings
-             return []
-
-        tfidf = TfidfVectorizer(stop_words='english')
-        df['text_features'] = df['text_features'].fillna('')
-        tfidf_matrix = tfidf.fit_transform(df['text_features'])
-        cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
-
-        sim_scores = list(enumerate(cosine_sim[idx]))
-        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-        sim_scores = sim_scores[1:num_recs+1]
-        movie_indices = [i[0] for i in sim_scores]
-        recommended_movie_ids = df['id'].iloc[movie_indices].tolist()
+            build_similarity_table(index)
+        except Exception as e:
+            print(f"Content-Based: Error building similarity table: {e}") # Keep essential errors
+            traceback.print_exc()
 
-        return recommended_movie_ids
+    thread = threading.Thread(target=_run, name="similarity-table", daemon=True)
+    thread.start()
+    return thread
+
+
+# --- Content-Based Filtering ---
+
+def _content_neighbors(index: ContentIndex, movie_id: int, num_recs: int) -> List[int]:
+    """Most similar movie ids for one movie of the index, best first."""
+    idx = index.id_to_row.get(movie_id)
+    if idx is None:
+        print(f"Content-Based: Movie ID {movie_id} not found.") # Keep essential warnings
+        return []
+
+    if index.neighbor_rows is not None and num_recs <= index.neighbor_rows.shape[1]:
+        # O(K) read from the precomputed table
+        top_rows = index.neighbor_rows[idx, :num_recs]
+    else:
+        sim_scores = index.tfidf_matrix.dot(index.tfidf_matrix[idx].T).toarray().ravel()
+        sim_scores[idx] = -1.0 # Never recommend the query movie itself
+        top_rows = _top_n_indices(sim_scores, min(num_recs, sim_scores.size - 1))
+
+    return [int(movie_id) for movie_id in index.movie_ids[top_rows]]
+
+
+def get_content_recommendations(movie_id: int, db: Session, num_recs: int = 10) -> List[int]:
+    """
+    Generates content-based recommendations for a given movie.
+    Reads the precomputed top-K table, or scores only the query movie's row
+    against the cached TF-IDF matrix if the table is not ready yet.
+    """
+    try:
+        index = get_content_index(db)
+        if index is None:
+            return []
+        return _content_neighbors(index, movie_id, num_recs)
 
     except Exception as e:
         print(f"Content-Based: Error during recommendations: {e}")
@@ -62,93 +251,231 @@ def get_content_recommendations(movie_id: int, db: Session, num_recs: int = 10)
 
 # --- Collaborative Filtering ---
 
-svd_algo = None
+RATING_SCALE = (0.5, 5.0)
 
-def train_collaborative_model(db: Session):
+
+@dataclass
+class CollaborativeModel:
+    """
+    Plain NumPy copy of a fitted SVD, so all items can be scored for a user in one product.
+    Inner ids are the row numbers of the factor arrays and match the rating store's.
+    """
+    global_mean: float
+    user_factors: np.ndarray    # pu, (n_users, n_factors)
+    item_factors: np.ndarray    # qi, (n_items, n_factors)
+    user_biases: np.ndarray     # bu, (n_users,)
+    item_biases: np.ndarray     # bi, (n_items,)
+    ratings: RatingStore        # The ratings the model was trained on
+    rating_scale: Tuple[float, float] = RATING_SCALE
+    artifact_version: Optional[str] = None # model_store version the arrays are mapped from
+    snapshot_at: Optional[float] = None    # time.time() when the training ratings were read
+    # user_id -> (UserRatings.stamp, UserProfile) folded in since this model was trained
+    folded_users: Dict[int, Tuple[str, "UserProfile"]] = field(default_factory=dict)
+
+    @property
+    def raw_item_ids(self) -> np.ndarray:
+        """Inner item id -> movie id."""
+        return self.ratings.raw_item_ids
+
+    @property
+    def ratings_count(self) -> int:
+        return self.ratings.n_ratings
+
+
+# (user factors, user bias, inner ids of the items the user rated)
+UserProfile = Tuple[np.ndarray, float, np.ndarray]
+
+
+collab_model: Optional[CollaborativeModel] = None
+model_version = 0 # Bumped every time a new collaborative model is published (in this process)
+_publish_lock = threading.Lock()
+
+
+def model_cache_key() -> str:
     """
-    Trains the SVD collaborative filtering model on all ratings in the DB.
+    Identifies the published collaborative model in cache keys, the same way in
+    every process: its artifact version. A model that could not be saved only
+    exists in this process and gets a key no other process can produce.
+    """
+    model = collab_model
+    if model is None:
+        return "none"
+    if model.artifact_version is not None:
+        return model.artifact_version
+    return f"unsaved-{os.getpid()}-{model_version}"
+
+
+def fit_collaborative_model(db: Session) -> Optional[CollaborativeModel]:
+    """
+    Fits the SVD collaborative filtering model on all ratings in the DB.
+    Returns the fitted arrays without publishing them, or None if there is nothing to train on.
     """
-    global svd_algo
     print("Training collaborative filtering model...") # Keep essential status messages
     start_time = time.time()
 
-    ratings_query = db.query(models.Rating).all()
-    if not ratings_query:
+    # Columnar export (Core select, no ORM objects), then train from the snapshot
+    snapshot_at = time.time()
+    snapshot_path = export_ratings_snapshot(db)
+    if snapshot_path is None:
         print("Collaborative: No ratings found in DB to train model.") # Keep essential warnings
-        svd_algo = None
-        return
-
-    ratings_data = {
-        'user_id': [r.user_id for r in ratings_query],
-        'movie_id': [r.movie_id for r in ratings_query],
-        'score': [r.score for r in ratings_query]
-    }
-    df = pd.DataFrame(ratings_data)
+        return None
 
-    if df.empty or not all(col in df.columns for col in ['user_id', 'movie_id', 'score']):
-         print("Collaborative: DataFrame is empty or missing required columns.") # Keep essential warnings
-         svd_algo = None
-         return
-
-    reader = Reader(rating_scale=(0.5, 5.0))
     try:
-        data = Dataset.load_from_df(df[['user_id', 'movie_id', 'score']], reader)
+        ratings = build_rating_store(*load_ratings_snapshot(snapshot_path))
     except ValueError as e:
-        print(f"Collaborative: Error loading data into Surprise Dataset: {e}") # Keep essential errors
-        svd_algo = None
-        return
+        print(f"Collaborative: Error building rating store: {e}") # Keep essential errors
+        return None
 
     svd_algo_instance = SVD(n_factors=100, n_epochs=30, lr_all=0.005, reg_all=0.04, random_state=42)
 
     try:
-        trainset = data.build_full_trainset()
+        trainset = ratings.to_surprise_trainset(RATING_SCALE)
         svd_algo_instance.fit(trainset)
-        svd_algo = svd_algo_instance
+        model = CollaborativeModel(
+            global_mean=float(trainset.global_mean),
+            user_factors=np.asarray(svd_algo_instance.pu, dtype=np.float64),
+            item_factors=np.asarray(svd_algo_instance.qi, dtype=np.float64),
+            user_biases=np.asarray(svd_algo_instance.bu, dtype=np.float64),
+            item_biases=np.asarray(svd_algo_instance.bi, dtype=np.float64),
+            ratings=ratings,
+            rating_scale=RATING_SCALE,
+            snapshot_at=snapshot_at,
+        )
         end_time = time.time()
         print(f"Model training complete. Time taken: {end_time - start_time:.2f} seconds") # Keep essential status messages
+        return model
     except Exception as e:
         print(f"Collaborative: Error during model training: {e}") # Keep essential errors
         traceback.print_exc()
-        svd_algo = None
+        return None
+
+
+def publish_collaborative_model(model: Optional[CollaborativeModel]):
+    """
+    Makes a fully fitted model visible to readers.
+    This is a single reference swap; readers holding the previous model keep using it.
+    """
+    global collab_model, model_version
+    with _publish_lock:
+        collab_model = model
+        model_version += 1
+    # Results computed with the previous model no longer match the version key
+    rec_cache.recommendation_cache.invalidate_all()
+
+
+def train_collaborative_model(db: Session):
+    """
+    Trains the SVD collaborative filtering model on all ratings in the DB (blocking).
+    """
+    publish_collaborative_model(fit_collaborative_model(db))
+
+
+def get_user_profile(model: CollaborativeModel, user_id: int,
+                     user_ratings: Optional["UserRatings"] = None) -> Optional[UserProfile]:
+    """
+    The user's latent vector, bias and rated items.
+    With user_ratings (the user's current ratings from the database) the profile
+    always reflects them: the trained vector if the model's snapshot already has
+    exactly these ratings, otherwise a fold-in, computed on first use and kept
+    until the ratings change. Without them, the trained vector or this process's
+    latest fold-in is used.
+    """
+    folded = model.folded_users.get(user_id)
+    if user_ratings is None:
+        if folded is not None:
+            return folded[1]
+        return _trained_profile(model, user_id)
+
+    stamp = user_ratings.stamp
+    if folded is not None and folded[0] == stamp:
+        return folded[1]
+    if _snapshot_matches(model, user_id, user_ratings):
+        return _trained_profile(model, user_id)
+    # Rated after the snapshot (possibly through another worker): fold in from the database
+    profile = _fold_in_profile(model, list(zip(user_ratings.movie_ids, user_ratings.scores)))
+    if profile is not None:
+        model.folded_users[user_id] = (stamp, profile)
+    return profile
+
+
+def _trained_profile(model: CollaborativeModel, user_id: int) -> Optional[UserProfile]:
+    user_inner_id = model.ratings.inner_user_id(user_id)
+    if user_inner_id is None:
+        return None
+    return (model.user_factors[user_inner_id], float(model.user_biases[user_inner_id]), model.ratings.user_items(user_inner_id))
+
+
+def _snapshot_matches(model: CollaborativeModel, user_id: int, user_ratings: "UserRatings") -> bool:
+    """Whether the model was trained on exactly these ratings (of movies it knows)."""
+    user_inner_id = model.ratings.inner_user_id(user_id)
+    if user_inner_id is None:
+        return False
+    inner_ids = model.ratings.inner_item_ids(np.array(user_ratings.movie_ids, dtype=np.int64))
+    known = inner_ids >= 0
+    trained_items = model.ratings.user_items(user_inner_id)
+    if int(known.sum()) != trained_items.size:
+        return False
+    current_order = np.argsort(inner_ids[known])
+    trained_order = np.argsort(trained_items)
+    current_scores = np.array(user_ratings.scores, dtype=np.float32)[known]
+    return (np.array_equal(inner_ids[known][current_order], trained_items[trained_order])
+            and np.array_equal(current_scores[current_order], model.ratings.user_scores(user_inner_id)[trained_order]))
+
+
+def score_all_items(model: CollaborativeModel, user_factors: np.ndarray, user_bias: float) -> np.ndarray:
+    """
+    Predicted rating of every item for one user, equivalent to SVD.predict per item:
+    global mean + bu + bi + qi . pu, clipped to the rating scale.
+    """
+    scores = model.item_factors @ user_factors
+    scores += model.item_biases
+    scores += model.global_mean + user_bias
+    np.clip(scores, model.rating_scale[0], model.rating_scale[1], out=scores)
+    return scores
+
+
+def score_user_block(model: CollaborativeModel, user_factors: np.ndarray, user_biases: np.ndarray) -> np.ndarray:
+    """score_all_items for several users at once, shaped (n_users_in_block, n_items)."""
+    scores = user_factors @ model.item_factors.T
+    scores += model.item_biases[np.newaxis, :]
+    scores += (model.global_mean + user_biases)[:, np.newaxis]
+    np.clip(scores, model.rating_scale[0], model.rating_scale[1], out=scores)
+    return scores
+
+
+def _top_unrated_items(model: CollaborativeModel, rated: np.ndarray, scores: np.ndarray, num_recs: int) -> List[int]:
+    """Masks the user's rated items out of their score row (in place) and returns the top movie ids."""
+    if rated.size >= model.raw_item_ids.size:
+        return []
+    scores[rated] = -np.inf
+    top_items = _top_n_indices(scores, min(num_recs, model.raw_item_ids.size - rated.size))
+    return [int(movie_id) for movie_id in model.raw_item_ids[top_items]]
 
 
-def get_collaborative_recommendations(user_id: int, db: Session, num_recs: int = 10) -> List[int]:
+def get_collaborative_recommendations(user_id: int, db: Session, num_recs: int = 10,
+                                      user_ratings: Optional["UserRatings"] = None) -> List[int]:
     """
     Generates collaborative filtering recommendations for a given user.
+    Scores every item in one matrix-vector product and keeps the top unrated ones.
+    Pass user_ratings so ratings newer than the model's snapshot are folded in.
     """
-    global svd_algo
+    maybe_reload_collaborative_model()
+    model = collab_model # Take one reference so a concurrent retrain cannot swap it mid-call
 
-    if svd_algo is None:
+    if model is None:
         print("Collaborative: Model not trained or training failed.") # Keep essential warnings
         return []
 
     try:
-        trainset = svd_algo.trainset
-        all_movie_inner_ids = trainset.all_items()
-        all_movie_raw_ids = {trainset.to_raw_iid(inner_id) for inner_id in all_movie_inner_ids}
-
-        try:
-            user_inner_id = trainset.to_inner_uid(user_id)
-            rated_inner_ids = {item_inner_id for (item_inner_id, _) in trainset.ur[user_inner_id]}
-            rated_raw_ids = {trainset.to_raw_iid(inner_id) for inner_id in rated_inner_ids}
-        except ValueError:
+        profile = get_user_profile(model, user_id, user_ratings)
+        if profile is None:
             print(f"Collaborative: User {user_id} not found in trainset.") # Keep essential warnings
             return []
 
-        movies_to_predict_raw_ids = list(all_movie_raw_ids - rated_raw_ids)
-
-        if not movies_to_predict_raw_ids:
+        user_factors, user_bias, rated = profile
+        recommended_movie_ids = _top_unrated_items(model, rated, score_all_items(model, user_factors, user_bias), num_recs)
+        if not recommended_movie_ids:
             print(f"Collaborative: No unrated movies found for user {user_id}.") # Keep essential warnings
-            return []
-
-        predictions = []
-        for raw_movie_id in movies_to_predict_raw_ids:
-            pred = svd_algo.predict(uid=user_id, iid=raw_movie_id)
-            predictions.append((int(raw_movie_id), pred.est))
-
-        predictions.sort(key=lambda x: x[1], reverse=True)
-        recommended_movie_ids = [movie_id for movie_id, score in predictions[:num_recs]]
-
         return recommended_movie_ids
 
     except Exception as e:
@@ -156,19 +483,64 @@ def get_collaborative_recommendations(user_id: int, db: Session, num_recs: int =
         traceback.print_exc()
         return []
 
-# --- Hybrid Recommendations ---
 
-def get_hybrid_recommendations(user_id: int, db: Session, num_recs: int = 10) -> List[int]:
+# --- Incremental Fold-In ---
+# A user's new ratings are folded into their latent vector against the fixed item
+# factors of the current model: a ridge least-squares fit of (pu, bu) to
+#     score - global_mean - bi  ~  qi . pu + bu
+# This takes milliseconds; full retrains then only need to run on a schedule.
+# Every worker folds in from the database on its own (get_user_profile compares
+# the user's current ratings with the model's snapshot), so a rating handled by
+# one worker is reflected by all of them, and by a newly loaded model whose
+# snapshot predates it. Fold-ins are not carried over to a new model: its latent
+# space is different, so they are recomputed against its item factors instead.
+
+FOLD_IN_REGULARIZATION = float(os.getenv("FOLD_IN_REGULARIZATION", "0.5"))
+
+
+def fold_in_user_ratings(user_id: int, ratings: List[Tuple[int, float]]) -> bool:
     """
-    Generates hybrid recommendations by combining content-based and collaborative filtering.
+    Refits one user's factors and bias from all their (movie_id, score) ratings.
+    Works for users unknown to the model too. Movies the model was not trained on are ignored.
+    Returns False if there is no model or none of the movies are known to it.
     """
-    collab_recs = get_collaborative_recommendations(user_id, db, num_recs)
-    content_recs = []
-    top_rating = db.query(models.Rating).filter(models.Rating.user_id == user_id).order_by(models.Rating.score.desc()).first()
+    model = collab_model
+    if model is None:
+        return False
+    profile = _fold_in_profile(model, ratings)
+    if profile is None:
+        return False
+    stamp = UserRatings([movie_id for movie_id, _ in ratings], [score for _, score in ratings]).stamp
+    # One dict assignment, so readers see either the old or the new profile
+    model.folded_users[user_id] = (stamp, profile)
+    return True
+
+
+def _fold_in_profile(model: CollaborativeModel, ratings: List[Tuple[int, float]]) -> Optional[UserProfile]:
+    """The ridge solve itself; None if none of the movies are known to the model."""
+    if not ratings:
+        return None
+    inner_ids = model.ratings.inner_item_ids(np.array([movie_id for movie_id, _ in ratings], dtype=np.int64))
+    known = inner_ids >= 0
+    if not known.any():
+        return None
+
+    rated = inner_ids[known]
+    scores = np.array([score for _, score in ratings], dtype=np.float64)[known]
+    n_factors = model.item_factors.shape[1]
+
+    # Design matrix [qi, 1] so the bias is solved together with the factors
+    design = np.hstack([model.item_factors[rated], np.ones((rated.size, 1))])
+    target = scores - model.global_mean - model.item_biases[rated]
+    gram = design.T @ design + FOLD_IN_REGULARIZATION * np.eye(n_factors + 1)
+    solution = np.linalg.solve(gram, design.T @ target)
+    return (solution[:n_factors], float(solution[n_factors]), rated)
 
-    if top_rating:
-        content_recs = get_content_recommendations(top_rating.movie_id, db, num_recs)
 
+# --- Hybrid Recommendations ---
+
+def _merge_recommendations(collab_recs: List[int], content_recs: List[int], num_recs: int) -> List[int]:
+    """Collaborative picks first, then content picks to fill up, without duplicates."""
     hybrid_recs_set = set()
     hybrid_recs_list = []
 
@@ -182,8 +554,468 @@ def get_hybrid_recommendations(user_id: int, db: Session, num_recs: int = 10) ->
             hybrid_recs_set.add(rec_id)
             hybrid_recs_list.append(rec_id)
 
-    final_recs = hybrid_recs_list[:num_recs]
+    return hybrid_recs_list[:num_recs]
+
+
+@dataclass
+class UserRatings:
+    """One user's ratings, highest score first (ties by rating id)."""
+    movie_ids: List[int]
+    scores: List[float]
+
+    @property
+    def top_movie_id(self) -> Optional[int]:
+        return self.movie_ids[0] if self.movie_ids else None
+
+    @property
+    def stamp(self) -> str:
+        """Fingerprint of the (movie id, score) pairs; changes whenever the user rates or re-rates a movie."""
+        pairs = np.array(sorted(zip(self.movie_ids, self.scores)), dtype=np.float64)
+        return f"{len(self.movie_ids)}-{hashlib.blake2b(pairs.tobytes(), digest_size=12).hexdigest()}"
+
+
+def get_user_ratings(user_id: int, db: Session) -> UserRatings:
+    """
+    Everything the recommendation path needs about the user's ratings (count,
+    rated ids, top-rated movie) in one query, so it can be fetched once per request.
+    """
+    rows = (
+        db.query(models.Rating.movie_id, models.Rating.score)
+        .filter(models.Rating.user_id == user_id)
+        .order_by(models.Rating.score.desc(), models.Rating.id)
+        .all()
+    )
+    return UserRatings([row[0] for row in rows], [row[1] for row in rows])
+
+
+def get_hybrid_recommendations(user_id: int, db: Session, num_recs: int = 10,
+                               user_ratings: Optional[UserRatings] = None) -> List[int]:
+    """
+    Generates hybrid recommendations by combining content-based and collaborative filtering.
+    Pass user_ratings if the caller already fetched them, to save the top-rating query.
+    """
+    collab_recs = get_collaborative_recommendations(user_id, db, num_recs, user_ratings)
+    content_recs = []
+    if user_ratings is not None:
+        top_movie_id = user_ratings.top_movie_id
+    else:
+        top_rating = db.query(models.Rating).filter(models.Rating.user_id == user_id).order_by(models.Rating.score.desc(), models.Rating.id).first()
+        top_movie_id = top_rating.movie_id if top_rating else None
+
+    if top_movie_id is not None:
+        content_recs = get_content_recommendations(top_movie_id, db, num_recs)
+
+    final_recs = _merge_recommendations(collab_recs, content_recs, num_recs)
     # Keep one final print statement for confirmation in main.py logs
     # print(f"Generated {len(final_recs)} hybrid recommendations for user {user_id}.")
     return final_recs
 
+
+# --- Request-Time Scoring Pool ---
+# Async endpoints hand recommendation scoring to these threads instead of running
+# it on the event loop. Threads rather than processes: the model is shared
+# (memory-mapped) and NumPy releases the GIL inside the matrix products. The pool
+# size also caps how many requests score at once.
+ML_SCORING_THREADS = int(os.getenv("ML_SCORING_THREADS", str(min(4, os.cpu_count() or 1))))
+scoring_executor = ThreadPoolExecutor(max_workers=ML_SCORING_THREADS, thread_name_prefix="ml-scoring")
+
+
+# --- Batch Recommendations ---
+
+BATCH_USER_BLOCK_SIZE = int(os.getenv("BATCH_USER_BLOCK_SIZE", "256"))
+BATCH_MAX_USERS = int(os.getenv("BATCH_MAX_USERS", "5000")) # Users per batch request
+
+
+def _top_rated_movie_ids(user_ids: List[int], db: Session) -> Dict[int, int]:
+    """Each user's highest-rated movie id, one query per BATCH_USER_BLOCK_SIZE users (bounded IN lists)."""
+    top_rated: Dict[int, int] = {}
+    for start in range(0, len(user_ids), BATCH_USER_BLOCK_SIZE):
+        ranked = (
+            db.query(
+                models.Rating.user_id,
+                models.Rating.movie_id,
+                func.row_number().over(
+                    partition_by=models.Rating.user_id,
+                    order_by=(models.Rating.score.desc(), models.Rating.id),
+                ).label("rank"),
+            )
+            .filter(models.Rating.user_id.in_(user_ids[start:start + BATCH_USER_BLOCK_SIZE]))
+            .subquery()
+        )
+        rows = db.query(ranked.c.user_id, ranked.c.movie_id).filter(ranked.c.rank == 1).all()
+        top_rated.update((int(user_id), int(movie_id)) for user_id, movie_id in rows)
+    return top_rated
+
+
+def get_batch_hybrid_recommendations(user_ids: List[int], db: Session, num_recs: int = 10) -> Dict[int, List[int]]:
+    """
+    Hybrid recommendations for many users at once.
+    Users are scored BATCH_USER_BLOCK_SIZE at a time as one block matrix product,
+    and the content index is shared across the batch; top-rated movies are read per block.
+    Profiles are the model's snapshot plus this process's fold-ins; unlike the
+    per-user path, ratings written through other workers since the last retrain
+    are not re-read for the batch.
+    """
+    user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids)) # De-duplicate, keep order
+    collab_recs: Dict[int, List[int]] = {}
+    maybe_reload_collaborative_model()
+    model = collab_model
+
+    if model is not None:
+        profiles = [(user_id, get_user_profile(model, user_id)) for user_id in user_ids]
+        known = [(user_id, profile) for user_id, profile in profiles if profile is not None]
+        for start in range(0, len(known), BATCH_USER_BLOCK_SIZE):
+            block = known[start:start + BATCH_USER_BLOCK_SIZE]
+            block_scores = score_user_block(
+                model,
+                np.vstack([profile[0] for _, profile in block]),
+                np.array([profile[1] for _, profile in block]),
+            )
+            for (user_id, (_, _, rated)), scores in zip(block, block_scores):
+                collab_recs[user_id] = _top_unrated_items(model, rated, scores, num_recs)
+    else:
+        print("Collaborative: Model not trained or training failed.") # Keep essential warnings
+
+    index = get_content_index(db)
+    top_rated = _top_rated_movie_ids(user_ids, db) if index is not None else {}
+
+    results: Dict[int, List[int]] = {}
+    for user_id in user_ids:
+        content_recs = []
+        if user_id in top_rated:
+            content_recs = _content_neighbors(index, top_rated[user_id], num_recs)
+        results[user_id] = _merge_recommendations(collab_recs.get(user_id, []), content_recs, num_recs)
+    return results
+
+
+# --- Background Retraining ---
+# Rating writes only *request* a retrain. Requests are debounced and coalesced,
+# at most one training runs at a time, and it runs in a separate process so the
+# API workers keep their CPU. The result is published only once fully fitted.
+
+RETRAIN_DEBOUNCE_SECONDS = float(os.getenv("RETRAIN_DEBOUNCE_SECONDS", "30"))
+# New ratings are folded in immediately, so full retrains can be spaced out
+RETRAIN_MIN_INTERVAL_SECONDS = float(os.getenv("RETRAIN_MIN_INTERVAL_SECONDS", "900"))
+
+
+def _fit_collaborative_model_in_subprocess() -> Optional[str]:
+    """
+    Entry point of the training process; it opens its own database session.
+    The model is handed back through model_store; returns the saved version.
+    """
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        model = fit_collaborative_model(db)
+    finally:
+        db.close()
+    if model is None:
+        return None
+    return save_collaborative_artifact(model)
+
+
+class RetrainScheduler:
+    """Coalescing, debounced trigger for out-of-process model retraining."""
+
+    def __init__(self, debounce_seconds: float = RETRAIN_DEBOUNCE_SECONDS,
+                 min_interval_seconds: float = RETRAIN_MIN_INTERVAL_SECONDS):
+        self.debounce_seconds = debounce_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self._condition = threading.Condition()
+        self._pending = False
+        self._last_request = 0.0
+        self._requested_at = 0.0 # time.time() of the last request, comparable across workers
+        self._last_train = float("-inf")
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def request_retrain(self):
+        """Marks the model as stale. Cheap and non-blocking; safe to call on every rating."""
+        with self._condition:
+            if self._stopped:
+                return
+            self._pending = True
+            self._last_request = time.monotonic()
+            self._requested_at = time.time()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="retrain-scheduler", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def shutdown(self):
+        """Stops the scheduler thread and the training process."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _wait_for_quiet_period(self) -> bool:
+        """
+        Blocks until a retrain is pending, no new request came in for debounce_seconds
+        and at least min_interval_seconds passed since the previous training started.
+        """
+        with self._condition:
+            while not self._pending and not self._stopped:
+                self._condition.wait()
+            while not self._stopped:
+                due = max(self._last_request + self.debounce_seconds, self._last_train + self.min_interval_seconds)
+                remaining = due - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            # Requests arriving while we train set _pending again and trigger one more run
+            self._pending = False
+            self._last_train = time.monotonic()
+            return not self._stopped
+
+    def _run(self):
+        while self._wait_for_quiet_period():
+            self._train_once()
+
+    def _train_once(self):
+        # With several gunicorn workers only one trains at a time, and a worker whose requests
+        # came before the published model's snapshot maps that model instead of fitting again
+        with model_store.exclusive_lock(COLLABORATIVE_ARTIFACT) as acquired:
+            if not acquired:
+                print("Collaborative: Another worker is retraining; will check again later.") # Keep essential status messages
+                with self._condition:
+                    self._pending = True
+                return
+            version = self._published_since_request()
+            if version is not None:
+                print(f"Collaborative: Model {version} was trained after the last rating write; skipping the retrain.") # Keep essential status messages
+            else:
+                version = self._fit()
+                if version is None:
+                    return
+
+        current = collab_model
+        if current is not None and current.artifact_version == version:
+            return
+        model = load_collaborative_artifact()
+        if model is None:
+            print(f"Collaborative: Could not map retrained model {version}; keeping the current one.") # Keep essential warnings
+            return
+        publish_collaborative_model(model)
+        print(f"Collaborative: Published retrained model {model.artifact_version} (version {model_version}).") # Keep essential status messages
+
+    def _published_since_request(self) -> Optional[str]:
+        """
+        The published artifact version if its ratings were read after the last retrain request,
+        i.e. another worker already trained on everything this one was asked to pick up.
+        """
+        with self._condition:
+            requested_at = self._requested_at
+        manifest = model_store.read_manifest(COLLABORATIVE_ARTIFACT)
+        if manifest is None or (manifest.get("snapshot_at") or 0.0) < requested_at:
+            return None
+        return manifest["version"]
+
+    def _fit(self) -> Optional[str]:
+        """Fits and saves a model in the training process; returns the saved version."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            version = self._executor.submit(_fit_collaborative_model_in_subprocess).result()
+        except BrokenProcessPool as e:
+            print(f"Collaborative: Training process died: {e}") # Keep essential errors
+            self._executor = None
+            return None
+        except Exception as e:
+            print(f"Collaborative: Error during background retrain: {e}") # Keep essential errors
+            traceback.print_exc()
+            return None
+        if version is None:
+            print("Collaborative: Background retrain produced no model; keeping the current one.") # Keep essential warnings
+        return version
+
+
+retrain_scheduler = RetrainScheduler()
+
+
+def train_collaborative_model_task():
+    """Background-task entry point used after rating writes: requests a debounced retrain."""
+    retrain_scheduler.request_retrain()
+
+
+# --- Model Artifacts ---
+# Fitted models are saved through model_store so a restart loads them in
+# milliseconds instead of retraining. The newest collaborative artifact is always
+# served at startup; if its ratings count no longer matches the database a
+# background retrain is queued. A content artifact is reused only while the
+# catalog signature in its manifest matches the database.
+
+COLLABORATIVE_ARTIFACT = "collaborative"
+CONTENT_ARTIFACT = "content"
+
+
+def _ratings_count(db: Session) -> int:
+    return int(db.query(func.count(models.Rating.id)).scalar() or 0)
+
+
+def save_collaborative_artifact(model: CollaborativeModel) -> Optional[str]:
+    """
+    Saves a collaborative model (without fold-in overrides) as a new artifact version.
+    Returns the version, or None if saving failed.
+    """
+    try:
+        arrays = {
+            "user_factors": model.user_factors,
+            "item_factors": model.item_factors,
+            "user_biases": model.user_biases,
+            "item_biases": model.item_biases,
+        }
+        arrays.update({f"ratings_{name}": array for name, array in model.ratings.to_arrays().items()})
+        version = model_store.save_artifact(
+            COLLABORATIVE_ARTIFACT,
+            arrays,
+            {
+                "ratings_count": model.ratings_count,
+                "global_mean": model.global_mean,
+                "rating_scale": list(model.rating_scale),
+                "snapshot_at": model.snapshot_at,
+            },
+        )
+        print(f"Collaborative: Saved model artifact {version}.") # Keep essential status messages
+        return version
+    except Exception as e:
+        print(f"Collaborative: Error saving model artifact: {e}") # Keep essential errors
+        traceback.print_exc()
+        return None
+
+
+def load_collaborative_artifact() -> Optional[CollaborativeModel]:
+    """Memory-maps the newest collaborative artifact (None if there is none or it is unreadable)."""
+    loaded = model_store.load_artifact(COLLABORATIVE_ARTIFACT, mmap=True)
+    if loaded is None:
+        return None
+    arrays, manifest = loaded
+    return CollaborativeModel(
+        global_mean=float(manifest["global_mean"]),
+        user_factors=arrays["user_factors"],
+        item_factors=arrays["item_factors"],
+        user_biases=arrays["user_biases"],
+        item_biases=arrays["item_biases"],
+        ratings=RatingStore.from_arrays({
+            name[len("ratings_"):]: array for name, array in arrays.items() if name.startswith("ratings_")
+        }),
+        rating_scale=tuple(manifest["rating_scale"]),
+        artifact_version=manifest["version"],
+        snapshot_at=manifest.get("snapshot_at"),
+    )
+
+
+def save_content_artifact(index: ContentIndex):
+    """Saves a content index, including its top-K table, as a new artifact version."""
+    try:
+        arrays = {
+            "movie_ids": index.movie_ids,
+            "tfidf_data": index.tfidf_matrix.data,
+            "tfidf_indices": index.tfidf_matrix.indices,
+            "tfidf_indptr": index.tfidf_matrix.indptr,
+        }
+        if index.neighbor_rows is not None:
+            arrays["neighbor_rows"] = index.neighbor_rows
+            arrays["neighbor_scores"] = index.neighbor_scores
+        version = model_store.save_artifact(
+            CONTENT_ARTIFACT,
+            arrays,
+            {"catalog_signature": list(index.signature), "tfidf_shape": list(index.tfidf_matrix.shape)},
+        )
+        print(f"Content-Based: Saved index artifact {version}.") # Keep essential status messages
+    except Exception as e:
+        print(f"Content-Based: Error saving index artifact: {e}") # Keep essential errors
+        traceback.print_exc()
+
+
+def load_content_artifact(signature: Tuple[int, int, str]) -> Optional[ContentIndex]:
+    """Memory-maps the newest content artifact if it was built for the given catalog signature."""
+    manifest = model_store.read_manifest(CONTENT_ARTIFACT)
+    if manifest is None or tuple(manifest.get("catalog_signature", ())) != tuple(signature):
+        return None
+    loaded = model_store.load_artifact(CONTENT_ARTIFACT, mmap=True)
+    if loaded is None:
+        return None
+    arrays, manifest = loaded
+    tfidf_matrix = sparse.csr_matrix(
+        (arrays["tfidf_data"], arrays["tfidf_indices"], arrays["tfidf_indptr"]),
+        shape=tuple(manifest["tfidf_shape"]),
+    )
+    return ContentIndex(
+        movie_ids=arrays["movie_ids"],
+        id_to_row={int(movie_id): row for row, movie_id in enumerate(arrays["movie_ids"])},
+        tfidf_matrix=tfidf_matrix,
+        signature=tuple(signature),
+        neighbor_rows=arrays.get("neighbor_rows"),
+        neighbor_scores=arrays.get("neighbor_scores"),
+    )
+
+
+def load_or_train_collaborative_model(db: Session):
+    """
+    Startup path: publish the newest saved model, and train one only if there is none.
+    A saved model trained on a different number of ratings is still served (ratings
+    written since are folded in per user) while retrain_scheduler refits in the background.
+    Workers starting together without an artifact wait for whichever one trains first.
+    """
+    start_time = time.time()
+    ratings_count = _ratings_count(db)
+    model = load_collaborative_artifact()
+    if model is None:
+        with model_store.exclusive_lock(COLLABORATIVE_ARTIFACT, blocking=True):
+            model = load_collaborative_artifact() # Another worker may have trained one while we waited
+            if model is None:
+                print("Collaborative: No model artifact found, training.") # Keep essential status messages
+                model = fit_collaborative_model(db)
+                if model is not None and save_collaborative_artifact(model) is not None:
+                    # Serve from the shared mapping rather than this process's private copy
+                    model = load_collaborative_artifact() or model
+                publish_collaborative_model(model)
+                return
+    publish_collaborative_model(model)
+    print(f"Collaborative: Loaded model artifact in {time.time() - start_time:.3f} seconds") # Keep essential status messages
+    if model.ratings_count != ratings_count:
+        print(f"Collaborative: Model artifact was trained on {model.ratings_count} ratings, the database has {ratings_count}; "
+              "retraining in the background.") # Keep essential status messages
+        retrain_scheduler.request_retrain()
+
+
+MODEL_RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "5"))
+_last_reload_check = 0.0
+
+
+def maybe_reload_collaborative_model():
+    """
+    Maps a newer collaborative artifact if one was published (e.g. by another worker's retrain).
+    Checks the LATEST pointer at most every MODEL_RELOAD_CHECK_SECONDS.
+    """
+    global _last_reload_check
+    now = time.monotonic()
+    if now - _last_reload_check < MODEL_RELOAD_CHECK_SECONDS:
+        return
+    _last_reload_check = now
+
+    current = collab_model
+    latest = model_store.latest_version(COLLABORATIVE_ARTIFACT)
+    if latest is None or (current is not None and current.artifact_version == latest):
+        return
+    model = load_collaborative_artifact()
+    if model is not None and (current is None or model.artifact_version != current.artifact_version):
+        publish_collaborative_model(model)
+        print(f"Collaborative: Mapped newly published model {model.artifact_version}.") # Keep essential status messages
+
+
+def load_or_build_content_index(db: Session) -> Optional[ContentIndex]:
+    """Startup path: publish the saved content index if it matches the catalog, otherwise build it."""
+    global content_index
+    start_time = time.time()
+    index = load_content_artifact(_catalog_signature(db))
+    if index is not None:
+        content_index = index
+        print(f"Content-Based: Loaded index artifact in {time.time() - start_time:.3f} seconds") # Keep essential status messages
+        if index.neighbor_rows is None:
+            build_similarity_table_in_background(index)
+        return index
+    return build_content_index(db)
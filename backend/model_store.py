@@ -0,0 +1,156 @@
+import os
+import fcntl
+import json
+import hashlib
+import shutil
+import time
+from datetime import datetime, timezone
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+# --- Configuration ---
+# Versioned on-disk artifacts for the ML engine. Layout:
+#   <MODEL_ARTIFACT_DIR>/<kind>/<version>/<array name>.npy
+#   <MODEL_ARTIFACT_DIR>/<kind>/<version>/manifest.json
+#   <MODEL_ARTIFACT_DIR>/<kind>/LATEST     (name of the newest complete version)
+# A version directory is written under a temporary name and renamed into place,
+# and LATEST is replaced atomically, so readers never see a partial artifact.
+# Arrays can be opened memory-mapped, so every worker process on the host shares
+# one page-cache copy of a version instead of holding its own.
+MODEL_ARTIFACT_DIR = os.getenv("MODEL_ARTIFACT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_artifacts"))
+MODEL_ARTIFACT_KEEP = int(os.getenv("MODEL_ARTIFACT_KEEP", "3")) # Versions kept per kind
+MANIFEST_FILE = "manifest.json"
+LATEST_FILE = "LATEST"
+FORMAT_VERSION = 1
+
+
+def _kind_dir(kind: str) -> str:
+    return os.path.join(MODEL_ARTIFACT_DIR, kind)
+
+
+def _checksum(version_dir: str, names) -> str:
+    """sha256 over the artifact's array files, in name order."""
+    digest = hashlib.sha256()
+    for name in sorted(names):
+        with open(os.path.join(version_dir, f"{name}.npy"), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def save_artifact(kind: str, arrays: Dict[str, np.ndarray], metadata: dict) -> str:
+    """
+    Writes a new version of an artifact and points LATEST at it.
+    Returns the version name.
+    """
+    kind_dir = _kind_dir(kind)
+    os.makedirs(kind_dir, exist_ok=True)
+    # Sortable by creation time; the pid keeps concurrent writers apart
+    version = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+    tmp_dir = os.path.join(kind_dir, f".tmp-{version}")
+    os.makedirs(tmp_dir)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "kind": kind,
+        "version": version,
+        "created_at": time.time(),
+        "arrays": sorted(arrays),
+        "checksum": _checksum(tmp_dir, arrays),
+        **metadata,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    os.rename(tmp_dir, os.path.join(kind_dir, version))
+    tmp_latest = os.path.join(kind_dir, f".{LATEST_FILE}-{version}")
+    with open(tmp_latest, "w") as f:
+        f.write(version)
+    os.replace(tmp_latest, os.path.join(kind_dir, LATEST_FILE))
+
+    _prune_old_versions(kind_dir, keep=version)
+    return version
+
+
+def _prune_old_versions(kind_dir: str, keep: str):
+    """Deletes all but the newest MODEL_ARTIFACT_KEEP versions (never the one just written)."""
+    versions = sorted(
+        name for name in os.listdir(kind_dir)
+        if not name.startswith(".") and os.path.isdir(os.path.join(kind_dir, name))
+    )
+    for name in versions[:-MODEL_ARTIFACT_KEEP] if MODEL_ARTIFACT_KEEP > 0 else versions:
+        if name != keep:
+            shutil.rmtree(os.path.join(kind_dir, name), ignore_errors=True)
+
+
+def latest_version(kind: str) -> Optional[str]:
+    """Name of the newest published version of an artifact (one small file read)."""
+    try:
+        with open(os.path.join(_kind_dir(kind), LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+@contextmanager
+def exclusive_lock(kind: str, blocking: bool = False):
+    """
+    Inter-process lock for producing a new version of an artifact.
+    Yields True if this process holds the lock, False if another process does
+    (only possible when blocking=False).
+    """
+    kind_dir = _kind_dir(kind)
+    os.makedirs(kind_dir, exist_ok=True)
+    with open(os.path.join(kind_dir, ".lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_manifest(kind: str) -> Optional[dict]:
+    """Manifest of the newest version of an artifact, or None if there is none."""
+    version = latest_version(kind)
+    if version is None:
+        return None
+    try:
+        with open(os.path.join(_kind_dir(kind), version, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def load_artifact(kind: str, verify: bool = True, mmap: bool = False) -> Optional[Tuple[Dict[str, np.ndarray], dict]]:
+    """
+    Loads the newest version of an artifact as (arrays, manifest).
+    With mmap=True the arrays are read-only memory maps of the files.
+    Returns None if it is missing, incomplete or fails its checksum.
+    """
+    manifest = read_manifest(kind)
+    if manifest is None:
+        return None
+    version_dir = os.path.join(_kind_dir(kind), manifest["version"])
+    try:
+        if verify and _checksum(version_dir, manifest["arrays"]) != manifest["checksum"]:
+            print(f"Model store: Checksum mismatch for {kind} artifact {manifest['version']}, ignoring it.") # Keep essential warnings
+            return None
+        arrays = {
+            name: np.load(os.path.join(version_dir, f"{name}.npy"), allow_pickle=False, mmap_mode="r" if mmap else None)
+            for name in manifest["arrays"]
+        }
+    except (OSError, ValueError) as e:
+        print(f"Model store: Could not load {kind} artifact {manifest['version']}: {e}") # Keep essential warnings
+        return None
+    return arrays, manifest
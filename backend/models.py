@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint, DateTime # Added DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint, DateTime, Table, Index, Text # Added DateTime
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func # Added func for default timestamp
 from database import Base # Keep this import
@@ -26,17 +26,40 @@ class Movie(Base):
     ratings = relationship("Rating", back_populates="movie", cascade="all, delete-orphan")
     watchlist_items = relationship("WatchlistItem", back_populates="movie", cascade="all, delete-orphan") # <-- ADDED relationship
 
+# --- Normalized Genres ---
+# Movie.genres keeps the original "Adventure|Animation" string for display;
+# filtering goes through these tables (see genres.py).
+class Genre(Base):
+    __tablename__ = "genres"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True, nullable=False)
+
+movie_genres = Table(
+    "movie_genres",
+    Base.metadata,
+    Column("movie_id", Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True),
+    Column("genre_id", Integer, ForeignKey("genres.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_movie_genres_genre_id_movie_id", "genre_id", "movie_id"), # All movies of a genre (the API filters through genres.GenreIndex)
+)
+
 class Rating(Base):
     __tablename__ = "ratings"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     movie_id = Column(Integer, ForeignKey("movies.id"), nullable=False)
     score = Column(Float, index=True, nullable=False)
+    # MovieLens timestamp for seeded ratings. The client-side default also covers databases where
+    # the column was added by migrations.add_rating_timestamp, which has no server default on SQLite.
+    rated_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now(), nullable=True)
 
     user = relationship("User", back_populates="ratings")
     movie = relationship("Movie", back_populates="ratings")
 
-    __table_args__ = (UniqueConstraint('user_id', 'movie_id', name='_user_movie_rating_uc'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'movie_id', name='_user_movie_rating_uc'), # Also serves "all ratings of a user"
+        Index("ix_ratings_user_id_score", user_id, score.desc(), id), # A user's top-rated movie (hybrid recommendations)
+        Index("ix_ratings_movie_id", movie_id), # Per-movie aggregation (popularity) and movie deletes
+    )
 
 
 # --- NEW Watchlist Model ---
@@ -50,5 +73,17 @@ class WatchlistItem(Base):
     user = relationship("User", back_populates="watchlist_items")
     movie = relationship("Movie", back_populates="watchlist_items")
 
-    __table_args__ = (UniqueConstraint('user_id', 'movie_id', name='_user_movie_watchlist_uc'),) # Ensure user can only add a movie once
+    __table_args__ = (
+        UniqueConstraint('user_id', 'movie_id', name='_user_movie_watchlist_uc'), # Ensure user can only add a movie once
+        Index("ix_watchlist_items_user_id_added_at", user_id, added_at.desc()), # A user's watchlist, newest first
+    )
+
 
+# --- Seeding State ---
+# Progress of `seed.py --incremental`, kept in the database it describes so that
+# dropping or recreating the database also discards the checkpoint.
+class SeedCheckpoint(Base):
+    __tablename__ = "seed_checkpoints"
+    name = Column(String, primary_key=True) # One row per seeding job ("incremental")
+    state = Column(Text, nullable=False) # JSON, see seed.py
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
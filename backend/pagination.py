@@ -0,0 +1,59 @@
+import base64
+import json
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+from typing import List, Optional, Tuple
+import models
+
+# --- Keyset Pagination ---
+# Movie listings are ordered by (release_year DESC NULLS LAST, title, id). A
+# cursor is the sort key of the last movie on a page, base64-encoded so clients
+# treat it as opaque. The next page continues right after that key in up to three
+# index range scans (rest of the same year, earlier years, movies without a year),
+# so each page reads about `limit` rows no matter how deep it is. The backing
+# index is created by migrations.add_movie_listing_index.
+
+MovieSortKey = Tuple[Optional[int], str, int] # (release_year, title, id)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(movie: models.Movie) -> str:
+    key = [movie.release_year, movie.title, movie.id]
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> MovieSortKey:
+    try:
+        release_year, title, movie_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError, UnicodeEncodeError):
+        raise InvalidCursor("Malformed cursor.")
+    if not (release_year is None or isinstance(release_year, int)) or not isinstance(title, str) or not isinstance(movie_id, int):
+        raise InvalidCursor("Malformed cursor.")
+    return release_year, title, movie_id
+
+
+def keyset_page(query: Query, after: Optional[MovieSortKey], limit: int) -> List[models.Movie]:
+    """The next `limit` movies of a filtered Movie query after the given sort key (from the start if None)."""
+    movie = models.Movie
+    movies: List[models.Movie] = []
+
+    def take(ranged_query: Query, *order_by):
+        if len(movies) < limit:
+            movies.extend(ranged_query.order_by(*order_by).limit(limit - len(movies)).all())
+
+    if after is None:
+        take(query.filter(movie.release_year.isnot(None)), movie.release_year.desc().nullslast(), movie.title, movie.id)
+        take(query.filter(movie.release_year.is_(None)), movie.title, movie.id)
+        return movies
+
+    release_year, title, movie_id = after
+    if release_year is not None:
+        take(query.filter(movie.release_year == release_year, tuple_(movie.title, movie.id) > (title, movie_id)), movie.title, movie.id)
+        take(query.filter(movie.release_year < release_year), movie.release_year.desc().nullslast(), movie.title, movie.id)
+        take(query.filter(movie.release_year.is_(None)), movie.title, movie.id)
+    else:
+        take(query.filter(movie.release_year.is_(None), tuple_(movie.title, movie.id) > (title, movie_id)), movie.title, movie.id)
+    return movies
@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, replace
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from typing import Iterable, List, Optional
+import catalog
+import models
+from database import SessionLocal
+
+# --- Configuration ---
+# Movies ranked by Bayesian-averaged rating, computed from the ratings table:
+#   score = (v * R + m * C) / (v + m)
+# where v is the movie's rating count, R its mean rating, C the mean over all
+# ratings and m the prior weight (POPULARITY_PRIOR_VOTES, or the mean count per
+# movie when unset). With POPULARITY_HALF_LIFE_DAYS > 0 each rating is weighted
+# by 0.5 ** (age / half-life), age measured from the newest rating, so v and R
+# become decayed counts and means. Ratings without a timestamp get full weight.
+# The ranking is held in memory as sorted arrays plus the top movies' rows, so a
+# cold-start response is a filtered slice; it is rebuilt in the background once
+# older than POPULARITY_REFRESH_SECONDS. After a catalog change notification the
+# top movies' rows are re-read (the ranking is kept), see refresh_top_movies.
+POPULARITY_PRIOR_VOTES = os.getenv("POPULARITY_PRIOR_VOTES") # Unset: mean count per movie
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "0")) # 0 disables time decay
+POPULARITY_REFRESH_SECONDS = float(os.getenv("POPULARITY_REFRESH_SECONDS", "600"))
+POPULARITY_TOP_MOVIES = int(os.getenv("POPULARITY_TOP_MOVIES", "500")) # Rows kept in memory for serving
+POPULARITY_STREAM_SIZE = 50000 # Rows per partition when aggregating with time decay
+
+SECONDS_PER_DAY = 86400.0
+
+
+@dataclass
+class PopularityIndex:
+    movie_ids: np.ndarray      # int64, most popular first
+    scores: np.ndarray         # float64, Bayesian average (decayed if enabled)
+    counts: np.ndarray         # float64, rating count (decayed if enabled)
+    top_movies: List[dict]     # Movie rows (column -> value) for the first POPULARITY_TOP_MOVIES ids
+    built_at: float            # time.monotonic()
+    catalog_version: str = ""  # catalog.version_tag() when top_movies were read
+
+
+popularity_index: Optional[PopularityIndex] = None
+_refresh_lock = threading.Lock()
+
+
+# --- Aggregation ---
+
+def _aggregate_counts(db: Session) -> pd.DataFrame:
+    """Per movie: count and sum of scores (one GROUP BY)."""
+    rating = models.Rating
+    rows = db.execute(
+        select(rating.movie_id, func.count(rating.id), func.sum(rating.score)).group_by(rating.movie_id)
+    ).all()
+    return pd.DataFrame(rows, columns=["movie_id", "weight", "weighted_score"]).astype(
+        {"movie_id": "int64", "weight": "float64", "weighted_score": "float64"})
+
+
+def _aggregate_decayed(db: Session, half_life_days: float) -> pd.DataFrame:
+    """Per movie: sum of decay weights and of weighted scores, streamed in partitions."""
+    rating = models.Rating
+    newest = db.execute(select(func.max(rating.rated_at))).scalar()
+    reference = pd.to_datetime(newest, utc=True) if newest is not None else None # SQLite returns naive UTC
+    half_life_seconds = half_life_days * SECONDS_PER_DAY
+
+    totals = None
+    result = db.execute(
+        select(rating.movie_id, rating.score, rating.rated_at).execution_options(stream_results=True, yield_per=POPULARITY_STREAM_SIZE)
+    )
+    for partition in result.partitions():
+        block = pd.DataFrame(partition, columns=["movie_id", "score", "rated_at"])
+        if reference is not None:
+            age_seconds = (reference - pd.to_datetime(block["rated_at"], utc=True)).dt.total_seconds()
+            weights = np.power(0.5, age_seconds.fillna(0.0).clip(lower=0.0) / half_life_seconds)
+        else:
+            weights = pd.Series(1.0, index=block.index)
+        block = pd.DataFrame({
+            "movie_id": block["movie_id"].astype("int64"),
+            "weight": weights.astype("float64"),
+            "weighted_score": weights * block["score"].astype("float64"),
+        })
+        partial = block.groupby("movie_id")[["weight", "weighted_score"]].sum()
+        totals = partial if totals is None else totals.add(partial, fill_value=0.0)
+    if totals is None:
+        return pd.DataFrame(columns=["movie_id", "weight", "weighted_score"])
+    return totals.reset_index()
+
+
+def _load_top_movies(db: Session, movie_ids: np.ndarray) -> List[dict]:
+    """Movie rows for the given ids, in the given order."""
+    table = models.Movie.__table__
+    ids = [int(movie_id) for movie_id in movie_ids]
+    rows = {}
+    for start in range(0, len(ids), 500):
+        for row in db.execute(select(table).where(table.c.id.in_(ids[start:start + 500]))).mappings():
+            rows[row["id"]] = dict(row)
+    return [rows[movie_id] for movie_id in ids if movie_id in rows]
+
+
+def build_popularity_index(db: Session) -> PopularityIndex:
+    """Computes the popularity ranking from the ratings table."""
+    version = catalog.version_tag()
+    if POPULARITY_HALF_LIFE_DAYS > 0:
+        totals = _aggregate_decayed(db, POPULARITY_HALF_LIFE_DAYS)
+    else:
+        totals = _aggregate_counts(db)
+    totals = totals[totals["weight"] > 0]
+
+    movie_ids = totals["movie_id"].to_numpy(dtype=np.int64)
+    counts = totals["weight"].to_numpy(dtype=np.float64)
+    sums = totals["weighted_score"].to_numpy(dtype=np.float64)
+    if movie_ids.size == 0:
+        return PopularityIndex(movie_ids, np.empty(0), np.empty(0), [], time.monotonic(), version)
+
+    global_mean = sums.sum() / counts.sum()
+    prior_votes = float(POPULARITY_PRIOR_VOTES) if POPULARITY_PRIOR_VOTES else counts.mean()
+    scores = (sums + prior_votes * global_mean) / (counts + prior_votes)
+
+    # Highest score first; ties by count (descending), then movie id
+    order = np.lexsort((movie_ids, -counts, -scores))
+    movie_ids, scores, counts = movie_ids[order], scores[order], counts[order]
+    top_movies = _load_top_movies(db, movie_ids[:POPULARITY_TOP_MOVIES])
+    return PopularityIndex(movie_ids, scores, counts, top_movies, time.monotonic(), version)
+
+
+# --- Refresh ---
+
+def refresh_popularity_index(db: Session) -> Optional[PopularityIndex]:
+    """Rebuilds and publishes the index (blocking). Concurrent calls are skipped."""
+    global popularity_index
+    if not _refresh_lock.acquire(blocking=False):
+        return popularity_index
+    try:
+        start_time = time.time()
+        index = build_popularity_index(db)
+        popularity_index = index # Single reference swap
+        print(f"Popularity index built for {index.movie_ids.size} movies in {time.time() - start_time:.2f} seconds.") # Keep essential status messages
+        return index
+    except Exception as e:
+        print(f"ERROR building popularity index: {e}") # Keep essential errors
+        return popularity_index
+    finally:
+        _refresh_lock.release()
+
+
+def refresh_top_movies(db: Session) -> Optional[PopularityIndex]:
+    """Re-reads the top movies' rows after movie fields changed, keeping the ranking (blocking)."""
+    global popularity_index
+    if not _refresh_lock.acquire(blocking=False):
+        return popularity_index
+    try:
+        index = popularity_index
+        if index is None:
+            return None
+        version = catalog.version_tag()
+        top_movies = _load_top_movies(db, index.movie_ids[:POPULARITY_TOP_MOVIES])
+        popularity_index = replace(index, top_movies=top_movies, catalog_version=version)
+        return popularity_index
+    except Exception as e:
+        print(f"ERROR refreshing popular movie rows: {e}") # Keep essential errors
+        return popularity_index
+    finally:
+        _refresh_lock.release()
+
+
+def _refresh_in_background(refresh=refresh_popularity_index):
+    db = SessionLocal()
+    try:
+        refresh(db)
+    finally:
+        db.close()
+
+
+def get_popularity_index() -> Optional[PopularityIndex]:
+    """
+    The current index; starts a background rebuild when it is missing or stale, or
+    a re-read of the top movies' rows when the catalog changed since they were read.
+    """
+    index = popularity_index
+    if _refresh_lock.locked():
+        return index
+    if index is None or time.monotonic() - index.built_at > POPULARITY_REFRESH_SECONDS:
+        threading.Thread(target=_refresh_in_background, name="popularity-refresh", daemon=True).start()
+    elif index.catalog_version != catalog.version_tag():
+        threading.Thread(target=_refresh_in_background, args=(refresh_top_movies,), name="popularity-refresh", daemon=True).start()
+    return index
+
+
+# --- Serving ---
+
+def get_popular_movies(num_movies: int, exclude_ids: Iterable[int] = ()) -> Optional[List[dict]]:
+    """
+    The most popular movies not in exclude_ids, as movie rows, from memory.
+    Returns None if no index has been built yet.
+    """
+    index = get_popularity_index()
+    if index is None:
+        return None
+    exclude = set(exclude_ids)
+    popular = [movie for movie in index.top_movies if movie["id"] not in exclude]
+    return popular[:num_movies]
+
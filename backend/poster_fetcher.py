@@ -0,0 +1,183 @@
+import os
+import json
+import random
+import sys
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterable, Optional
+
+# --- Configuration ---
+# TMDB_BASE_URL can point at a local stub server for testing.
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+TMDB_MAX_CONCURRENCY = int(os.getenv("TMDB_MAX_CONCURRENCY", "16"))
+TMDB_REQUESTS_PER_SECOND = float(os.getenv("TMDB_REQUESTS_PER_SECOND", "40")) # TMDB allows roughly 50/s
+TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "4"))
+TMDB_TIMEOUT_SECONDS = float(os.getenv("TMDB_TIMEOUT_SECONDS", "10"))
+# tmdbId -> poster_path (null when TMDB has no poster), so reseeds skip the API
+TMDB_CACHE_PATH = os.getenv("TMDB_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tmdb_cache.json"))
+CACHE_SAVE_EVERY = 500 # Completed lookups between cache checkpoints
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: allows `rate` acquisitions per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class PosterFetcher:
+    """
+    Looks up TMDB poster paths with bounded concurrency over one pooled HTTP session,
+    a token-bucket rate limit, retries with exponential backoff and an on-disk cache.
+    """
+
+    def __init__(self, api_key: str, base_url: str = TMDB_BASE_URL,
+                 max_concurrency: int = TMDB_MAX_CONCURRENCY,
+                 requests_per_second: float = TMDB_REQUESTS_PER_SECOND,
+                 max_retries: int = TMDB_MAX_RETRIES,
+                 cache_path: Optional[str] = TMDB_CACHE_PATH,
+                 timeout: float = TMDB_TIMEOUT_SECONDS):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.rate_limiter = TokenBucket(requests_per_second)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._cache_lock = threading.Lock()
+        self.cache: Dict[str, Optional[str]] = self._load_cache()
+        self.api_calls = 0
+        self.cache_hits = 0
+
+    # --- Cache ---
+
+    def _load_cache(self) -> Dict[str, Optional[str]]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Poster cache at {self.cache_path} unreadable ({e}), starting empty.")
+            return {}
+
+    def save_cache(self):
+        """Writes the cache atomically (temp file + rename)."""
+        if not self.cache_path:
+            return
+        with self._cache_lock:
+            snapshot = dict(self.cache)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.cache_path)
+
+    # --- HTTP ---
+
+    def _request_poster_path(self, tmdb_id: int) -> Optional[str]:
+        """
+        One lookup with retries. Returns the poster path (None if TMDB has none).
+        Raises requests.RequestException if the lookup could not be completed.
+        """
+        url = f"{self.base_url}/movie/{tmdb_id}"
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            with self._cache_lock:
+                self.api_calls += 1
+            try:
+                response = self.session.get(url, params={"api_key": self.api_key}, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                self._backoff(attempt)
+                continue
+
+            if response.status_code == 404:
+                return None
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                self._backoff(attempt, response.headers.get("Retry-After"))
+                continue
+            response.raise_for_status()
+            return response.json().get("poster_path")
+        return None # Not reached: the last attempt either returns or raises
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[str] = None):
+        """Exponential backoff with jitter; honours Retry-After when the server sends it."""
+        try:
+            delay = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            delay = None
+        if delay is None:
+            delay = min(30.0, 0.5 * (2 ** attempt)) * (0.5 + random.random())
+        time.sleep(delay)
+
+    def fetch(self, tmdb_id: int) -> Optional[str]:
+        """Poster path for one movie, from the cache if possible. Errors are logged and give None."""
+        key = str(tmdb_id)
+        with self._cache_lock:
+            if key in self.cache:
+                self.cache_hits += 1
+                return self.cache[key]
+        try:
+            poster_path = self._request_poster_path(tmdb_id)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching data for tmdbId {tmdb_id}: {e}")
+            return None # Not cached, so the next seed retries it
+        except Exception as e:
+            print(f"Unexpected error processing tmdbId {tmdb_id}: {e}")
+            return None
+        with self._cache_lock:
+            self.cache[key] = poster_path
+        return poster_path
+
+    def fetch_many(self, tmdb_ids: Iterable[int], progress_every: int = 100) -> Dict[int, Optional[str]]:
+        """Poster paths for many movies, fetched concurrently. Returns tmdbId -> poster path."""
+        unique_ids = list(dict.fromkeys(int(tmdb_id) for tmdb_id in tmdb_ids))
+        results: Dict[int, Optional[str]] = {}
+        start_time = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="tmdb") as pool:
+            futures = {pool.submit(self.fetch, tmdb_id): tmdb_id for tmdb_id in unique_ids}
+            for done, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                if done % progress_every == 0 or done == len(unique_ids):
+                    elapsed_time = time.time() - start_time
+                    print(f"Fetched posters for {done}/{len(unique_ids)} movies... ({elapsed_time:.2f} seconds elapsed, {self.api_calls} API calls, {self.cache_hits} cache hits)")
+                    sys.stdout.flush()
+                if done % CACHE_SAVE_EVERY == 0:
+                    self.save_cache()
+
+        self.save_cache()
+        return results
+
+    def close(self):
+        self.session.close()
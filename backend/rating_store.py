@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from surprise import Trainset
+
+# --- Rating Store ---
+# Array-backed copy of the ratings table used by the ML engine in place of the
+# Surprise trainset's Python dicts and tuple lists. Ratings are grouped by user,
+# so the items a user rated are one contiguous slice found through user_offsets.
+# Raw ids (user/movie primary keys) map to inner ids (row numbers) through dense
+# lookup arrays indexed by the raw id, holding -1 for ids that are not present.
+
+
+@dataclass
+class RatingStore:
+    """Ratings in CSR layout: rows are inner user ids, columns inner item ids."""
+    user_index: np.ndarray    # int32 (n_ratings,), inner user id of each rating
+    item_index: np.ndarray    # int32 (n_ratings,), inner item id of each rating
+    scores: np.ndarray        # float32 (n_ratings,)
+    user_offsets: np.ndarray  # int64 (n_users + 1,), ratings of user u are [user_offsets[u], user_offsets[u + 1])
+    raw_user_ids: np.ndarray  # int64 (n_users,), inner -> raw user id
+    raw_item_ids: np.ndarray  # int64 (n_items,), inner -> raw movie id
+    user_lookup: np.ndarray   # int32 (max raw user id + 1,), raw -> inner user id or -1
+    item_lookup: np.ndarray   # int32 (max raw movie id + 1,), raw -> inner item id or -1
+
+    @property
+    def n_users(self) -> int:
+        return int(self.raw_user_ids.size)
+
+    @property
+    def n_items(self) -> int:
+        return int(self.raw_item_ids.size)
+
+    @property
+    def n_ratings(self) -> int:
+        return int(self.scores.size)
+
+    def inner_user_id(self, raw_user_id: int) -> Optional[int]:
+        """Inner id of a user, or None if they have no ratings in the store."""
+        if 0 <= raw_user_id < self.user_lookup.size:
+            inner = int(self.user_lookup[raw_user_id])
+            if inner >= 0:
+                return inner
+        return None
+
+    def inner_item_ids(self, raw_item_ids: np.ndarray) -> np.ndarray:
+        """Vectorised raw -> inner item id lookup; unknown movies map to -1."""
+        raw_item_ids = np.asarray(raw_item_ids, dtype=np.int64)
+        inner = np.full(raw_item_ids.shape, -1, dtype=np.int32)
+        in_range = (raw_item_ids >= 0) & (raw_item_ids < self.item_lookup.size)
+        inner[in_range] = self.item_lookup[raw_item_ids[in_range]]
+        return inner
+
+    def user_items(self, user_inner_id: int) -> np.ndarray:
+        """Inner ids of the items a user rated: an O(ratings of that user) slice."""
+        return self.item_index[self.user_offsets[user_inner_id]:self.user_offsets[user_inner_id + 1]]
+
+    def user_scores(self, user_inner_id: int) -> np.ndarray:
+        """Scores matching user_items(user_inner_id)."""
+        return self.scores[self.user_offsets[user_inner_id]:self.user_offsets[user_inner_id + 1]]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "user_index": self.user_index,
+            "item_index": self.item_index,
+            "scores": self.scores,
+            "user_offsets": self.user_offsets,
+            "raw_user_ids": self.raw_user_ids,
+            "raw_item_ids": self.raw_item_ids,
+            "user_lookup": self.user_lookup,
+            "item_lookup": self.item_lookup,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "RatingStore":
+        return cls(**{name: arrays[name] for name in cls.__dataclass_fields__})
+
+    def to_surprise_trainset(self, rating_scale: Tuple[float, float]) -> Trainset:
+        """
+        Builds a Surprise Trainset whose inner ids are the store's inner ids,
+        so fitted factor rows line up with the store without any id translation.
+        """
+        ur = defaultdict(list)
+        ir = defaultdict(list)
+        for u, i, r in zip(self.user_index.tolist(), self.item_index.tolist(), self.scores.tolist()):
+            ur[u].append((i, r))
+            ir[i].append((u, r))
+        return Trainset(
+            ur,
+            ir,
+            self.n_users,
+            self.n_items,
+            self.n_ratings,
+            rating_scale,
+            {int(raw): inner for inner, raw in enumerate(self.raw_user_ids.tolist())},
+            {int(raw): inner for inner, raw in enumerate(self.raw_item_ids.tolist())},
+        )
+
+
+def _dense_lookup(raw_ids: np.ndarray) -> np.ndarray:
+    """raw id -> position in raw_ids, -1 elsewhere."""
+    lookup = np.full(int(raw_ids.max()) + 1 if raw_ids.size else 0, -1, dtype=np.int32)
+    lookup[raw_ids] = np.arange(raw_ids.size, dtype=np.int32)
+    return lookup
+
+
+def build_rating_store(user_ids: np.ndarray, movie_ids: np.ndarray, scores: np.ndarray) -> RatingStore:
+    """
+    Builds a store from parallel arrays of raw user ids, raw movie ids and scores.
+    Inner ids are assigned in order of first appearance, like Surprise does, and
+    each user's ratings keep their input order.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    movie_ids = np.asarray(movie_ids, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float32)
+    if (user_ids < 0).any() or (movie_ids < 0).any():
+        raise ValueError("Rating store requires non-negative user and movie ids.")
+
+    user_codes, raw_user_ids = pd.factorize(user_ids)
+    item_codes, raw_item_ids = pd.factorize(movie_ids)
+
+    order = np.argsort(user_codes, kind="stable")
+    user_index = user_codes[order].astype(np.int32)
+    counts = np.bincount(user_index, minlength=raw_user_ids.size)
+    user_offsets = np.zeros(raw_user_ids.size + 1, dtype=np.int64)
+    np.cumsum(counts, out=user_offsets[1:])
+
+    raw_user_ids = np.asarray(raw_user_ids, dtype=np.int64)
+    raw_item_ids = np.asarray(raw_item_ids, dtype=np.int64)
+    return RatingStore(
+        user_index=user_index,
+        item_index=item_codes[order].astype(np.int32),
+        scores=scores[order],
+        user_offsets=user_offsets,
+        raw_user_ids=raw_user_ids,
+        raw_item_ids=raw_item_ids,
+        user_lookup=_dense_lookup(raw_user_ids),
+        item_lookup=_dense_lookup(raw_item_ids),
+    )
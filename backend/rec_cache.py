@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+# --- Configuration ---
+# Per-user cache of finished recommendation lists. An entry is tagged with the
+# version of everything it was computed from, and only served for that exact
+# version. The parts come from state every worker can see:
+#   - the published model artifact (ml_engine.model_cache_key),
+#   - a fingerprint of the user's ratings as read from the database
+#     (ml_engine.UserRatings.stamp),
+#   - the catalog version (catalog.version_tag).
+# Keys therefore never collide across workers or restarts, and a backend shared
+# between processes can serve any of them. The TTL bounds how long an entry
+# lives, not whether it is correct.
+REC_CACHE_MAX_ENTRIES = int(os.getenv("REC_CACHE_MAX_ENTRIES", "10000"))
+REC_CACHE_TTL_SECONDS = float(os.getenv("REC_CACHE_TTL_SECONDS", "300")) # 0 disables the cache
+
+CacheVersion = Tuple[str, str, str] # (model key, user rating stamp, catalog version)
+
+
+@dataclass
+class CacheEntry:
+    version: CacheVersion
+    value: Any
+    expires_at: float       # time.time() deadline (wall clock, so it means the same in every process)
+    compute_seconds: float  # What it cost to produce; each hit saves this much
+
+
+class RecommendationCacheBackend(ABC):
+    """
+    Storage interface for RecommendationCache, one entry per user.
+    Implement this to keep entries somewhere else (e.g. a shared Redis) and
+    install it with recommendation_cache.set_backend().
+    """
+
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[CacheEntry]:
+        ...
+
+    @abstractmethod
+    def set(self, user_id: int, entry: CacheEntry):
+        ...
+
+    @abstractmethod
+    def delete(self, user_id: int):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+
+class LRUCacheBackend(RecommendationCacheBackend):
+    """In-process LRU, thread-safe, holding at most max_entries users."""
+
+    def __init__(self, max_entries: int = REC_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+            return entry
+
+    def set(self, user_id: int, entry: CacheEntry):
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RecommendationCache:
+    """Version-checked, TTL-bounded cache of per-user recommendation results with hit/miss metrics."""
+
+    def __init__(self, backend: Optional[RecommendationCacheBackend] = None, ttl_seconds: float = REC_CACHE_TTL_SECONDS):
+        self.backend = backend or LRUCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0            # Misses caused by an expired or outdated entry
+        self.invalidations = 0
+        self.saved_seconds = 0.0  # Sum of compute_seconds over all hits
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def set_backend(self, backend: RecommendationCacheBackend):
+        self.backend = backend
+
+    def get(self, user_id: int, version: CacheVersion) -> Optional[Any]:
+        """The cached result for this user if it was computed for `version` and has not expired, else None."""
+        if not self.enabled:
+            return None
+        entry = self.backend.get(user_id)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.version != version or entry.expires_at <= time.time():
+                self.misses += 1
+                self.stale += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry.compute_seconds
+        return entry.value
+
+    def put(self, user_id: int, version: CacheVersion, value: Any, compute_seconds: float):
+        if not self.enabled:
+            return
+        entry = CacheEntry(
+            version=version,
+            value=value,
+            expires_at=time.time() + self.ttl_seconds,
+            compute_seconds=compute_seconds,
+        )
+        self.backend.set(user_id, entry)
+
+    def invalidate_user(self, user_id: int):
+        """
+        Drops the user's entry after their ratings changed. Not needed for correctness
+        (the rating stamp in the version already changed), only to free the entry early.
+        """
+        with self._lock:
+            self.invalidations += 1
+        self.backend.delete(user_id)
+
+    def invalidate_all(self):
+        """Drops every entry, e.g. after a new model is published (old entries can no longer match)."""
+        with self._lock:
+            self.invalidations += 1
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+        if isinstance(self.backend, LRUCacheBackend):
+            stats["max_entries"] = self.backend.max_entries
+            stats["evictions"] = self.backend.evictions
+        return stats
+
+
+# Shared instance used by the API
+recommendation_cache = RecommendationCache()
@@ -0,0 +1,230 @@
+import bisect
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Sequence
+import catalog
+import genres
+import models
+from migrations import MOVIE_FTS_TABLE
+
+# --- Configuration ---
+# One entry point, search_movies(), over three backends:
+#   "postgres" - tsvector column + GIN index (to_tsquery with prefix terms)
+#   "fts5"     - SQLite FTS5 table, ranked by bm25
+#   "memory"   - in-process inverted index over titles, for databases without either
+# The database indexes are created by migrations.add_movie_search_index.
+# Every query term is matched as a prefix ("star wa" finds "Star Wars"), all terms
+# must match, and results come back best match first, one page at a time: the
+# backends apply offset/limit (and an optional genre filter) themselves and report
+# the total number of matches.
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "500")) # Largest page one search returns
+SEARCH_INDEX_REFRESH_SECONDS = float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "60")) # In-memory index: catalog check interval
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(value: str, fold_diacritics: bool = True) -> List[str]:
+    """Lower-cased word tokens; with fold_diacritics, accents are stripped (like FTS5's remove_diacritics)."""
+    value = value.lower()
+    if fold_diacritics:
+        value = "".join(c for c in unicodedata.normalize("NFKD", value) if not unicodedata.combining(c))
+    return TOKEN_PATTERN.findall(value)
+
+
+# --- Backend Detection ---
+_backends: Dict[str, str] = {} # engine url -> backend name
+
+
+def search_backend(db: Session) -> str:
+    """Which backend serves this database (detected once per engine)."""
+    engine = db.get_bind()
+    key = str(engine.url)
+    backend = _backends.get(key)
+    if backend is None:
+        inspector = inspect(engine)
+        if engine.dialect.name == "postgresql" and "search_vector" in {c["name"] for c in inspector.get_columns("movies")}:
+            backend = "postgres"
+        elif engine.dialect.name == "sqlite" and MOVIE_FTS_TABLE in inspector.get_table_names():
+            backend = "fts5"
+        else:
+            backend = "memory"
+        _backends[key] = backend
+        print(f"Movie search backend: {backend}") # Keep essential status messages
+    return backend
+
+
+@dataclass
+class SearchPage:
+    movie_ids: List[int] # This page, best match first
+    total: int           # Matches over all pages
+
+
+# --- Database Backends ---
+
+def _genre_clause(id_column: str, genre_ids: Sequence[int], params: Dict[str, Any]) -> str:
+    """SQL restricting id_column to movies that have every one of the genres (indexed lookups)."""
+    clauses = []
+    for position, genre_id in enumerate(genre_ids):
+        params[f"genre_{position}"] = int(genre_id)
+        clauses.append(f" AND {id_column} IN (SELECT movie_id FROM movie_genres WHERE genre_id = :genre_{position})")
+    return "".join(clauses)
+
+
+def _search_page(db: Session, id_column: str, from_where: str, order_by: str, params: Dict[str, Any],
+                 offset: int, limit: int) -> SearchPage:
+    """One page of ids plus the match count, in a single query (count(*) OVER () is computed before LIMIT)."""
+    rows = db.execute(
+        text(f"SELECT {id_column}, count(*) OVER () {from_where} ORDER BY {order_by} LIMIT :limit OFFSET :offset"),
+        {**params, "limit": limit, "offset": offset},
+    ).all()
+    if rows:
+        return SearchPage([row[0] for row in rows], int(rows[0][1]))
+    # Past the last match, the window count comes back without rows
+    total = db.execute(text(f"SELECT count(*) {from_where}"), params).scalar() if offset else 0
+    return SearchPage([], int(total))
+
+
+def _search_postgres(db: Session, tokens: List[str], genre_ids: Sequence[int], offset: int, limit: int) -> SearchPage:
+    params = {"query": " & ".join(f"{token}:*" for token in tokens)}
+    from_where = "FROM movies, to_tsquery('simple', :query) AS query WHERE search_vector @@ query" + _genre_clause("id", genre_ids, params)
+    return _search_page(db, "id", from_where, "ts_rank(search_vector, query) DESC, id", params, offset, limit)
+
+
+def _search_fts5(db: Session, tokens: List[str], genre_ids: Sequence[int], offset: int, limit: int) -> SearchPage:
+    params = {"query": " AND ".join(f'"{token}"*' for token in tokens)} # Tokens are \w+ only, so quoting is safe
+    from_where = f"FROM {MOVIE_FTS_TABLE} WHERE {MOVIE_FTS_TABLE} MATCH :query" + _genre_clause("rowid", genre_ids, params)
+    return _search_page(db, "rowid", from_where, "rank, rowid", params, offset, limit)
+
+
+# --- In-Memory Backend ---
+
+@dataclass
+class InvertedIndex:
+    vocabulary: List[str]               # Sorted terms, for prefix range lookups
+    postings: Dict[str, List[int]]      # term -> movie ids
+    title_lengths: Dict[int, int]       # movie id -> number of title tokens
+    signature: tuple                    # (movie count, max movie id) when built
+    version: str                        # catalog.version_tag() when built
+    checked_at: float                   # time.monotonic() of the last signature check
+
+    @classmethod
+    def build(cls, rows, signature: tuple, version: str) -> "InvertedIndex":
+        postings = defaultdict(set)
+        title_lengths = {}
+        for movie_id, title in rows:
+            tokens = tokenize(title or "")
+            title_lengths[movie_id] = len(tokens)
+            for token in tokens:
+                postings[token].add(movie_id)
+        return cls(
+            vocabulary=sorted(postings),
+            postings={term: sorted(ids) for term, ids in postings.items()},
+            title_lengths=title_lengths,
+            signature=signature,
+            version=version,
+            checked_at=time.monotonic(),
+        )
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\U0010ffff")
+        return self.vocabulary[start:end]
+
+    def search(self, tokens: List[str]) -> List[int]:
+        """
+        Movies whose titles contain every token as a word prefix, scored by the summed
+        idf of the matching terms (exact words count double), shorter titles first on ties.
+        """
+        total = max(len(self.title_lengths), 1)
+        scores: Optional[Dict[int, float]] = None
+        for token in tokens:
+            token_scores: Dict[int, float] = {}
+            for term in self._prefix_terms(token):
+                ids = self.postings[term]
+                weight = math.log(1 + total / len(ids)) * (2.0 if term == token else 1.0)
+                for movie_id in ids:
+                    if weight > token_scores.get(movie_id, 0.0):
+                        token_scores[movie_id] = weight
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {movie_id: score + token_scores[movie_id] for movie_id, score in scores.items() if movie_id in token_scores}
+            if not scores:
+                return []
+        return sorted(scores, key=lambda movie_id: (-scores[movie_id], self.title_lengths[movie_id], movie_id))
+
+
+memory_index: Optional[InvertedIndex] = None
+_memory_index_lock = threading.Lock()
+
+
+def _catalog_signature(db: Session) -> tuple:
+    count, max_id = db.execute(select(func.count(models.Movie.id), func.max(models.Movie.id))).one()
+    return (count, max_id)
+
+
+def get_memory_index(db: Session) -> InvertedIndex:
+    """
+    The in-memory index, rebuilt after a catalog change notification (any worker)
+    or when the movies table changed (checked at most every SEARCH_INDEX_REFRESH_SECONDS).
+    """
+    global memory_index
+    version = catalog.version_tag()
+    index = memory_index
+    if index is not None and index.version == version and time.monotonic() - index.checked_at < SEARCH_INDEX_REFRESH_SECONDS:
+        return index
+    with _memory_index_lock:
+        index = memory_index
+        if index is not None and index.version == version:
+            if time.monotonic() - index.checked_at < SEARCH_INDEX_REFRESH_SECONDS:
+                return index
+            signature = _catalog_signature(db)
+            if index.signature == signature:
+                index.checked_at = time.monotonic()
+                return index
+        else:
+            signature = _catalog_signature(db)
+        start_time = time.time()
+        rows = db.execute(select(models.Movie.id, models.Movie.title)).all()
+        index = InvertedIndex.build(rows, signature, version)
+        memory_index = index
+        print(f"Search: Built in-memory index for {len(rows)} movies in {time.time() - start_time:.2f} seconds.") # Keep essential status messages
+        return index
+
+
+def invalidate_memory_index():
+    """Forces the next search in this process to rebuild (other workers follow catalog.notify_catalog_changed)."""
+    global memory_index
+    memory_index = None
+
+
+# --- Search ---
+
+def search_movies(db: Session, query: str, offset: int = 0, limit: int = SEARCH_MAX_RESULTS,
+                  genre_ids: Sequence[int] = ()) -> SearchPage:
+    """
+    One page (offset/limit, at most SEARCH_MAX_RESULTS) of the movies matching the query,
+    best match first, optionally restricted to movies that have every one of genre_ids.
+    A query without searchable words (e.g. only punctuation) matches nothing.
+    """
+    backend = search_backend(db)
+    tokens = tokenize(query, fold_diacritics=backend != "postgres")
+    if not tokens:
+        return SearchPage([], 0)
+    offset, limit = max(offset, 0), max(min(limit, SEARCH_MAX_RESULTS), 0)
+    if backend == "postgres":
+        return _search_postgres(db, tokens, genre_ids, offset, limit)
+    if backend == "fts5":
+        return _search_fts5(db, tokens, genre_ids, offset, limit)
+    ranked = get_memory_index(db).search(tokens)
+    if genre_ids:
+        ranked = genres.get_genre_index(db).filter_by_ids(ranked, genre_ids)
+    return SearchPage(ranked[offset:offset + limit], len(ranked))
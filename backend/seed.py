@@ -1,7 +1,7 @@
 import pandas as pd
 import sqlalchemy
 from sqlalchemy.orm import Session
-from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Float, ForeignKey, DateTime, UniqueConstraint, inspect, text
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Float, ForeignKey, DateTime, UniqueConstraint, inspect, text, select, bindparam
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.declarative import declarative_base
 # Use DB URL from database.py logic (reads from env var)
@@ -10,13 +10,22 @@ from database import DATABASE_URL, engine as db_engine, Base, SessionLocal, get_
 import models
 # Use the hashing function defined within seed.py itself
 # from auth import get_password_hash # Removed import from auth
+import argparse
+import fcntl
+import io
+import json
 import os
-import requests
+import resource
 import time
 import sys # For flushing output
 from datetime import datetime, timezone # Added timezone
 from dotenv import load_dotenv # Import load_dotenv
 from passlib.context import CryptContext # Import for password hashing helper
+from poster_fetcher import PosterFetcher # Concurrent, cached TMDB poster lookups
+from migrations import run_migrations, drop_movie_search_index # Schema steps outside the ORM models
+from genres import sync_movie_genres # Normalized genre links
+from catalog import notify_catalog_changed # Tells running API workers to reload their movie catalog
+from auth import LOGIN_DISABLED_HASH # Stored for seed accounts that must not log in with a password
 
 # --- Configuration ---
 # Load environment variables first (looks for .env in parent dir)
@@ -27,7 +36,6 @@ if os.path.exists(dotenv_path):
 # Read TMDB API Key from Environment Variable
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
 TMDB_POSTER_BASE_URL = "https://image.tmdb.org/t/p/w500"
 
 # --- Define file paths (Looking in the root folder) ---
@@ -37,24 +45,118 @@ RATINGS_CSV = os.path.join(ROOT_DIR, "backend", "ratings.csv") # Path relative t
 MOVIES_CSV = os.path.join(ROOT_DIR, "backend", "movies.csv") # Path relative to project root
 LINKS_CSV = os.path.join(ROOT_DIR, "backend", "links.csv") # Path relative to project root
 
-# --- Helper Function for TMDB API ---
-def get_movie_details(tmdb_id):
-    """Fetches movie details from TMDB API."""
-    if not tmdb_id or not TMDB_API_KEY:
-        return None
+# --- Poster Enrichment ---
+def fetch_poster_paths(movie_ids: pd.Series, movie_to_tmdb_map: dict) -> list:
+    """TMDB poster path for each movie id (None if unknown), fetched through PosterFetcher."""
+    tmdb_ids = [movie_to_tmdb_map.get(movie_id) for movie_id in movie_ids]
+    fetcher = PosterFetcher(api_key=TMDB_API_KEY)
     try:
-        url = f"{TMDB_BASE_URL}/movie/{tmdb_id}?api_key={TMDB_API_KEY}"
-        response = requests.get(url)
-        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-        data = response.json()
-        poster_path = data.get('poster_path')
-        return poster_path
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching data for tmdbId {tmdb_id}: {e}")
-        return None
-    except Exception as e:
-        print(f"Unexpected error processing tmdbId {tmdb_id}: {e}")
-        return None
+        posters = fetcher.fetch_many(tmdb_id for tmdb_id in tmdb_ids if tmdb_id)
+    finally:
+        fetcher.close()
+    return [posters.get(tmdb_id) if tmdb_id else None for tmdb_id in tmdb_ids]
+
+
+# --- Title Parsing ---
+def parse_titles(raw_titles: pd.Series):
+    """
+    Splits MovieLens titles like "Toy Story (1995)" into ("Toy Story", 1995).
+    Trailing year ranges such as "(2007-)" are stripped without setting a year.
+    Returns (titles, release_years) with the years as a nullable integer Series.
+    """
+    titles = raw_titles.fillna('').astype(str).str.strip()
+    release_years = pd.to_numeric(titles.str.extract(r'\((\d{4})\)$')[0], errors='coerce').astype('Int64')
+    titles = titles.str.replace(r'\s*\(\d[\d-]*\)$', '', regex=True).str.strip()
+    return titles, release_years
+
+
+# --- Bulk Loading ---
+# Rows are written with SQLAlchemy Core executemany in batches, or with
+# COPY FROM STDIN when the engine is PostgreSQL. Each stage reports rows/sec.
+BULK_INSERT_BATCH_SIZE = int(os.getenv("BULK_INSERT_BATCH_SIZE", "10000"))
+
+def _copy_into(engine, table: Table, rows: pd.DataFrame):
+    """PostgreSQL fast path: stream the rows as CSV through COPY."""
+    buffer = io.StringIO()
+    rows.to_csv(buffer, index=False, header=False, na_rep='')
+    buffer.seek(0)
+    columns = ", ".join(rows.columns)
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table.name} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+def bulk_insert(engine, table: Table, rows: pd.DataFrame, stage: str, report: bool = True) -> int:
+    """Inserts all rows of a DataFrame (columns named after table columns). Returns the row count."""
+    if rows.empty:
+        return 0
+    start_time = time.time()
+    if engine.dialect.name == "postgresql":
+        _copy_into(engine, table, rows)
+    else:
+        # None instead of NaN/NA so nullable columns get NULL
+        rows = rows.astype(object).where(rows.notna(), None)
+        records = rows.to_dict(orient='records')
+        with engine.begin() as conn:
+            for start in range(0, len(records), BULK_INSERT_BATCH_SIZE):
+                conn.execute(table.insert(), records[start:start + BULK_INSERT_BATCH_SIZE])
+    if report:
+        report_stage(stage, len(rows), time.time() - start_time, action="Inserted")
+    return len(rows)
+
+
+# --- Streaming CSV Ingestion ---
+# ratings.csv is read in chunks with compact dtypes and every chunk is validated
+# and written before the next one is read, so peak memory depends on the chunk
+# size rather than the file size (MovieLens-25M included).
+SEED_RATINGS_CHUNK_SIZE = int(os.getenv("SEED_RATINGS_CHUNK_SIZE", "50000"))
+RATINGS_DTYPES = {'userId': 'int32', 'movieId': 'int32', 'rating': 'float32', 'timestamp': 'int64'}
+MOVIES_DTYPES = {'movieId': 'int32', 'title': 'string', 'genres': 'string'}
+
+def peak_memory_mb() -> float:
+    """High-water mark of this process's resident memory (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def report_stage(stage: str, rows: int, elapsed: float, action: str = "Loaded"):
+    """Prints row count, throughput and the memory high-water mark for a stage."""
+    rate = rows / elapsed if elapsed > 0 else float(rows)
+    print(f"[{stage}] {action} {rows} rows in {elapsed:.2f} seconds ({rate:,.0f} rows/sec, peak memory {peak_memory_mb():.0f} MB)")
+    sys.stdout.flush()
+
+def read_rating_chunks(columns=('userId', 'movieId', 'rating', 'timestamp')):
+    """Iterator over ratings.csv in DataFrame chunks of SEED_RATINGS_CHUNK_SIZE rows."""
+    return pd.read_csv(
+        RATINGS_CSV,
+        usecols=list(columns),
+        dtype={column: RATINGS_DTYPES[column] for column in columns},
+        chunksize=SEED_RATINGS_CHUNK_SIZE,
+    )
+
+def clean_rating_chunk(chunk: pd.DataFrame, movie_ids, user_ids=None) -> pd.DataFrame:
+    """
+    Validated ratings table rows (user_id, movie_id, score, rated_at) for one chunk of ratings.csv.
+    Drops unknown movies (and unknown users if user_ids is given), out-of-range
+    scores and repeated (user, movie) pairs within the chunk (the last one wins).
+    """
+    valid = chunk['movieId'].isin(movie_ids) & chunk['rating'].between(0.5, 5.0)
+    if user_ids is not None:
+        valid &= chunk['userId'].isin(user_ids)
+    rows = (
+        chunk[valid]
+        .drop_duplicates(subset=['userId', 'movieId'], keep='last') # Respect _user_movie_rating_uc
+        .rename(columns={'userId': 'user_id', 'movieId': 'movie_id', 'rating': 'score'})
+    )
+    # MovieLens timestamps are Unix seconds (UTC)
+    rows['rated_at'] = pd.to_datetime(rows['timestamp'], unit='s', utc=True)
+    return rows[['user_id', 'movie_id', 'score', 'rated_at']]
+
 
 # --- Password Hashing Helper (Copied from auth.py to avoid import issues) ---
 pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
@@ -64,6 +166,67 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 # --- End Helper ---
 
+# --- Seed Account Passwords ---
+# Argon2 is deliberately slow, so seed users never get a hash each:
+#   "shared"   - hash SEED_USER_PASSWORD once and give every seed user that hash
+#   "disabled" - store LOGIN_DISABLED_HASH, which no password verifies against
+SEED_USER_PASSWORD_MODE = os.getenv("SEED_USER_PASSWORD_MODE", "shared").lower()
+SEED_USER_PASSWORD = os.getenv("SEED_USER_PASSWORD", "password123")
+_seed_password_hash = None
+
+def seed_password_hash() -> str:
+    """The hash stored for every seed user (computed at most once per run)."""
+    global _seed_password_hash
+    if SEED_USER_PASSWORD_MODE == "disabled":
+        return LOGIN_DISABLED_HASH
+    if SEED_USER_PASSWORD_MODE != "shared":
+        print(f"WARNING: Unknown SEED_USER_PASSWORD_MODE '{SEED_USER_PASSWORD_MODE}', using 'shared'.")
+    if _seed_password_hash is None:
+        _seed_password_hash = get_password_hash(SEED_USER_PASSWORD)
+    return _seed_password_hash
+
+# --- Row Preparation (shared by the full and incremental seeders) ---
+def load_movie_links() -> dict:
+    """movieId -> tmdbId from links.csv."""
+    links_df = pd.read_csv(LINKS_CSV)
+    links_df = links_df[pd.to_numeric(links_df['tmdbId'], errors='coerce').notnull()]
+    links_df['tmdbId'] = links_df['tmdbId'].astype(int)
+    return pd.Series(links_df.tmdbId.values, index=links_df.movieId).to_dict()
+
+def prepare_movie_rows(movies_df: pd.DataFrame) -> pd.DataFrame:
+    """Validated movies.csv rows as movies table rows (poster_url still empty)."""
+    movies_df = movies_df[pd.to_numeric(movies_df['movieId'], errors='coerce').notnull()].copy()
+    movies_df['movieId'] = movies_df['movieId'].astype(int)
+    movies_df = movies_df.drop_duplicates(subset='movieId', keep='first')
+    movies_df['title'], movies_df['release_year'] = parse_titles(movies_df['title'])
+    skipped = movies_df['title'] == ''
+    if skipped.any():
+        print(f"Skipping {int(skipped.sum())} movies due to missing title.")
+    movies_df = movies_df[~skipped]
+    movies_df['genres'] = movies_df['genres'].where(movies_df['genres'].notna(), "N/A")
+    return pd.DataFrame({
+        'id': movies_df['movieId'],
+        'title': movies_df['title'],
+        'description': None,
+        'release_year': movies_df['release_year'],
+        'genres': movies_df['genres'],
+        'poster_url': None,
+    }).reset_index(drop=True)
+
+def build_user_rows(user_ids) -> pd.DataFrame:
+    """
+    Placeholder accounts for MovieLens user ids, built in one vectorized pass.
+    The password hash is computed once for the whole batch (see SEED_USER_PASSWORD_MODE).
+    """
+    user_ids = pd.Series(user_ids, dtype='int64')
+    return pd.DataFrame({
+        'id': user_ids,
+        'username': "user_" + user_ids.astype(str),
+        'email': "user_" + user_ids.astype(str) + "@example.com",
+        'hashed_password': seed_password_hash(),
+    })
+
+
 # --- Main Seeding Function ---
 def seed_database():
     """Drops existing tables, recreates them, reads CSV files and populates the database."""
@@ -97,7 +260,10 @@ def seed_database():
         # --- MODIFICATION START: Drop existing tables ---
         print("\nDropping existing tables (if they exist)...")
         sys.stdout.flush()
-        # Reflect metadata to ensure drop_all knows about tables, even if Base is slightly different
+        # FTS5 shadow tables can't be dropped directly, so remove the search index first
+        drop_movie_search_index(engine)
+        # Reflect metadata to ensure drop_all knows about tables, even if Base is slightly different.
+        # This includes seed_checkpoints, so an incremental import afterwards starts from scratch.
         meta = MetaData()
         meta.reflect(bind=engine)
         meta.drop_all(bind=engine)
@@ -109,6 +275,7 @@ def seed_database():
         print("\nCreating database tables...")
         sys.stdout.flush()
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine) # Search index (and any other non-ORM schema)
         print("Tables created successfully.")
         sys.stdout.flush()
 
@@ -127,10 +294,7 @@ def seed_database():
         print(f"\nLoading links from {LINKS_CSV}...")
         sys.stdout.flush()
         try:
-            links_df = pd.read_csv(LINKS_CSV)
-            links_df = links_df[pd.to_numeric(links_df['tmdbId'], errors='coerce').notnull()]
-            links_df['tmdbId'] = links_df['tmdbId'].astype(int)
-            movie_to_tmdb_map = pd.Series(links_df.tmdbId.values, index=links_df.movieId).to_dict()
+            movie_to_tmdb_map = load_movie_links()
             print(f"Loaded {len(movie_to_tmdb_map)} movie links.")
             sys.stdout.flush()
         except FileNotFoundError:
@@ -146,7 +310,7 @@ def seed_database():
         print(f"\nLoading movies from {MOVIES_CSV}...")
         sys.stdout.flush()
         try:
-            movies_df = pd.read_csv(MOVIES_CSV)
+            movies_df = pd.read_csv(MOVIES_CSV, dtype=MOVIES_DTYPES)
             print(f"Fetching details for {len(movies_df)} movies from TMDB (this will take several minutes)...")
             sys.stdout.flush()
         except FileNotFoundError:
@@ -158,208 +322,68 @@ def seed_database():
             db.close()
             sys.exit(1)
 
-        movies_to_add = []
-        processed_movie_ids = set()
-        start_time = time.time()
-        api_call_count = 0
-
-        # No need to check existing movies as we dropped tables
-        # existing_movie_ids = set()
-        # print(f"Database starts with 0 movies.")
-
-        for index, row in movies_df.iterrows():
-            try: # Add try block for processing each movie row
-                movie_id = int(row['movieId'])
-            except (ValueError, TypeError):
-                print(f"Skipping movie at index {index}: Invalid movieId.")
-                continue
-
+        # --- Prepare movies (vectorized) ---
+        movie_rows = prepare_movie_rows(movies_df)
 
-            tmdb_id = movie_to_tmdb_map.get(movie_id)
-            poster_url = None
-            if tmdb_id:
-                poster_url = get_movie_details(tmdb_id)
-                api_call_count += 1
-                time.sleep(0.05)
-
-            title = row.get('title', '').strip()
-            year_str = ''.join(filter(str.isdigit, title[-5:]))
-            release_year = int(year_str) if year_str.isdigit() and len(year_str) == 4 else None
-            if release_year and title.endswith(f" ({release_year})"):
-                 title = title[:-len(f" ({release_year})")].strip()
-            elif '(' in title and ')' in title and title[-1] == ')':
-                 potential_year_part = title[title.rfind('('):]
-                 if len(potential_year_part) > 2 and potential_year_part[1:-1].replace('-','').isdigit():
-                      title = title[:title.rfind('(')].strip()
-
-            if not title:
-                 print(f"Skipping movie with ID {movie_id} due to missing title.")
-                 continue
-
-            movie = models.Movie(
-                id=movie_id,
-                title=title if title else "Unknown Title",
-                genres=row.get('genres') if pd.notna(row.get('genres')) else "N/A",
-                description=None,
-                release_year=release_year,
-                poster_url=poster_url
-            )
-            movies_to_add.append(movie)
-            processed_movie_ids.add(movie_id)
-
-            if (index + 1) % 100 == 0 or index == len(movies_df) - 1:
-                elapsed_time = time.time() - start_time
-                print(f"Processed {index + 1}/{len(movies_df)} movies... ({elapsed_time:.2f} seconds elapsed, {api_call_count} API calls)")
-                sys.stdout.flush()
+        # --- Fetch posters (concurrent, rate limited, cached on disk by tmdbId) ---
+        movie_rows['poster_url'] = fetch_poster_paths(movie_rows['id'], movie_to_tmdb_map)
 
-        if movies_to_add:
-            try:
-                # Add movies one by one for resilience
-                added_count = 0
-                for movie_obj in movies_to_add:
-                    try:
-                        db.add(movie_obj)
-                        db.flush()
-                        added_count += 1
-                    except sqlalchemy.exc.IntegrityError: # Should not happen with drop_all
-                        db.rollback()
-                        print(f"Skipping duplicate movie ID during add: {movie_obj.id}")
-                    except Exception as e_inner:
-                        db.rollback()
-                        print(f"Error adding movie ID {movie_obj.id}: {e_inner}. Skipping.")
-                db.commit()
-                print(f"Successfully added {added_count} new movies.")
-                sys.stdout.flush()
-            except Exception as e:
-                 print(f"\nERROR during final movie commit: {e}. Rolling back.")
-                 db.rollback()
-        else:
-            print("No movies processed to add.")
-
-
-        # --- Load Users ---
-        print(f"\nLoading ratings from {RATINGS_CSV} to find users...")
-        sys.stdout.flush()
+        # --- Insert movies ---
         try:
-            ratings_df = pd.read_csv(RATINGS_CSV)
-            ratings_df = ratings_df[pd.to_numeric(ratings_df['userId'], errors='coerce').notnull()]
-            ratings_df['userId'] = ratings_df['userId'].astype(int)
-            user_ids = ratings_df['userId'].unique()
-            print(f"Found {len(user_ids)} unique users. Creating user objects...")
+            added_count = bulk_insert(engine, models.Movie.__table__, movie_rows, stage="movies")
+            sync_movie_genres(engine, movie_rows[['id', 'genres']].itertuples(index=False))
+            notify_catalog_changed()
+            print(f"Successfully added {added_count} new movies.")
             sys.stdout.flush()
-        except FileNotFoundError:
-            print(f"ERROR: ratings.csv not found at {RATINGS_CSV}.")
-            db.close()
-            sys.exit(1)
         except Exception as e:
-            print(f"ERROR: Failed to load or process ratings.csv for users: {e}")
+            print(f"\nERROR during movie bulk insert: {e}. Cannot proceed with users and ratings.")
+            sys.stdout.flush()
             db.close()
             sys.exit(1)
 
-        users_to_add = []
-        processed_user_ids = set()
-
-        # No need to check existing users
-        # existing_user_ids = set()
-        # print(f"Database starts with 0 users.")
-
-        for user_id in user_ids:
-             user_id_int = int(user_id)
-             try:
-                 hashed_password = get_password_hash("password123")
-                 user = models.User(
-                     id=user_id_int,
-                     username=f"user_{user_id_int}",
-                     email=f"user_{user_id_int}@example.com",
-                     hashed_password=hashed_password
-                 )
-                 users_to_add.append(user)
-                 processed_user_ids.add(user_id_int)
-             except Exception as e_hash:
-                 print(f"Error creating user {user_id_int}: {e_hash}. Skipping.")
-
-        if users_to_add:
-             try:
-                 db.add_all(users_to_add)
-                 db.commit()
-                 print(f"Successfully processed and added {len(users_to_add)} new users.")
-                 sys.stdout.flush()
-             except Exception as e: # Catch broader errors as duplicates shouldn't happen
-                 print(f"\nERROR during user batch commit: {e}. Rolling back batch.")
-                 db.rollback()
-                 processed_user_ids = set() # Reset processed users on failure
-        else:
-             print("No users processed to add.")
-
 
-        # --- Load Ratings ---
-        print(f"\nAdding ratings (this may take a moment)...")
+        # --- Stream ratings; each chunk's new users are inserted before its ratings ---
+        print(f"\nStreaming ratings from {RATINGS_CSV} in chunks of {SEED_RATINGS_CHUNK_SIZE} rows...")
         sys.stdout.flush()
-        ratings_count = 0
-        added_ratings_count = 0
-        batch_size = 10000
-        ratings_to_add = []
-        start_time = time.time()
-
-        for index, row in ratings_df.iterrows():
-            try:
-                user_id = int(row['userId'])
-                movie_id = int(row['movieId'])
-                rating_score = float(row['rating'])
-            except (ValueError, TypeError):
-                # print(f"Skipping rating at index {index}: Invalid data types.") # Can be noisy
-                continue
-
-            # Check if user and movie were successfully added earlier
-            if user_id not in processed_user_ids:
-                continue
-            if movie_id not in processed_movie_ids:
-                continue
-
-            if not (0.5 <= rating_score <= 5.0):
-                # print(f"Skipping rating for user {user_id}, movie {movie_id}: Invalid score {rating_score}") # Can be noisy
-                continue
+        movie_ids = movie_rows['id'].to_numpy()
+        known_user_ids = set()
+        rows_read, added_users, added_ratings_count, updated_ratings_count = 0, 0, 0, 0
+        users_elapsed, ratings_elapsed = 0.0, 0.0
+        try:
+            for chunk in read_rating_chunks():
+                rows_read += len(chunk)
+                rating_rows = clean_rating_chunk(chunk, movie_ids)
 
-            rating = models.Rating(
-                user_id=user_id,
-                movie_id=movie_id,
-                score=rating_score
-            )
-            ratings_to_add.append(rating)
-            ratings_count += 1
+                stage_start = time.time()
+                new_user_ids = [user_id for user_id in rating_rows['user_id'].unique().tolist() if user_id not in known_user_ids]
+                added_users += bulk_insert(engine, models.User.__table__, build_user_rows(new_user_ids), stage="users", report=False)
+                known_user_ids.update(new_user_ids)
+                users_elapsed += time.time() - stage_start
 
-            # Commit in batches
-            if ratings_count % batch_size == 0 or index == len(ratings_df) - 1:
-                batch_start_index = index - len(ratings_to_add) + 1
+                stage_start = time.time()
                 try:
-                    db.add_all(ratings_to_add)
-                    db.commit()
-                    added_ratings_count += len(ratings_to_add)
-                    elapsed_time = time.time() - start_time
-                    print(f"Committed batch ending at index {index}. Total ratings added: {added_ratings_count}. ({elapsed_time:.2f} seconds elapsed)")
-                    sys.stdout.flush()
-                    ratings_to_add = []
-                except Exception as e: # Catch broader errors as duplicates shouldn't happen
-                     db.rollback()
-                     print(f"\nERROR during rating batch commit (index ~{batch_start_index}-{index}): {e}. Rolling back and skipping batch.")
-                     ratings_to_add = []
-
-        # Final check (should be empty)
-        if ratings_to_add:
-             print("Attempting to commit final small batch...")
-             try:
-                 db.add_all(ratings_to_add)
-                 db.commit()
-                 added_ratings_count += len(ratings_to_add)
-                 print(f"Committed final batch of {len(ratings_to_add)} ratings. Total added: {added_ratings_count}.")
-                 sys.stdout.flush()
-             except Exception as e:
-                 print(f"\nERROR during final rating batch commit: {e}. Rolling back.")
-                 db.rollback()
-
-
-        total_time = time.time() - start_time
-        print(f"\nSuccessfully processed {ratings_count} ratings and added {added_ratings_count} unique ratings in {total_time:.2f} seconds.")
+                    added_ratings_count += bulk_insert(engine, models.Rating.__table__, rating_rows, stage="ratings", report=False)
+                except Exception as e:
+                    # A (user, movie) pair repeated across chunks: diff this chunk against the table instead
+                    print(f"Plain insert failed for ratings chunk ending at row {rows_read} ({type(e).__name__}), upserting it instead.")
+                    chunk_added, chunk_updated = upsert_ratings(engine, rating_rows)
+                    added_ratings_count += chunk_added
+                    updated_ratings_count += chunk_updated
+                ratings_elapsed += time.time() - stage_start
+
+                print(f"Processed {rows_read} rating rows: {added_users} users, {added_ratings_count} ratings added (peak memory {peak_memory_mb():.0f} MB)")
+                sys.stdout.flush()
+        except FileNotFoundError:
+            print(f"ERROR: ratings.csv not found at {RATINGS_CSV}.")
+            db.close()
+            sys.exit(1)
+        except Exception as e:
+            print(f"\nERROR while streaming ratings after {rows_read} rows: {e}.")
+            sys.stdout.flush()
+
+        report_stage("users", added_users, users_elapsed, action="Inserted")
+        report_stage("ratings", added_ratings_count + updated_ratings_count, ratings_elapsed, action="Inserted")
+        print(f"\nSuccessfully processed {rows_read} ratings and added {added_ratings_count} unique ratings ({updated_ratings_count} repeats updated).")
         sys.stdout.flush()
 
         print("\nDatabase seeding complete!")
@@ -380,8 +404,261 @@ def seed_database():
              pass
         sys.stdout.flush()
 
+# --- Incremental Seeding ---
+# Non-destructive import: every stage diffs the CSVs against what is already in
+# the database (movies and users by primary key, ratings by _user_movie_rating_uc)
+# and only inserts new rows and updates changed ones, so reimporting an updated
+# MovieLens drop costs roughly the size of the delta. Rows that disappeared from
+# the CSVs are left alone. Progress is written to the seed_checkpoints table of
+# the target database after each stage and each ratings chunk; a rerun with the
+# same CSV files resumes from it, and re-diffing makes a partially applied chunk
+# safe to repeat. Because the checkpoint lives next to the data, a dropped or
+# recreated database also loses its checkpoint. A completed checkpoint is only
+# trusted while the tables still hold what the import left behind.
+SEED_CHECKPOINT_NAME = "incremental"
+SEED_LOCK_PATH = os.getenv("SEED_LOCK_PATH", os.path.join(ROOT_DIR, "backend", "seed.lock"))
+SEED_LOOKUP_BATCH_SIZE = 500 # Ids per IN (...) lookup, well under SQLite's bound-parameter limit
+
+def _source_fingerprint() -> dict:
+    """Identifies the CSV files (size + mtime) a checkpoint belongs to."""
+    files = {}
+    for path in (MOVIES_CSV, LINKS_CSV, RATINGS_CSV):
+        stat = os.stat(path)
+        files[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+    return {"files": files}
+
+def _database_state(engine) -> dict:
+    """(row count, max id) of the movies and ratings tables."""
+    state = {}
+    with engine.connect() as conn:
+        for name, table in (("movies", models.Movie.__table__), ("ratings", models.Rating.__table__)):
+            count, max_id = conn.execute(select(sqlalchemy.func.count(table.c.id), sqlalchemy.func.max(table.c.id))).one()
+            state[name] = [int(count or 0), int(max_id or 0)]
+    return state
+
+def _database_matches(recorded: dict, current: dict) -> bool:
+    """
+    Whether the database still holds what a completed import recorded. Movies must
+    be unchanged; ratings may only have grown (the API adds ratings, never deletes them).
+    """
+    if not recorded:
+        return False
+    recorded_count, recorded_max_id = recorded["ratings"]
+    current_count, current_max_id = current["ratings"]
+    return recorded["movies"] == current["movies"] and current_count >= recorded_count and current_max_id >= recorded_max_id
+
+def _load_checkpoint(engine, fingerprint: dict) -> dict:
+    """The saved checkpoint if it belongs to these CSV files, else a fresh one."""
+    fresh = {"fingerprint": fingerprint, "stages_done": [], "ratings_rows_done": 0, "completed": False}
+    table = models.SeedCheckpoint.__table__
+    with engine.connect() as conn:
+        state = conn.execute(select(table.c.state).where(table.c.name == SEED_CHECKPOINT_NAME)).scalar()
+    if state is None:
+        return fresh
+    try:
+        checkpoint = json.loads(state)
+    except ValueError:
+        return fresh
+    if checkpoint.get("fingerprint") != fingerprint:
+        print("Seed checkpoint belongs to different CSV files, starting a new incremental import.")
+        return fresh
+    if checkpoint.get("completed") and not _database_matches(checkpoint.get("database_state"), _database_state(engine)):
+        print("Database no longer matches the last completed import, starting a new incremental import.")
+        return fresh
+    return checkpoint
+
+def _save_checkpoint(engine, checkpoint: dict):
+    """Replaces the stored checkpoint in one transaction."""
+    table = models.SeedCheckpoint.__table__
+    with engine.begin() as conn:
+        conn.execute(table.delete().where(table.c.name == SEED_CHECKPOINT_NAME))
+        conn.execute(table.insert().values(name=SEED_CHECKPOINT_NAME, state=json.dumps(checkpoint)))
+
+def bulk_update(engine, table: Table, rows: pd.DataFrame, key_column: str, stage: str) -> int:
+    """UPDATE ... WHERE key_column = :key for each row (executemany). Returns the row count."""
+    if rows.empty:
+        return 0
+    start_time = time.time()
+    value_columns = [column for column in rows.columns if column != key_column]
+    statement = (
+        table.update()
+        .where(table.c[key_column] == bindparam(f"b_{key_column}"))
+        .values({column: bindparam(f"b_{column}") for column in value_columns})
+    )
+    rows = rows.astype(object).where(rows.notna(), None).rename(columns=lambda column: f"b_{column}")
+    records = rows.to_dict(orient='records')
+    with engine.begin() as conn:
+        for start in range(0, len(records), BULK_INSERT_BATCH_SIZE):
+            conn.execute(statement, records[start:start + BULK_INSERT_BATCH_SIZE])
+    report_stage(stage, len(records), time.time() - start_time, action="Updated")
+    return len(records)
+
+def _existing_ratings(engine, user_ids) -> pd.DataFrame:
+    """Stored (id, user_id, movie_id, score, rated_at) rows for the given users."""
+    table = models.Rating.__table__
+    user_ids = [int(user_id) for user_id in user_ids]
+    frames = []
+    with engine.connect() as conn:
+        for start in range(0, len(user_ids), SEED_LOOKUP_BATCH_SIZE):
+            query = (
+                select(table.c.id, table.c.user_id, table.c.movie_id, table.c.score, table.c.rated_at)
+                .where(table.c.user_id.in_(user_ids[start:start + SEED_LOOKUP_BATCH_SIZE]))
+            )
+            frames.append(pd.DataFrame(conn.execute(query).all(), columns=['id', 'user_id', 'movie_id', 'score', 'rated_at']))
+    existing = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['id', 'user_id', 'movie_id', 'score', 'rated_at'])
+    return existing.astype({'id': 'int64', 'user_id': 'int64', 'movie_id': 'int64', 'score': 'float64'})
+
+def _seed_movies_incremental(engine):
+    """Inserts new movies (fetching posters only for them) and updates changed titles/years/genres."""
+    movie_rows = prepare_movie_rows(pd.read_csv(MOVIES_CSV, dtype=MOVIES_DTYPES))
+    table = models.Movie.__table__
+    with engine.connect() as conn:
+        existing = pd.DataFrame(
+            conn.execute(select(table.c.id, table.c.title, table.c.release_year, table.c.genres)).all(),
+            columns=['id', 'title', 'release_year', 'genres'],
+        )
+    existing = existing.astype({'id': 'int64', 'release_year': 'Int64'})
+
+    is_new = ~movie_rows['id'].isin(existing['id'])
+    new_rows = movie_rows[is_new].copy()
+    if not new_rows.empty:
+        if TMDB_API_KEY and TMDB_API_KEY.strip():
+            new_rows['poster_url'] = fetch_poster_paths(new_rows['id'], load_movie_links())
+        else:
+            print("WARNING: TMDB_API_KEY not set, new movies are added without posters.")
+    bulk_insert(engine, table, new_rows, stage="movies")
+
+    compared = movie_rows[~is_new].merge(existing, on='id', suffixes=('', '_db'))
+    changed = pd.Series(False, index=compared.index)
+    for column in ('title', 'release_year', 'genres'):
+        differs = compared[column].ne(compared[f"{column}_db"])
+        both_missing = compared[column].isna() & compared[f"{column}_db"].isna()
+        changed |= (differs & ~both_missing).fillna(True).astype(bool)
+    changed_rows = compared.loc[changed, ['id', 'title', 'release_year', 'genres']]
+    bulk_update(engine, table, changed_rows, 'id', stage="movies")
+    sync_movie_genres(engine, pd.concat([new_rows[['id', 'genres']], changed_rows[['id', 'genres']]]).itertuples(index=False))
+    if not new_rows.empty or not changed_rows.empty:
+        notify_catalog_changed()
+    print(f"Movies: {len(new_rows)} new, {int(changed.sum())} changed, {len(compared) - int(changed.sum())} unchanged.")
+
+def _seed_users_incremental(engine):
+    """Creates accounts for rating user ids that do not have one yet."""
+    user_ids = set()
+    for chunk in read_rating_chunks(columns=('userId',)):
+        user_ids.update(chunk['userId'].unique().tolist())
+    table = models.User.__table__
+    with engine.connect() as conn:
+        existing = {row[0] for row in conn.execute(select(table.c.id))}
+    new_user_ids = sorted(user_ids - existing)
+    user_rows = build_user_rows(new_user_ids)
+    bulk_insert(engine, table, user_rows, stage="users")
+    print(f"Users: {len(user_rows)} new, {len(user_ids) - len(new_user_ids)} already present.")
+
+def upsert_ratings(engine, rows: pd.DataFrame):
+    """Diffs ratings rows against the stored ratings of their users and applies the delta. Returns (added, updated)."""
+    if rows.empty:
+        return 0, 0
+    existing = _existing_ratings(engine, rows['user_id'].unique())
+    merged = rows.astype({'user_id': 'int64', 'movie_id': 'int64', 'score': 'float64'}).merge(
+        existing, on=['user_id', 'movie_id'], how='left', suffixes=('', '_db'))
+    new_rows = merged.loc[merged['id'].isna(), ['user_id', 'movie_id', 'score', 'rated_at']]
+    changed = merged['id'].notna() & (merged['score'] != merged['score_db'])
+    changed_rows = merged.loc[changed, ['id', 'score', 'rated_at']].astype({'id': int})
+
+    bulk_insert(engine, models.Rating.__table__, new_rows, stage="ratings", report=False)
+    bulk_update(engine, models.Rating.__table__, changed_rows, 'id', stage="ratings")
+    return len(new_rows), len(changed_rows)
+
+def _seed_ratings_incremental(engine, checkpoint: dict):
+    """Streams ratings.csv in chunks, checkpointing after each one so an interrupted run resumes."""
+    with engine.connect() as conn:
+        user_ids = {row[0] for row in conn.execute(select(models.User.__table__.c.id))}
+        movie_ids = {row[0] for row in conn.execute(select(models.Movie.__table__.c.id))}
+
+    rows_done = checkpoint.get("ratings_rows_done", 0)
+    if rows_done:
+        print(f"Resuming ratings import after row {rows_done}.")
+    added, updated = 0, 0
+    start_time = time.time()
+    chunk_start = 0
+    for chunk in read_rating_chunks():
+        chunk_end = chunk_start + len(chunk)
+        if chunk_end > rows_done:
+            rows = clean_rating_chunk(chunk.iloc[max(0, rows_done - chunk_start):], movie_ids, user_ids)
+            chunk_added, chunk_updated = upsert_ratings(engine, rows)
+            added += chunk_added
+            updated += chunk_updated
+            checkpoint["ratings_rows_done"] = chunk_end
+            _save_checkpoint(engine, checkpoint)
+            print(f"Ratings: processed {chunk_end} rows ({added} new, {updated} changed so far, {time.time() - start_time:.2f} seconds elapsed)")
+            sys.stdout.flush()
+        chunk_start = chunk_end
+    report_stage("ratings", added + updated, time.time() - start_time, action="Upserted")
+    print(f"Ratings: {added} new, {updated} changed.")
+
+def seed_database_incremental():
+    """
+    Upserts movies, users and ratings from the CSV files without dropping anything.
+    Safe to rerun: an interrupted import resumes from its checkpoint, and an
+    import whose CSV files are unchanged since the last complete run is skipped
+    as long as the database still holds that run's data.
+    """
+    print("\n--- Starting Incremental Database Seeding ---")
+    sys.stdout.flush()
+    engine = db_engine
+
+    os.makedirs(os.path.dirname(SEED_LOCK_PATH) or ".", exist_ok=True)
+    with open(SEED_LOCK_PATH, "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("Another incremental seed is already running, exiting.")
+            return
+
+        try:
+            fingerprint = _source_fingerprint()
+        except FileNotFoundError as e:
+            print(f"ERROR: Seed CSV file missing: {e}")
+            sys.exit(1)
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        checkpoint = _load_checkpoint(engine, fingerprint)
+        if checkpoint.get("completed"):
+            print("CSV files unchanged since the last completed import, nothing to do.")
+            return
+
+        start_time = time.time()
+        stages = [
+            ("movies", lambda: _seed_movies_incremental(engine)),
+            ("users", lambda: _seed_users_incremental(engine)),
+            ("ratings", lambda: _seed_ratings_incremental(engine, checkpoint)),
+        ]
+        for stage, run_stage in stages:
+            if stage in checkpoint["stages_done"]:
+                print(f"Skipping {stage}: already imported (checkpoint).")
+                continue
+            print(f"\nImporting {stage}...")
+            sys.stdout.flush()
+            run_stage()
+            checkpoint["stages_done"].append(stage)
+            _save_checkpoint(engine, checkpoint)
+
+        checkpoint["completed"] = True
+        checkpoint["database_state"] = _database_state(engine)
+        _save_checkpoint(engine, checkpoint)
+        print(f"\nIncremental seeding complete in {time.time() - start_time:.2f} seconds.")
+        sys.stdout.flush()
+
+
 # --- Run the Seeder ---
 if __name__ == "__main__":
-    seed_database()
+    parser = argparse.ArgumentParser(description="Populate the database from the MovieLens CSV files.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Upsert new/changed rows and resume from the checkpoint instead of dropping and reloading everything.")
+    args = parser.parse_args()
+    if args.incremental:
+        seed_database_incremental()
+    else:
+        seed_database()
 
 
@@ -0,0 +1,146 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+# Every test session runs against a throwaway SQLite database and artifact
+# directory. These must be set before any backend module is imported, because
+# the modules read their configuration at import time.
+TEST_DIR = tempfile.mkdtemp(prefix="movierec-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ["MODEL_ARTIFACT_DIR"] = os.path.join(TEST_DIR, "model_artifacts")
+os.environ["TMDB_CACHE_PATH"] = os.path.join(TEST_DIR, "tmdb_cache.json")
+os.environ["SEED_LOCK_PATH"] = os.path.join(TEST_DIR, "seed.lock")
+os.environ["SECRET_KEY"] = "test-secret-key"
+os.environ["ADMIN_USER_IDS"] = "1"
+os.environ["TMDB_API_KEY"] = ""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+from sqlalchemy import MetaData
+
+import auth
+import catalog
+import genres
+import ml_engine
+import model_store
+import models
+import popularity
+import rec_cache
+import search
+from database import Base, SessionLocal, engine
+from migrations import drop_movie_search_index, run_migrations
+
+GENRE_NAMES = ["Action", "Adventure", "Comedy", "Drama", "Sci-Fi", "Thriller"]
+
+
+def reset_database():
+    """Drops and recreates every table, like seed_database does."""
+    drop_movie_search_index(engine)
+    meta = MetaData()
+    meta.reflect(bind=engine)
+    meta.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+
+def sample_movies(n_movies: int = 40) -> list:
+    """Movie rows with predictable titles, years and genres."""
+    movies = []
+    for movie_id in range(1, n_movies + 1):
+        movie_genres = [GENRE_NAMES[movie_id % len(GENRE_NAMES)], GENRE_NAMES[(movie_id // 2) % len(GENRE_NAMES)]]
+        movies.append({
+            "id": movie_id,
+            "title": f"Star Movie {movie_id}" if movie_id % 5 == 0 else f"Film Number {movie_id}",
+            "description": None,
+            "release_year": None if movie_id % 13 == 0 else 1980 + movie_id % 20,
+            "genres": "|".join(dict.fromkeys(movie_genres)),
+            "poster_url": None,
+        })
+    return movies
+
+
+def expected_order(genre: str = None) -> list:
+    """Movie ids in listing order: newest year first, movies without a year last, then title and id."""
+    movies = [movie for movie in sample_movies() if genre is None or genre in movie["genres"].split("|")]
+    movies.sort(key=lambda movie: (movie["release_year"] is None, -(movie["release_year"] or 0), movie["title"], movie["id"]))
+    return [movie["id"] for movie in movies]
+
+
+def sample_ratings(n_users: int = 30, n_movies: int = 40, per_user: int = 12, seed: int = 0) -> list:
+    """(user_id, movie_id, score) triples, every user rating per_user distinct movies."""
+    rng = np.random.default_rng(seed)
+    ratings = []
+    for user_id in range(1, n_users + 1):
+        for movie_id in rng.choice(np.arange(1, n_movies + 1), size=per_user, replace=False):
+            ratings.append((user_id, int(movie_id), float(rng.integers(1, 11)) / 2))
+    return ratings
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    """Module-level caches and artifacts must not leak between tests."""
+    shutil.rmtree(model_store.MODEL_ARTIFACT_DIR, ignore_errors=True)
+    catalog.movie_catalog = None
+    search.memory_index = None
+    search._backends.clear()
+    genres.genre_index = None
+    ml_engine.content_index = None
+    ml_engine._content_index_checked_at = 0.0
+    ml_engine.collab_model = None
+    ml_engine._last_reload_check = 0.0
+    popularity.popularity_index = None
+    rec_cache.recommendation_cache = rec_cache.RecommendationCache()
+    yield
+
+
+@pytest.fixture
+def empty_db():
+    reset_database()
+    yield engine
+
+
+@pytest.fixture
+def sample_db(empty_db):
+    """The sample catalog: movies (with genre links), users 1-30 and their ratings."""
+    movies = sample_movies()
+    ratings = sample_ratings()
+    with engine.begin() as conn:
+        conn.execute(models.Movie.__table__.insert(), movies)
+        conn.execute(models.User.__table__.insert(), [
+            {"id": user_id, "username": f"user_{user_id}", "email": f"user_{user_id}@example.com",
+             "hashed_password": auth.LOGIN_DISABLED_HASH}
+            for user_id in range(1, 31)
+        ])
+        conn.execute(models.Rating.__table__.insert(), [
+            {"user_id": user_id, "movie_id": movie_id, "score": score} for user_id, movie_id, score in ratings
+        ])
+    genres.sync_movie_genres(engine, [(movie["id"], movie["genres"]) for movie in movies])
+    yield engine
+
+
+@pytest.fixture
+def db(empty_db):
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+
+def join_background_threads(name: str):
+    """Waits for the named background threads (similarity table, popularity refresh) to finish."""
+    for thread in threading.enumerate():
+        if thread.name == name:
+            thread.join(timeout=10)
+
+
+def auth_headers(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {auth.create_access_token({'sub': str(user_id)})}"}
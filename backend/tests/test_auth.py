@@ -0,0 +1,32 @@
+import pytest
+from fastapi import HTTPException
+
+import auth
+import database
+import ml_engine
+from conftest import auth_headers
+
+
+def test_sync_dependency_rejects_bad_tokens(sample_db, db):
+    with pytest.raises(HTTPException) as error:
+        auth.get_current_user_sync("not-a-token", db)
+    assert error.value.status_code == 401
+
+    with pytest.raises(HTTPException) as error:
+        auth.get_current_user_sync(auth.create_access_token({"sub": "999"}), db)
+    assert error.value.status_code == 401
+
+
+def test_sync_endpoints_authenticate_on_the_sync_pool(sample_db, client, monkeypatch):
+    monkeypatch.setattr(ml_engine, "train_collaborative_model_task", lambda: None)
+    before = database.pool_stats["async"].checkouts
+
+    response = client.post("/ratings/", json={"movie_id": 1, "score": 4.5}, headers=auth_headers(3))
+
+    assert response.status_code == 201
+    assert database.pool_stats["async"].checkouts == before
+
+
+def test_sync_admin_endpoint_checks_admin_rights(sample_db, client):
+    response = client.post("/admin/recommendations/batch", json={"user_ids": [3]}, headers=auth_headers(2))
+    assert response.status_code == 403
@@ -0,0 +1,58 @@
+import ml_engine
+from conftest import auth_headers, join_background_threads
+from database import track_queries
+
+
+def train(db):
+    ml_engine.load_or_train_collaborative_model(db)
+    ml_engine.get_content_index(db)
+    join_background_threads("similarity-table")
+
+
+def test_batch_matches_one_user_at_a_time(sample_db, db, monkeypatch):
+    train(db)
+    monkeypatch.setattr(ml_engine, "BATCH_USER_BLOCK_SIZE", 4) # Several blocks, the last one partial
+    user_ids = list(range(1, 11)) + [999]
+
+    batch = ml_engine.get_batch_hybrid_recommendations(user_ids + [3], db, num_recs=6)
+
+    assert list(batch) == user_ids # De-duplicated, order kept
+    for user_id in user_ids:
+        assert batch[user_id] == ml_engine.get_hybrid_recommendations(user_id, db, num_recs=6)
+    assert batch[999] == []
+
+
+def test_batch_endpoint_reports_throughput(sample_db, db, client):
+    train(db)
+
+    response = client.post("/admin/recommendations/batch", json={"user_ids": [1, 2, 3], "num_recs": 5}, headers=auth_headers(1))
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["users_processed"] == 3
+    assert all(len(movie_ids) == 5 for movie_ids in body["recommendations"].values())
+    assert body["users_per_second"] > 0
+
+
+def test_batch_endpoint_validates_the_request(sample_db, client):
+    assert client.post("/admin/recommendations/batch", json={"user_ids": []}, headers=auth_headers(1)).status_code == 400
+    assert client.post("/admin/recommendations/batch", json={"user_ids": [1], "num_recs": 0}, headers=auth_headers(1)).status_code == 400
+
+
+def test_batch_endpoint_caps_the_number_of_users(sample_db, client, monkeypatch):
+    monkeypatch.setattr(ml_engine, "BATCH_MAX_USERS", 3)
+
+    response = client.post("/admin/recommendations/batch", json={"user_ids": [1, 2, 3, 4]}, headers=auth_headers(1))
+
+    assert response.status_code == 422
+
+
+def test_top_rated_lookup_is_chunked(sample_db, db, monkeypatch):
+    monkeypatch.setattr(ml_engine, "BATCH_USER_BLOCK_SIZE", 4)
+    user_ids = list(range(1, 11))
+
+    with track_queries() as counter:
+        top_rated = ml_engine._top_rated_movie_ids(user_ids, db)
+
+    assert counter.count == 3
+    assert top_rated == {user_id: ml_engine.get_user_ratings(user_id, db).top_movie_id for user_id in user_ids}
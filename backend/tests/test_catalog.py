@@ -0,0 +1,149 @@
+import os
+import time
+
+import catalog
+import genres
+import main
+import ml_engine
+import models
+import popularity
+import search
+from conftest import auth_headers, join_background_threads
+from database import engine, track_queries
+
+
+def notify_from_another_worker():
+    """What notify_catalog_changed looks like from a process that did not send it: only the version file changes."""
+    os.makedirs(os.path.dirname(catalog.CATALOG_VERSION_PATH), exist_ok=True)
+    temp_path = f"{catalog.CATALOG_VERSION_PATH}.other.tmp"
+    with open(temp_path, "w") as version_file:
+        version_file.write(f"{time.time_ns()} other\n")
+    os.replace(temp_path, catalog.CATALOG_VERSION_PATH)
+
+
+def rename_movie(movie_id: int, title: str, genre_string: str = None):
+    """An edit made by another worker, without any local invalidation."""
+    table = models.Movie.__table__
+    values = {"title": title} if genre_string is None else {"title": title, "genres": genre_string}
+    with engine.begin() as conn:
+        conn.execute(table.update().where(table.c.id == movie_id).values(**values))
+    if genre_string is not None:
+        genres.sync_movie_genres(engine, [(movie_id, genre_string)])
+    notify_from_another_worker()
+
+
+def test_catalog_json_matches_the_response_model(sample_db, db):
+    movies = catalog.get_catalog(db).movies
+    assert len(movies) == 40
+    for movie in db.query(models.Movie):
+        assert movies[movie.id].json == main.MovieResponse.model_validate(movie).model_dump_json().encode("utf-8")
+
+
+def test_loaded_movie_is_dropped_when_another_worker_notifies(sample_db, db):
+    catalog.get_catalog(db)
+    assert catalog.get_loaded_movie(5).title == "Star Movie 5"
+
+    rename_movie(5, "Renamed")
+
+    assert catalog.get_loaded_movie(5) is None
+    assert catalog.get_movie(db, 5).title == "Renamed"
+
+
+def test_search_memory_index_follows_notifications(sample_db, db):
+    search._backends[str(engine.url)] = "memory"
+    assert search.search_movies(db, "renamed").movie_ids == []
+
+    rename_movie(7, "Renamed Picture")
+
+    assert search.search_movies(db, "renamed").movie_ids == [7]
+
+
+def test_genre_index_follows_notifications(sample_db, db):
+    assert genres.get_genre_index(db).filter([3], ["Documentary"]) == []
+
+    rename_movie(3, "Film Number 3", "Documentary")
+
+    assert genres.get_genre_index(db).filter([2, 3, 4], ["Documentary"]) == [3]
+
+
+def test_content_index_is_rebuilt_after_an_in_place_edit(sample_db, db):
+    before = ml_engine.get_content_index(db)
+
+    rename_movie(9, "Galactic Adventure")
+
+    after = ml_engine.get_content_index(db)
+    assert after is not before
+    assert after.signature[:2] == before.signature[:2] # Same count and max id: only the version differs
+    assert after.signature[2] == catalog.version_tag()
+
+
+def test_popular_movie_rows_follow_notifications(sample_db, db):
+    index = popularity.refresh_popularity_index(db)
+    top_movie_id = index.top_movies[0]["id"]
+
+    rename_movie(top_movie_id, "Most Popular, Renamed")
+    popularity.get_popular_movies(5) # Starts the re-read in the background
+    join_background_threads("popularity-refresh")
+
+    assert popularity.get_popular_movies(5)[0]["title"] == "Most Popular, Renamed"
+    assert popularity.popularity_index.movie_ids.tolist() == index.movie_ids.tolist()
+
+
+def test_admin_update_refreshes_every_movie_cache(sample_db, db, client):
+    search._backends[str(engine.url)] = "memory"
+    popularity.refresh_popularity_index(db)
+    top_movie_id = popularity.popularity_index.top_movies[0]["id"]
+    catalog.get_catalog(db)
+    content_before = ml_engine.get_content_index(db)
+    search.get_memory_index(db)
+    genres.get_genre_index(db)
+
+    response = client.patch(f"/admin/movies/{top_movie_id}", json={"title": "Edited Title", "genres": "Western"},
+                            headers=auth_headers(1))
+
+    assert response.status_code == 200
+    assert client.get(f"/movies/{top_movie_id}").json()["title"] == "Edited Title"
+    assert search.search_movies(db, "edited").movie_ids == [top_movie_id]
+    assert genres.get_genre_index(db).filter(range(1, 41), ["Western"]) == [top_movie_id]
+    assert popularity.get_popular_movies(1)[0]["title"] == "Edited Title"
+    assert ml_engine.get_content_index(db) is not content_before
+
+
+def test_non_admin_cannot_update_movies(sample_db, client):
+    response = client.patch("/admin/movies/1", json={"title": "Nope"}, headers=auth_headers(2))
+    assert response.status_code == 403
+
+
+def add_movies_unannounced(movie_ids):
+    """Movies inserted by a process that did not notify: the loaded catalog does not have them."""
+    with engine.begin() as conn:
+        conn.execute(models.Movie.__table__.insert(), [{"id": movie_id, "title": f"New {movie_id}", "genres": "Drama"} for movie_id in movie_ids])
+
+
+def test_missing_movies_are_read_through_in_one_query(sample_db, db):
+    catalog.get_catalog(db)
+    add_movies_unannounced([41, 42, 43])
+
+    with track_queries() as counter:
+        movies = catalog.get_movies(db, [1, 41, 42, 43, 999, 41])
+
+    assert counter.count == 1
+    assert sorted(movies) == [1, 41, 42, 43]
+    assert catalog.get_loaded_movie(42).title == "New 42"
+
+
+def test_watchlist_resolves_catalog_misses_together(sample_db, db, client, monkeypatch):
+    catalog.get_catalog(db)
+    add_movies_unannounced([41, 42])
+    with engine.begin() as conn:
+        conn.execute(models.WatchlistItem.__table__.insert(), [
+            {"user_id": 2, "movie_id": movie_id} for movie_id in (3, 41, 42)
+        ])
+    calls = []
+    monkeypatch.setattr(main, "load_movies", lambda movie_ids: calls.append(movie_ids) or catalog.get_movies(db, movie_ids))
+
+    response = client.get("/users/me/watchlist", headers=auth_headers(2))
+
+    assert response.status_code == 200
+    assert sorted(item["movie"]["id"] for item in response.json()) == [3, 41, 42]
+    assert [sorted(movie_ids) for movie_ids in calls] == [[41, 42]]
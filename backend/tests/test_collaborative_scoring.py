@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from surprise import SVD
+
+import ml_engine
+from conftest import sample_ratings
+from rating_store import build_rating_store
+
+
+@pytest.fixture
+def fitted():
+    """A CollaborativeModel and the Surprise SVD it was copied from."""
+    user_ids, movie_ids, scores = (np.array(column) for column in zip(*sample_ratings()))
+    store = build_rating_store(user_ids, movie_ids, scores)
+    trainset = store.to_surprise_trainset(ml_engine.RATING_SCALE)
+    svd = SVD(n_factors=8, n_epochs=10, random_state=42)
+    svd.fit(trainset)
+    model = ml_engine.CollaborativeModel(
+        global_mean=float(trainset.global_mean),
+        user_factors=np.asarray(svd.pu),
+        item_factors=np.asarray(svd.qi),
+        user_biases=np.asarray(svd.bu),
+        item_biases=np.asarray(svd.bi),
+        ratings=store,
+    )
+    return model, svd
+
+
+def test_vectorized_scores_match_svd_predict(fitted):
+    model, svd = fitted
+    inner_user = model.ratings.inner_user_id(3)
+
+    scores = ml_engine.score_all_items(model, model.user_factors[inner_user], float(model.user_biases[inner_user]))
+
+    expected = [svd.predict(3, int(movie_id)).est for movie_id in model.raw_item_ids]
+    assert np.allclose(scores, expected)
+
+
+def test_block_scores_match_single_user_scores(fitted):
+    model, _ = fitted
+    users = np.arange(5)
+
+    block = ml_engine.score_user_block(model, model.user_factors[users], model.user_biases[users])
+
+    for row, inner_user in enumerate(users):
+        assert np.allclose(block[row], ml_engine.score_all_items(model, model.user_factors[inner_user], float(model.user_biases[inner_user])))
+
+
+def test_recommendations_skip_rated_movies_and_rank_by_score(fitted, monkeypatch):
+    model, _ = fitted
+    monkeypatch.setattr(ml_engine, "collab_model", model)
+    monkeypatch.setattr(ml_engine, "maybe_reload_collaborative_model", lambda: None)
+    inner_user = model.ratings.inner_user_id(3)
+    rated = set(model.raw_item_ids[model.ratings.user_items(inner_user)].tolist())
+
+    recommendations = ml_engine.get_collaborative_recommendations(3, db=None, num_recs=10)
+
+    assert len(recommendations) == 10
+    assert not rated & set(recommendations)
+    predicted = {int(movie_id): score for movie_id, score in zip(model.raw_item_ids, ml_engine.score_all_items(
+        model, model.user_factors[inner_user], float(model.user_biases[inner_user])))}
+    assert [predicted[movie_id] for movie_id in recommendations] == sorted((predicted[movie_id] for movie_id in recommendations), reverse=True)
+    assert min(predicted[movie_id] for movie_id in recommendations) >= max(
+        score for movie_id, score in predicted.items() if movie_id not in rated and movie_id not in recommendations)
+
+
+def test_unknown_user_gets_no_collaborative_recommendations(fitted, monkeypatch):
+    model, _ = fitted
+    monkeypatch.setattr(ml_engine, "collab_model", model)
+    monkeypatch.setattr(ml_engine, "maybe_reload_collaborative_model", lambda: None)
+
+    assert ml_engine.get_collaborative_recommendations(999, db=None) == []
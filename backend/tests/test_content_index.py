@@ -0,0 +1,65 @@
+import numpy as np
+
+import ml_engine
+import models
+from database import engine
+from conftest import join_background_threads
+
+
+def brute_force_neighbors(index, movie_id, n):
+    row = index.id_to_row[movie_id]
+    scores = (index.tfidf_matrix @ index.tfidf_matrix[row].T).toarray().ravel()
+    scores[row] = -1.0
+    order = np.lexsort((np.arange(scores.size), -scores))[:n]
+    return [int(index.movie_ids[i]) for i in order]
+
+
+def test_index_is_built_once_per_catalog(sample_db, db):
+    first = ml_engine.get_content_index(db)
+    join_background_threads("similarity-table")
+    ml_engine._content_index_checked_at = 0.0 # Force the signature check
+
+    assert ml_engine.get_content_index(db) is ml_engine.content_index
+    assert ml_engine.content_index.movie_ids is first.movie_ids # Same fitted matrix, now with its table
+    assert first.signature[:2] == (40, 40)
+
+
+def test_new_movie_triggers_a_rebuild(sample_db, db):
+    before = ml_engine.get_content_index(db)
+    join_background_threads("similarity-table")
+    with engine.begin() as conn:
+        conn.execute(models.Movie.__table__.insert().values(id=41, title="Star Movie Returns", genres="Sci-Fi"))
+    ml_engine._content_index_checked_at = 0.0
+
+    after = ml_engine.get_content_index(db)
+
+    assert after is not before
+    assert 41 in after.id_to_row
+
+
+def test_recommendations_rank_by_cosine_similarity(sample_db, db):
+    index = ml_engine.get_content_index(db)
+    join_background_threads("similarity-table")
+    ml_engine.content_index = index # Score without the top-K table
+
+    recommendations = ml_engine.get_content_recommendations(10, db, num_recs=5)
+
+    assert 10 not in recommendations
+    assert recommendations == brute_force_neighbors(index, 10, 5)
+
+
+def test_unknown_movie_has_no_recommendations(sample_db, db):
+    assert ml_engine.get_content_recommendations(999, db) == []
+
+
+def test_saved_index_is_loaded_instead_of_refitted(sample_db, db):
+    built = ml_engine.get_content_index(db)
+    join_background_threads("similarity-table") # Saves the artifact with the table
+    ml_engine.content_index = None
+
+    loaded = ml_engine.load_or_build_content_index(db)
+
+    assert loaded is not built
+    assert loaded.signature == built.signature
+    assert (loaded.tfidf_matrix != built.tfidf_matrix).nnz == 0
+    assert loaded.neighbor_rows is not None
@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import QueuePool
+
+import database
+import models
+from conftest import TEST_DIR, auth_headers
+
+
+def test_pool_stats_only_count_slow_checkouts_at_capacity_as_waits():
+    stats = database.PoolStats()
+
+    stats.record_checkout(0.0, at_capacity=True)
+    stats.record_checkout(0.3, at_capacity=False) # Opening a new connection
+    stats.record_checkout(0.25, at_capacity=True)
+    stats.record_checkout(0.5, at_capacity=True, timed_out=True)
+    stats.record_connect()
+
+    assert stats.as_dict() == {"checkouts": 3, "connects": 1, "waits": 2, "timeouts": 1,
+                               "wait_seconds_total": 0.75, "max_wait_seconds": 0.5}
+
+
+def test_checkouts_are_counted_per_engine(empty_db):
+    before = database.pool_statistics()["sync"]
+
+    with database.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        during = database.pool_statistics()["sync"]
+
+    assert during["checkouts"] == before["checkouts"] + 1
+    assert during["checked_out"] == before["checked_out"] + 1
+    assert during["pool_class"] == "InstrumentedQueuePool"
+    assert database.pool_statistics()["async"]["pool_class"] == "InstrumentedAsyncAdaptedQueuePool"
+
+
+def small_engine(stats, **pool_options):
+    engine = create_engine(f"sqlite:///{TEST_DIR}/pool.db", poolclass=database._instrumented_pool(QueuePool, stats), **pool_options)
+    database._count_connects(engine, stats)
+    return engine
+
+
+def test_exhausted_pool_records_a_timeout():
+    stats = database.PoolStats()
+    engine = small_engine(stats, pool_size=1, max_overflow=0, pool_timeout=0.05)
+    try:
+        with engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+    finally:
+        engine.dispose()
+
+    assert stats.as_dict()["checkouts"] == 1
+    assert stats.as_dict()["timeouts"] == 1
+    assert stats.as_dict()["max_wait_seconds"] >= 0.05
+
+
+def test_opening_connections_is_not_a_wait(monkeypatch):
+    monkeypatch.setattr(database, "DB_POOL_WAIT_THRESHOLD_SECONDS", 0.0)
+    stats = database.PoolStats()
+    engine = small_engine(stats, pool_size=2, max_overflow=1)
+    try:
+        with engine.connect(), engine.connect(), engine.connect():
+            pass
+        with engine.connect():
+            pass
+    finally:
+        engine.dispose()
+
+    assert stats.as_dict()["checkouts"] == 4
+    assert stats.as_dict()["connects"] == 3
+    assert stats.as_dict()["waits"] == 0
+
+
+def test_sqlite_connections_get_the_configured_pragmas(empty_db):
+    database.engine.dispose() # The next checkout opens a new connection
+    with database.engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1 # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+def test_async_urls_use_the_async_drivers():
+    url = database._async_database_url("postgresql://user:secret@db:5432/movies?sslmode=require")
+
+    assert url.drivername == "postgresql+asyncpg"
+    assert url.query == {"ssl": "require"}
+    assert database._async_database_url("sqlite:///movies.db").drivername == "sqlite+aiosqlite"
+
+
+def test_pool_metrics_are_admin_only(empty_db, client):
+    with database.engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": user_id, "username": f"user_{user_id}", "email": f"user_{user_id}@example.com", "hashed_password": "!"}
+            for user_id in (1, 2)
+        ])
+
+    response = client.get("/admin/metrics/database", headers=auth_headers(1))
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"sync", "async"}
+    assert response.json()["sync"]["max_overflow"] == database.DB_MAX_OVERFLOW
+    assert client.get("/admin/metrics/database", headers=auth_headers(2)).status_code == 403
@@ -0,0 +1,69 @@
+import numpy as np
+
+import ml_engine
+import models
+from database import engine
+
+
+def unrated_known_movie(model, db, user_id: int) -> int:
+    rated = set(ml_engine.get_user_ratings(user_id, db).movie_ids)
+    return next(int(movie_id) for movie_id in model.raw_item_ids if int(movie_id) not in rated)
+
+
+def rate_from_another_worker(user_id: int, movie_id: int, score: float):
+    """A rating this process never hears about: it is only in the database."""
+    with engine.begin() as conn:
+        conn.execute(models.Rating.__table__.insert().values(user_id=user_id, movie_id=movie_id, score=score))
+
+
+def test_unchanged_ratings_use_the_trained_vector(sample_db, db):
+    ml_engine.load_or_train_collaborative_model(db)
+    model = ml_engine.collab_model
+
+    user_factors, _, _ = ml_engine.get_user_profile(model, 3, ml_engine.get_user_ratings(3, db))
+
+    assert np.array_equal(user_factors, model.user_factors[model.ratings.inner_user_id(3)])
+    assert model.folded_users == {}
+
+
+def test_rating_written_by_another_worker_is_folded_in(sample_db, db):
+    ml_engine.load_or_train_collaborative_model(db)
+    model = ml_engine.collab_model
+    movie_id = unrated_known_movie(model, db, 3)
+
+    rate_from_another_worker(3, movie_id, 5.0)
+    user_ratings = ml_engine.get_user_ratings(3, db)
+    _, _, rated = ml_engine.get_user_profile(model, 3, user_ratings)
+
+    assert model.ratings.inner_item_ids(np.array([movie_id]))[0] in rated
+    assert model.folded_users[3][0] == user_ratings.stamp
+    assert movie_id not in ml_engine.get_collaborative_recommendations(3, db, num_recs=40, user_ratings=user_ratings)
+
+
+def test_fold_in_matches_the_writing_worker(sample_db, db):
+    ml_engine.load_or_train_collaborative_model(db)
+    model = ml_engine.collab_model
+    movie_id = unrated_known_movie(model, db, 3)
+    rate_from_another_worker(3, movie_id, 4.5)
+    user_ratings = ml_engine.get_user_ratings(3, db)
+
+    ml_engine.fold_in_user_ratings(3, list(zip(user_ratings.movie_ids, user_ratings.scores)))
+    written = model.folded_users.pop(3)[1]
+    lazily_folded = ml_engine.get_user_profile(model, 3, user_ratings)
+
+    assert np.allclose(written[0], lazily_folded[0])
+    assert np.isclose(written[1], lazily_folded[1])
+
+
+def test_newly_loaded_model_keeps_ratings_newer_than_its_snapshot(sample_db, db):
+    ml_engine.load_or_train_collaborative_model(db)
+    movie_id = unrated_known_movie(ml_engine.collab_model, db, 3)
+    rate_from_another_worker(3, movie_id, 5.0)
+    ml_engine.fold_in_user_ratings(3, [(movie_id, 5.0)])
+
+    # Another worker's retrain started before the rating: same snapshot, fresh model object
+    ml_engine.publish_collaborative_model(ml_engine.load_collaborative_artifact())
+    model = ml_engine.collab_model
+    _, _, rated = ml_engine.get_user_profile(model, 3, ml_engine.get_user_ratings(3, db))
+
+    assert model.ratings.inner_item_ids(np.array([movie_id]))[0] in rated
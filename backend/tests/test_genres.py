@@ -0,0 +1,67 @@
+import genres
+import models
+from conftest import expected_order, sample_movies
+from database import engine
+
+
+def movies_with(*names):
+    return {movie["id"] for movie in sample_movies() if set(names) <= set(movie["genres"].split("|"))}
+
+
+def test_split_genres_drops_placeholders_and_duplicates():
+    assert genres.split_genres("Action|Comedy|Action") == ["Action", "Comedy"]
+    assert genres.split_genres("(no genres listed)") == []
+    assert genres.split_genres(None) == []
+
+
+def test_parse_genre_filter_accepts_commas_and_pipes():
+    assert genres.parse_genre_filter("Action, Comedy|Drama") == ["Action", "Comedy", "Drama"]
+
+
+def test_bitmap_filter_keeps_order_and_requires_every_genre(sample_db, db):
+    index = genres.get_genre_index(db)
+    candidates = list(range(40, 0, -1)) + [999]
+
+    assert index.filter(candidates, ["sci-fi"]) == sorted(movies_with("Sci-Fi"), reverse=True)
+    assert set(index.filter(candidates, ["Drama", "Sci-Fi"])) == movies_with("Drama", "Sci-Fi")
+    assert index.resolve(["Western"]) is None
+
+
+def test_filter_without_genres_keeps_every_id(sample_db, db):
+    index = genres.get_genre_index(db)
+
+    assert index.filter([3, 1, 2], []) == [3, 1, 2]
+    assert index.filter_by_ids([3, 1, 2], []) == [3, 1, 2]
+
+
+def test_listing_pages_are_read_off_the_bitmaps(sample_db, db):
+    index = genres.get_genre_index(db)
+    drama = index.resolve(["Drama"])
+    expected = expected_order("Drama")
+
+    assert index.listing_page(drama, None, 0, 100) == expected
+    assert index.listing_page(drama, None, 2, 3) == expected[2:5]
+    assert index.listing_page(drama, None, 100, 3) == []
+
+
+def test_listing_requires_every_genre(sample_db, client):
+    response = client.get("/movies/", params={"genre": "Drama,Sci-Fi", "limit": 100})
+
+    assert movies_with("Drama", "Sci-Fi") == {9, 21, 33}
+    assert {movie["id"] for movie in response.json()} == movies_with("Drama", "Sci-Fi")
+
+
+def test_unknown_genre_lists_nothing(sample_db, client):
+    assert client.get("/movies/", params={"genre": "Western"}).json() == []
+
+
+def test_cursor_of_a_deleted_movie_continues_in_place(sample_db, db):
+    drama = expected_order("Drama")
+    deleted = next(movie for movie in sample_movies() if movie["id"] == drama[2])
+    with engine.begin() as conn:
+        conn.execute(models.movie_genres.delete().where(models.movie_genres.c.movie_id == deleted["id"]))
+        conn.execute(models.Movie.__table__.delete().where(models.Movie.__table__.c.id == deleted["id"]))
+    index = genres.get_genre_index(db)
+
+    after = (deleted["release_year"], deleted["title"], deleted["id"])
+    assert index.listing_page(index.resolve(["Drama"]), after, 0, 100) == drama[3:]
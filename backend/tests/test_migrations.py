@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import inspect, text
+
+import models
+from database import SessionLocal, engine
+from migrations import MODEL_INDEXES, run_migrations
+
+
+def add_user_and_movie():
+    with engine.begin() as conn:
+        conn.execute(models.Movie.__table__.insert().values(id=1, title="Film", genres="Drama"))
+        conn.execute(models.User.__table__.insert().values(id=1, username="user_1", email="user_1@example.com", hashed_password="!"))
+
+
+def use_older_schema(*statements):
+    """
+    Runs DDL that takes the schema back to an older version. Pooled connections that did not
+    run it keep SQLite's cached schema for DDL checks, so they are closed afterwards.
+    """
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+    engine.dispose()
+
+
+def test_ratings_get_a_timestamp_after_the_column_was_migrated(empty_db):
+    add_user_and_movie()
+    use_older_schema("ALTER TABLE ratings DROP COLUMN rated_at") # A database from before the column
+
+    run_migrations(engine)
+    with SessionLocal() as db:
+        db.add(models.Rating(user_id=1, movie_id=1, score=4.0))
+        db.commit()
+        assert db.query(models.Rating.rated_at).scalar() is not None
+
+
+def test_missing_rating_timestamps_are_backfilled(empty_db):
+    add_user_and_movie()
+    with engine.begin() as conn:
+        conn.execute(models.Rating.__table__.insert().values(user_id=1, movie_id=1, score=4.0, rated_at=None))
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM ratings WHERE rated_at IS NULL")).scalar() == 0
+
+
+def test_migrations_are_idempotent(empty_db, capsys):
+    run_migrations(engine)
+
+    assert "Migration applied" not in capsys.readouterr().out
+
+
+def index_names() -> set:
+    inspector = inspect(engine)
+    return {index["name"] for table in ("ratings", "watchlist_items", "movies") for index in inspector.get_indexes(table)}
+
+
+def test_missing_model_indexes_are_created(empty_db):
+    use_older_schema(*(f"DROP INDEX {name}" for name in MODEL_INDEXES + ["ix_movies_listing"])) # A database from before the indexes
+
+    run_migrations(engine)
+
+    assert set(MODEL_INDEXES) | {"ix_movies_listing"} <= index_names()
+
+
+@pytest.mark.parametrize("sql, index", [
+    ("SELECT movie_id FROM ratings WHERE user_id = 1 ORDER BY score DESC, id LIMIT 1", "ix_ratings_user_id_score"),
+    ("SELECT count(*), avg(score) FROM ratings WHERE movie_id = 1", "ix_ratings_movie_id"),
+    ("SELECT id FROM watchlist_items WHERE user_id = 1 ORDER BY added_at DESC", "ix_watchlist_items_user_id_added_at"),
+])
+def test_hot_queries_use_their_index(empty_db, sql, index):
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+    assert index in plan
+    assert "TEMP B-TREE" not in plan # No sort step
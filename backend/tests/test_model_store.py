@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pytest
+
+import ml_engine
+import model_store
+import models
+
+
+def arrays():
+    return {"factors": np.arange(12, dtype=np.float64).reshape(3, 4), "ids": np.array([7, 8, 9])}
+
+
+def test_saved_artifact_loads_back_with_its_metadata():
+    version = model_store.save_artifact("test", arrays(), {"ratings_count": 3})
+
+    loaded, manifest = model_store.load_artifact("test")
+
+    assert model_store.latest_version("test") == version
+    assert manifest["ratings_count"] == 3
+    assert np.array_equal(loaded["factors"], arrays()["factors"])
+    assert np.array_equal(loaded["ids"], arrays()["ids"])
+
+
+def test_missing_artifact_loads_as_none():
+    assert model_store.latest_version("test") is None
+    assert model_store.load_artifact("test") is None
+
+
+def test_corrupted_artifact_is_ignored():
+    version = model_store.save_artifact("test", arrays(), {})
+    with open(os.path.join(model_store.MODEL_ARTIFACT_DIR, "test", version, "ids.npy"), "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\xff")
+
+    assert model_store.load_artifact("test") is None
+
+
+def test_only_the_newest_versions_are_kept(monkeypatch):
+    monkeypatch.setattr(model_store, "MODEL_ARTIFACT_KEEP", 2)
+    versions = [model_store.save_artifact("test", arrays(), {}) for _ in range(4)]
+
+    kept = sorted(name for name in os.listdir(os.path.join(model_store.MODEL_ARTIFACT_DIR, "test")) if not name.startswith(".") and name != model_store.LATEST_FILE)
+
+    assert kept == versions[-2:]
+
+
+def test_exclusive_lock_is_held_by_one_holder_at_a_time():
+    with model_store.exclusive_lock("test") as first:
+        with model_store.exclusive_lock("test") as second:
+            assert first and not second
+    with model_store.exclusive_lock("test") as again:
+        assert again
+
+
+def test_fresh_collaborative_artifact_is_loaded_without_training(sample_db, db, monkeypatch):
+    ml_engine.load_or_train_collaborative_model(db)
+    saved_version = ml_engine.collab_model.artifact_version
+    ml_engine.collab_model = None # A restart
+
+    monkeypatch.setattr(ml_engine, "fit_collaborative_model", lambda db: pytest.fail("should not retrain"))
+    ml_engine.load_or_train_collaborative_model(db)
+
+    assert ml_engine.collab_model.artifact_version == saved_version
+
+
+class QueuedRetrains:
+    def __init__(self):
+        self.requests = 0
+
+    def request_retrain(self):
+        self.requests += 1
+
+
+def test_stale_collaborative_artifact_is_served_while_retraining_in_the_background(sample_db, db, monkeypatch):
+    ml_engine.load_or_train_collaborative_model(db)
+    saved_version = ml_engine.collab_model.artifact_version
+    ml_engine.collab_model = None # A restart after ratings were written
+    db.execute(models.Rating.__table__.delete().where(models.Rating.user_id == 1))
+    db.commit()
+    retrains = QueuedRetrains()
+    monkeypatch.setattr(ml_engine, "retrain_scheduler", retrains)
+    monkeypatch.setattr(ml_engine, "fit_collaborative_model", lambda db: pytest.fail("should not block startup on a fit"))
+
+    ml_engine.load_or_train_collaborative_model(db)
+
+    assert ml_engine.collab_model.artifact_version == saved_version
+    assert retrains.requests == 1
+
+
+def test_fresh_artifact_queues_no_retrain(sample_db, db, monkeypatch):
+    ml_engine.load_or_train_collaborative_model(db)
+    retrains = QueuedRetrains()
+    monkeypatch.setattr(ml_engine, "retrain_scheduler", retrains)
+
+    ml_engine.load_or_train_collaborative_model(db)
+
+    assert retrains.requests == 0
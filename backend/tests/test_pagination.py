@@ -0,0 +1,74 @@
+import base64
+
+import pytest
+
+import models
+import pagination
+from conftest import expected_order
+
+
+def walk_with_cursor(client, limit: int, **params) -> list:
+    ids, cursor = [], None
+    while True:
+        response = client.get("/movies/", params={**params, "limit": limit, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        ids.extend(movie["id"] for movie in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+
+
+def test_cursor_round_trips_the_sort_key():
+    for movie in (models.Movie(id=7, title="Heat", release_year=1995), models.Movie(id=8, title="Ünïcode", release_year=None)):
+        assert pagination.decode_cursor(pagination.encode_cursor(movie)) == (movie.release_year, movie.title, movie.id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"[1995]").decode(),
+    base64.urlsafe_b64encode(b'["1995","Heat",7]').decode(),
+    base64.urlsafe_b64encode(b'{"a":1}').decode(),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(pagination.InvalidCursor):
+        pagination.decode_cursor(cursor)
+
+
+def test_cursor_pages_match_the_full_listing(sample_db, client):
+    assert [movie["id"] for movie in client.get("/movies/").json()] == expected_order()
+    # Pages end inside a year, at the last dated movie and among the movies without a year
+    for limit in (1, 3, 7, 40):
+        assert walk_with_cursor(client, limit) == expected_order()
+
+
+def test_cursor_pages_match_skip_pages(sample_db, client):
+    skip_pages = []
+    for skip in range(0, 40, 6):
+        skip_pages.extend(movie["id"] for movie in client.get("/movies/", params={"skip": skip, "limit": 6}).json())
+
+    assert skip_pages == walk_with_cursor(client, 6) == expected_order()
+
+
+def test_cursor_pages_keep_the_genre_filter(sample_db, client):
+    assert walk_with_cursor(client, 4, genre="Sci-Fi") == expected_order("Sci-Fi")
+
+
+def test_last_page_has_no_cursor(sample_db, client):
+    response = client.get("/movies/", params={"limit": 50})
+
+    assert len(response.json()) == 40
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_invalid_cursor_is_a_bad_request(sample_db, client):
+    response = client.get("/movies/", params={"cursor": "garbage"})
+
+    assert response.status_code == 400
+
+
+def test_cursor_cannot_be_combined_with_search(sample_db, client):
+    cursor = client.get("/movies/", params={"limit": 2}).headers["X-Next-Cursor"]
+
+    response = client.get("/movies/", params={"cursor": cursor, "search": "star"})
+
+    assert response.status_code == 400
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import models
+import popularity
+from conftest import auth_headers, sample_movies
+from database import engine
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def load_ratings(ratings):
+    """Sample movies, users 1-10 and the given (user_id, movie_id, score, days_ago) ratings."""
+    with engine.begin() as conn:
+        conn.execute(models.Movie.__table__.insert(), sample_movies())
+        conn.execute(models.User.__table__.insert(), [
+            {"id": user_id, "username": f"user_{user_id}", "email": f"user_{user_id}@example.com", "hashed_password": "x"}
+            for user_id in range(1, 11)
+        ])
+        conn.execute(models.Rating.__table__.insert(), [
+            {"user_id": user_id, "movie_id": movie_id, "score": score, "rated_at": NOW - timedelta(days=days_ago)}
+            for user_id, movie_id, score, days_ago in ratings
+        ])
+
+
+@pytest.fixture
+def ranked_db(empty_db):
+    # Movie 1: a single perfect rating. Movie 2: many good ones. Movie 3: many mediocre ones.
+    ratings = [(1, 1, 5.0, 0)]
+    ratings += [(user_id, 2, 4.5, 0) for user_id in range(1, 11)]
+    ratings += [(user_id, 3, 3.0, 0) for user_id in range(1, 11)]
+    load_ratings(ratings)
+    return empty_db
+
+
+def test_scores_are_bayesian_averages(ranked_db, db):
+    index = popularity.build_popularity_index(db)
+
+    global_mean = (5.0 + 10 * 4.5 + 10 * 3.0) / 21
+    prior_votes = 21 / 3 # Mean count per movie
+    expected = {movie_id: (count * mean + prior_votes * global_mean) / (count + prior_votes)
+                for movie_id, count, mean in ((1, 1, 5.0), (2, 10, 4.5), (3, 10, 3.0))}
+    assert index.movie_ids.tolist() == [2, 1, 3] # One perfect rating does not beat many good ones
+    assert index.scores.tolist() == pytest.approx([expected[2], expected[1], expected[3]])
+    assert index.counts.tolist() == [10, 1, 10]
+
+
+def test_prior_votes_can_be_configured(ranked_db, db, monkeypatch):
+    monkeypatch.setattr(popularity, "POPULARITY_PRIOR_VOTES", "0")
+
+    index = popularity.build_popularity_index(db)
+
+    assert index.movie_ids.tolist() == [1, 2, 3] # Without a prior the plain mean wins
+    assert index.scores.tolist() == pytest.approx([5.0, 4.5, 3.0])
+
+
+def test_served_movies_skip_excluded_ids(ranked_db, db):
+    popularity.refresh_popularity_index(db)
+
+    assert [movie["id"] for movie in popularity.get_popular_movies(5)] == [2, 1, 3]
+    assert [movie["id"] for movie in popularity.get_popular_movies(5, exclude_ids={2})] == [1, 3]
+    assert [movie["id"] for movie in popularity.get_popular_movies(1, exclude_ids=[2])] == [1]
+    assert popularity.get_popular_movies(5)[0]["title"] == "Film Number 2"
+
+
+def test_recent_ratings_outweigh_old_ones_with_a_half_life(empty_db, db, monkeypatch):
+    # Movie 4 was loved a year ago; movie 5 is liked now
+    ratings = [(user_id, 4, 5.0, 365) for user_id in range(1, 11)]
+    ratings += [(user_id, 5, 4.0, 0) for user_id in range(1, 11)]
+    ratings += [(1, 6, 1.0, 0)]
+    load_ratings(ratings)
+
+    assert popularity.build_popularity_index(db).movie_ids.tolist()[:2] == [4, 5]
+
+    monkeypatch.setattr(popularity, "POPULARITY_HALF_LIFE_DAYS", 30.0)
+    index = popularity.build_popularity_index(db)
+
+    assert index.movie_ids.tolist()[:2] == [5, 4]
+    counts = dict(zip(index.movie_ids.tolist(), index.counts.tolist()))
+    assert counts[5] == pytest.approx(10.0)
+    assert counts[4] == pytest.approx(10 * 0.5 ** (365 / 30))
+
+
+def test_no_ratings_gives_an_empty_index(empty_db, db):
+    index = popularity.build_popularity_index(db)
+
+    assert index.movie_ids.size == 0 and index.top_movies == []
+
+
+def test_cold_start_users_get_popular_movies_they_have_not_rated(ranked_db, db, client):
+    popularity.refresh_popularity_index(db)
+
+    response = client.get("/recommendations/", headers=auth_headers(2)) # Rated movies 2 and 3
+
+    assert response.status_code == 200
+    assert [movie["id"] for movie in response.json()] == [1]
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import poster_fetcher
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.payload = payload or {}
+        self.headers = headers or {}
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+
+class FakeTMDB:
+    """Answers GET /movie/<id>; `scripted` lists the responses for an id before its normal one."""
+
+    def __init__(self, scripted=None):
+        self.scripted = {tmdb_id: list(responses) for tmdb_id, responses in (scripted or {}).items()}
+        self.requested = []
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        tmdb_id = int(url.rsplit("/", 1)[1])
+        with self._lock:
+            self.requested.append(tmdb_id)
+            scripted = self.scripted.get(tmdb_id)
+            if scripted:
+                response = scripted.pop(0)
+                if isinstance(response, Exception):
+                    raise response
+                return response
+        if tmdb_id >= 900:
+            return FakeResponse(404)
+        return FakeResponse(200, {"poster_path": f"/poster-{tmdb_id}.jpg"})
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    calls = []
+    monkeypatch.setattr(poster_fetcher.PosterFetcher, "_backoff", staticmethod(lambda attempt, retry_after=None: calls.append(retry_after)))
+    return calls
+
+
+def make_fetcher(tmp_path, tmdb, **kwargs):
+    fetcher = poster_fetcher.PosterFetcher(api_key="key", cache_path=str(tmp_path / "cache.json"), requests_per_second=1000, **kwargs)
+    fetcher.session.get = tmdb.get
+    return fetcher
+
+
+def test_fetch_many_looks_up_each_movie_once(tmp_path, backoffs):
+    tmdb = FakeTMDB()
+    fetcher = make_fetcher(tmp_path, tmdb)
+
+    posters = fetcher.fetch_many([1, 2, 2, 901, 3])
+
+    assert posters == {1: "/poster-1.jpg", 2: "/poster-2.jpg", 901: None, 3: "/poster-3.jpg"}
+    assert sorted(tmdb.requested) == [1, 2, 3, 901]
+
+
+def test_cached_lookups_skip_the_api_on_the_next_run(tmp_path, backoffs):
+    make_fetcher(tmp_path, FakeTMDB()).fetch_many([1, 901])
+    tmdb = FakeTMDB()
+    fetcher = make_fetcher(tmp_path, tmdb)
+
+    assert fetcher.fetch_many([1, 901, 2]) == {1: "/poster-1.jpg", 901: None, 2: "/poster-2.jpg"}
+    assert tmdb.requested == [2]
+    assert fetcher.cache_hits == 2
+
+
+def test_rate_limited_requests_are_retried_after_retry_after(tmp_path, backoffs):
+    tmdb = FakeTMDB({5: [FakeResponse(429, headers={"Retry-After": "2"}), FakeResponse(503)]})
+
+    assert make_fetcher(tmp_path, tmdb).fetch(5) == "/poster-5.jpg"
+    assert tmdb.requested == [5, 5, 5]
+    assert backoffs == ["2", None]
+
+
+def test_failed_lookups_are_not_cached(tmp_path, backoffs):
+    tmdb = FakeTMDB({7: [requests.ConnectionError("down")] * 3})
+    fetcher = make_fetcher(tmp_path, tmdb, max_retries=2)
+
+    assert fetcher.fetch(7) is None
+    assert "7" not in fetcher.cache
+    assert fetcher.fetch(7) == "/poster-7.jpg" # Retried on the next call
+
+
+def test_token_bucket_limits_the_request_rate():
+    bucket = poster_fetcher.TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+
+    for _ in range(6):
+        bucket.acquire()
+
+    assert time.monotonic() - start >= 5 / 50 * 0.9
@@ -0,0 +1,51 @@
+import asyncio
+
+import auth
+import database
+import main
+import ml_engine
+import popularity
+import rec_cache
+
+RECOMMENDATIONS_QUERY_BUDGET = 2 # The user lookup (auth) and the user's ratings
+
+
+def fetch_recommendations(user_id: int):
+    """GET /recommendations/ as FastAPI runs it (auth dependency, then the handler), in this context."""
+    async def request():
+        try:
+            async with database.AsyncSessionLocal() as db:
+                user = await auth.get_current_active_user(await auth.get_current_user(auth.create_access_token({"sub": str(user_id)}), db))
+                return await main.get_recommendations(db=db, current_user=user)
+        finally:
+            await database.async_engine.dispose() # Connections must not outlive this event loop
+    return asyncio.run(request())
+
+
+def warm_up(db):
+    ml_engine.load_or_train_collaborative_model(db)
+    ml_engine.get_content_index(db)
+    popularity.refresh_popularity_index(db)
+    fetch_recommendations(3)
+
+
+def test_recommendations_stay_within_the_query_budget(sample_db, db):
+    warm_up(db)
+    rec_cache.recommendation_cache.invalidate_all()
+
+    with database.track_queries() as counter:
+        recommendations = fetch_recommendations(3)
+
+    assert recommendations
+    assert rec_cache.recommendation_cache.hits == 0
+    assert 0 < counter.count <= RECOMMENDATIONS_QUERY_BUDGET
+
+
+def test_cached_recommendations_stay_within_the_query_budget(sample_db, db):
+    warm_up(db)
+
+    with database.track_queries() as counter:
+        fetch_recommendations(3)
+
+    assert rec_cache.recommendation_cache.hits == 1
+    assert 0 < counter.count <= RECOMMENDATIONS_QUERY_BUDGET
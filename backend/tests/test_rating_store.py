@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from surprise import Dataset, Reader
+
+from conftest import sample_ratings
+from rating_store import RatingStore, build_rating_store
+
+
+def sample_store():
+    user_ids, movie_ids, scores = (np.array(column) for column in zip(*sample_ratings()))
+    return build_rating_store(user_ids, movie_ids, scores), (user_ids, movie_ids, scores)
+
+
+def test_user_slices_hold_exactly_that_users_ratings():
+    store, (user_ids, movie_ids, scores) = sample_store()
+
+    for user_id in (1, 7, 30):
+        inner = store.inner_user_id(user_id)
+        mine = user_ids == user_id
+        assert store.raw_item_ids[store.user_items(inner)].tolist() == movie_ids[mine].tolist() # Input order kept
+        assert store.user_scores(inner).tolist() == scores[mine].astype(np.float32).tolist()
+
+
+def test_id_lookups_cover_unknown_and_out_of_range_ids():
+    store = build_rating_store(np.array([5, 5, 9]), np.array([20, 30, 20]), np.array([4.0, 3.0, 2.5]))
+
+    assert store.inner_user_id(9) == 1
+    assert store.inner_user_id(6) is None
+    assert store.inner_user_id(10_000) is None
+    assert store.inner_item_ids(np.array([30, 20, 25, 10_000, -1])).tolist() == [1, 0, -1, -1, -1]
+
+
+def test_negative_ids_are_rejected():
+    with pytest.raises(ValueError):
+        build_rating_store(np.array([-1]), np.array([1]), np.array([3.0]))
+
+
+def test_arrays_round_trip():
+    store, _ = sample_store()
+
+    copy = RatingStore.from_arrays(store.to_arrays())
+
+    for name, array in store.to_arrays().items():
+        assert np.array_equal(getattr(copy, name), array)
+
+
+def test_trainset_matches_the_one_surprise_builds():
+    store, (user_ids, movie_ids, scores) = sample_store()
+    frame = pd.DataFrame({"user": user_ids, "item": movie_ids, "score": scores})
+    expected = Dataset.load_from_df(frame, Reader(rating_scale=(0.5, 5.0))).build_full_trainset()
+
+    trainset = store.to_surprise_trainset((0.5, 5.0))
+
+    assert trainset.n_users == expected.n_users and trainset.n_items == expected.n_items
+    assert trainset.global_mean == pytest.approx(expected.global_mean)
+    for user_id in (1, 15, 30):
+        ours = sorted((trainset.to_raw_iid(i), r) for i, r in trainset.ur[trainset.to_inner_uid(user_id)])
+        theirs = sorted((expected.to_raw_iid(i), r) for i, r in expected.ur[expected.to_inner_uid(user_id)])
+        assert ours == theirs
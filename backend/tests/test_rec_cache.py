@@ -0,0 +1,90 @@
+import pytest
+
+import ml_engine
+import models
+import rec_cache
+from conftest import auth_headers
+from database import engine
+
+
+class PartialBackend(rec_cache.RecommendationCacheBackend):
+    def get(self, user_id):
+        return None
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        rec_cache.RecommendationCacheBackend()
+    with pytest.raises(TypeError):
+        PartialBackend()
+
+
+def test_entry_is_only_served_for_its_version():
+    cache = rec_cache.RecommendationCache()
+    version = ("model-a", "12-abc", "1-2")
+    cache.put(1, version, [{"id": 3}], compute_seconds=0.1)
+
+    assert cache.get(1, version) == [{"id": 3}]
+    assert cache.get(1, ("model-b", "12-abc", "1-2")) is None
+
+
+def test_entries_expire_on_the_wall_clock(monkeypatch):
+    cache = rec_cache.RecommendationCache(ttl_seconds=10)
+    now = [1000.0]
+    monkeypatch.setattr(rec_cache.time, "time", lambda: now[0])
+    version = ("model-a", "12-abc", "")
+    cache.put(1, version, [], compute_seconds=0.1)
+
+    now[0] += 11
+
+    assert cache.get(1, version) is None
+
+
+def test_shared_backend_never_mixes_up_models_of_different_processes():
+    shared = rec_cache.LRUCacheBackend(max_entries=10)
+    worker_a = rec_cache.RecommendationCache(backend=shared)
+    worker_b = rec_cache.RecommendationCache(backend=shared)
+    worker_a.put(1, ("artifact-1", "12-abc", ""), ["from a"], compute_seconds=0.1)
+
+    assert worker_b.get(1, ("artifact-1", "12-abc", "")) == ["from a"]
+    assert worker_b.get(1, ("artifact-2", "12-abc", "")) is None
+
+
+def test_rating_stamp_follows_the_ratings_not_their_order():
+    ratings = ml_engine.UserRatings(movie_ids=[4, 2, 9], scores=[5.0, 4.0, 4.0])
+    reordered = ml_engine.UserRatings(movie_ids=[4, 9, 2], scores=[5.0, 4.0, 4.0])
+    rerated = ml_engine.UserRatings(movie_ids=[4, 2, 9], scores=[5.0, 4.0, 3.5])
+
+    assert ratings.stamp == reordered.stamp
+    assert ratings.stamp != rerated.stamp
+
+
+def test_model_cache_key_is_the_artifact_version(sample_db, db):
+    assert ml_engine.model_cache_key() == "none"
+
+    ml_engine.load_or_train_collaborative_model(db) # Trains, saves and maps the artifact
+
+    assert ml_engine.collab_model.artifact_version is not None
+    assert ml_engine.model_cache_key() == ml_engine.collab_model.artifact_version
+
+
+def test_recommendations_are_served_from_the_cache(sample_db, client):
+    first = client.get("/recommendations/", headers=auth_headers(3))
+    second = client.get("/recommendations/", headers=auth_headers(3))
+
+    assert first.status_code == 200
+    assert second.json() == first.json()
+    assert rec_cache.recommendation_cache.hits == 1
+
+
+def test_rating_written_by_another_worker_misses_the_cache(sample_db, client):
+    first = client.get("/recommendations/", headers=auth_headers(3)).json()
+    recommended_id = first[0]["id"]
+
+    # Written straight to the database: this process is never told about it
+    with engine.begin() as conn:
+        conn.execute(models.Rating.__table__.insert().values(user_id=3, movie_id=recommended_id, score=5.0))
+    second = client.get("/recommendations/", headers=auth_headers(3)).json()
+
+    assert rec_cache.recommendation_cache.hits == 0
+    assert recommended_id not in [movie["id"] for movie in second]
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import ml_engine
+import rec_cache
+
+
+class RecordingScheduler(ml_engine.RetrainScheduler):
+    """Records when training would start instead of spawning the training process."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = []
+        self.trained = threading.Event()
+
+    def _train_once(self):
+        self.started.append(time.monotonic())
+        self.trained.set()
+
+
+def wait_until_idle(scheduler, seconds=0.5):
+    time.sleep(seconds)
+    scheduler.shutdown()
+    scheduler._thread.join(timeout=5)
+
+
+def test_burst_of_requests_trains_once():
+    scheduler = RecordingScheduler(debounce_seconds=0.1, min_interval_seconds=0)
+    first_request = time.monotonic()
+    for _ in range(20):
+        scheduler.request_retrain()
+
+    assert scheduler.trained.wait(timeout=5)
+    wait_until_idle(scheduler)
+
+    assert len(scheduler.started) == 1
+    assert scheduler.started[0] - first_request >= 0.1 # Waited out the debounce period
+
+
+def test_trainings_are_spaced_by_the_minimum_interval():
+    scheduler = RecordingScheduler(debounce_seconds=0.01, min_interval_seconds=0.3)
+    scheduler.request_retrain()
+    assert scheduler.trained.wait(timeout=5)
+    scheduler.request_retrain()
+
+    wait_until_idle(scheduler, seconds=0.6)
+
+    assert len(scheduler.started) == 2
+    assert scheduler.started[1] - scheduler.started[0] >= 0.3
+
+
+def test_requests_after_shutdown_are_ignored():
+    scheduler = RecordingScheduler(debounce_seconds=0.01, min_interval_seconds=0)
+    scheduler.shutdown()
+
+    scheduler.request_retrain()
+
+    assert scheduler._thread is None
+    assert scheduler.started == []
+
+
+def test_publishing_swaps_the_model_and_clears_the_cache(sample_db, db):
+    ml_engine.load_or_train_collaborative_model(db)
+    previous, previous_version = ml_engine.collab_model, ml_engine.model_version
+    rec_cache.recommendation_cache.put(1, ("key", "stamp", ""), ["old"], compute_seconds=0.1)
+
+    ml_engine.publish_collaborative_model(ml_engine.load_collaborative_artifact())
+
+    assert ml_engine.collab_model is not previous
+    assert ml_engine.model_version == previous_version + 1
+    assert rec_cache.recommendation_cache.stats()["entries"] == 0
+
+
+def test_training_process_publishes_a_new_artifact(sample_db, db):
+    ml_engine.load_or_train_collaborative_model(db)
+    previous = ml_engine.collab_model
+    scheduler = ml_engine.RetrainScheduler(debounce_seconds=60, min_interval_seconds=0) # Trained by hand below
+    try:
+        scheduler.request_retrain()
+        scheduler._train_once()
+    finally:
+        scheduler.shutdown()
+
+    assert ml_engine.collab_model is not previous
+    assert ml_engine.collab_model.artifact_version != previous.artifact_version
+    assert ml_engine.collab_model.ratings_count == previous.ratings_count
+
+
+def test_retrain_is_skipped_when_another_worker_published_a_newer_model(sample_db, db):
+    scheduler = ml_engine.RetrainScheduler(debounce_seconds=60, min_interval_seconds=0)
+    try:
+        scheduler.request_retrain()
+        ml_engine.load_or_train_collaborative_model(db) # Another worker trains after the request
+        published = ml_engine.collab_model
+
+        scheduler._train_once()
+
+        assert scheduler._executor is None # No training process was started
+        assert ml_engine.collab_model is published
+    finally:
+        scheduler.shutdown()
+
+
+def test_published_model_of_this_worker_is_mapped_by_the_others(sample_db, db):
+    scheduler = ml_engine.RetrainScheduler(debounce_seconds=60, min_interval_seconds=0)
+    try:
+        scheduler.request_retrain()
+        ml_engine.load_or_train_collaborative_model(db)
+        published_version = ml_engine.collab_model.artifact_version
+        ml_engine.collab_model = None # A worker that has not mapped it yet
+
+        scheduler._train_once()
+
+        assert scheduler._executor is None
+        assert ml_engine.collab_model.artifact_version == published_version
+    finally:
+        scheduler.shutdown()
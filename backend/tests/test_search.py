@@ -0,0 +1,76 @@
+import pytest
+
+import genres
+import search
+from database import engine
+
+STAR_MOVIE_IDS = {5, 10, 15, 20, 25, 30, 35, 40} # "Star Movie {id}" in the sample catalog
+
+
+@pytest.fixture(params=["fts5", "memory"])
+def backend(request, sample_db):
+    search._backends[str(engine.url)] = request.param
+    return request.param
+
+
+def all_pages(db, query, page_size, genre_ids=()):
+    pages, offset = [], 0
+    while True:
+        page = search.search_movies(db, query, offset, page_size, genre_ids)
+        if not page.movie_ids:
+            return pages, page.total
+        pages.append(page.movie_ids)
+        offset += page_size
+
+
+def test_pages_cover_every_match_once(backend, db):
+    pages, total = all_pages(db, "star", 3)
+
+    assert [len(page) for page in pages] == [3, 3, 2]
+    assert total == 8
+    assert set(sum(pages, [])) == STAR_MOVIE_IDS
+    assert sum(pages, []) == search.search_movies(db, "star", 0, 8).movie_ids
+
+
+def test_page_past_the_end_still_reports_the_total(backend, db):
+    page = search.search_movies(db, "star", 100, 10)
+
+    assert page.movie_ids == []
+    assert page.total == 8
+
+
+def test_no_match_has_a_zero_total(backend, db):
+    assert search.search_movies(db, "nothing", 0, 10).total == 0
+    assert search.search_movies(db, "nothing", 10, 10).total == 0
+
+
+def test_genre_filter_is_applied_before_paging(backend, db):
+    genre_ids = genres.get_genre_index(db).resolve(["Sci-Fi"])
+    expected = genres.get_genre_index(db).filter(search.search_movies(db, "star", 0, 8).movie_ids, ["Sci-Fi"])
+
+    pages, total = all_pages(db, "star", 1, genre_ids)
+
+    assert sorted(expected) == [10, 20, 40]
+    assert sum(pages, []) == expected
+    assert total == 3
+
+
+def test_search_pages_past_the_page_size_cap(backend, client, monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_MAX_RESULTS", 3)
+
+    response = client.get("/movies/", params={"search": "star", "skip": 6, "limit": 3})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert response.headers["X-Total-Count"] == "8"
+
+
+def test_query_without_words_matches_nothing(backend, db, client):
+    assert search.search_movies(db, "!!!") == search.SearchPage([], 0)
+
+    response = client.get("/movies/", params={"search": "!!!", "limit": 5})
+
+    assert response.status_code == 200
+    assert response.json() == []
+    assert response.headers["X-Total-Count"] == "0"
+    assert "X-Next-Cursor" not in response.headers
@@ -0,0 +1,266 @@
+import json
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, select, text
+
+import auth
+import models
+import seed
+from conftest import reset_database
+from database import engine
+
+
+@pytest.fixture
+def csv_files(tmp_path, monkeypatch):
+    """Small MovieLens-style CSV files, read by seed.py in chunks of 10 ratings."""
+    movies = tmp_path / "movies.csv"
+    movies.write_text(
+        "movieId,title,genres\n"
+        "1,Toy Story (1995),Adventure|Animation|Children\n"
+        "2,Jumanji (1995),Adventure|Children|Fantasy\n"
+        "3,Heat (1995),Action|Crime|Thriller\n"
+        "4,Untitled Project,(no genres listed)\n"
+    )
+    links = tmp_path / "links.csv"
+    links.write_text("movieId,imdbId,tmdbId\n1,114709,862\n2,113497,8844\n3,113277,949\n4,1,\n")
+    ratings = tmp_path / "ratings.csv"
+    lines = ["userId,movieId,rating,timestamp"]
+    for user_id in range(1, 9):
+        for movie_id in (1, 2, 3):
+            lines.append(f"{user_id},{movie_id},{(user_id + movie_id) % 5 + 1}.0,{964982703 + user_id * 10 + movie_id}")
+    ratings.write_text("\n".join(lines) + "\n")
+
+    monkeypatch.setattr(seed, "MOVIES_CSV", str(movies))
+    monkeypatch.setattr(seed, "LINKS_CSV", str(links))
+    monkeypatch.setattr(seed, "RATINGS_CSV", str(ratings))
+    monkeypatch.setattr(seed, "SEED_RATINGS_CHUNK_SIZE", 10)
+    monkeypatch.setattr(seed, "TMDB_API_KEY", None)
+    monkeypatch.setattr(seed, "SEED_USER_PASSWORD_MODE", "disabled")
+    return tmp_path
+
+
+def table_counts() -> dict:
+    with engine.connect() as conn:
+        return {
+            name: conn.execute(select(func.count()).select_from(table)).scalar()
+            for name, table in (("movies", models.Movie.__table__), ("users", models.User.__table__), ("ratings", models.Rating.__table__))
+        }
+
+
+def stored_checkpoint():
+    table = models.SeedCheckpoint.__table__
+    with engine.connect() as conn:
+        state = conn.execute(select(table.c.state).where(table.c.name == seed.SEED_CHECKPOINT_NAME)).scalar()
+    return json.loads(state) if state is not None else None
+
+
+def test_incremental_import_loads_everything_and_completes(empty_db, csv_files):
+    seed.seed_database_incremental()
+
+    assert table_counts() == {"movies": 4, "users": 8, "ratings": 24}
+    checkpoint = stored_checkpoint()
+    assert checkpoint["completed"]
+    assert checkpoint["stages_done"] == ["movies", "users", "ratings"]
+    assert checkpoint["database_state"] == {"movies": [4, 4], "ratings": [24, 24]}
+
+
+def test_completed_import_with_unchanged_csvs_is_skipped(empty_db, csv_files, capsys):
+    seed.seed_database_incremental()
+    capsys.readouterr()
+
+    seed.seed_database_incremental()
+
+    assert "nothing to do" in capsys.readouterr().out
+    assert table_counts() == {"movies": 4, "users": 8, "ratings": 24}
+
+
+def test_recreated_database_is_seeded_again(empty_db, csv_files):
+    seed.seed_database_incremental()
+
+    reset_database() # Dropping the database drops its checkpoint with it
+    seed.seed_database_incremental()
+
+    assert table_counts() == {"movies": 4, "users": 8, "ratings": 24}
+
+
+def test_completed_checkpoint_is_ignored_when_the_data_is_gone(empty_db, csv_files):
+    seed.seed_database_incremental()
+    with engine.begin() as conn:
+        for table in ("ratings", "movie_genres", "movies"):
+            conn.execute(text(f"DELETE FROM {table}"))
+
+    seed.seed_database_incremental()
+
+    assert table_counts() == {"movies": 4, "users": 8, "ratings": 24}
+
+
+def test_completed_checkpoint_survives_new_ratings_from_the_api(empty_db, csv_files, capsys):
+    seed.seed_database_incremental()
+    with engine.begin() as conn:
+        conn.execute(models.Rating.__table__.insert().values(user_id=1, movie_id=4, score=3.0))
+    capsys.readouterr()
+
+    seed.seed_database_incremental()
+
+    assert "nothing to do" in capsys.readouterr().out
+
+
+def test_interrupted_ratings_import_resumes_after_the_last_chunk(empty_db, csv_files, monkeypatch):
+    real_upsert = seed.upsert_ratings
+    calls = []
+    fail_on_call = [2]
+
+    def failing_upsert(engine, rows):
+        calls.append(len(rows))
+        if len(calls) in fail_on_call:
+            fail_on_call.clear()
+            raise RuntimeError("connection lost")
+        return real_upsert(engine, rows)
+
+    monkeypatch.setattr(seed, "upsert_ratings", failing_upsert)
+    with pytest.raises(RuntimeError):
+        seed.seed_database_incremental()
+    checkpoint = stored_checkpoint()
+    assert not checkpoint["completed"]
+    assert checkpoint["stages_done"] == ["movies", "users"]
+    assert checkpoint["ratings_rows_done"] == 10
+
+    calls.clear()
+    seed.seed_database_incremental()
+
+    assert calls == [10, 4] # The first chunk is not read again
+    assert table_counts()["ratings"] == 24
+    assert stored_checkpoint()["completed"]
+
+
+def test_changed_csv_is_applied_as_a_delta(empty_db, csv_files):
+    seed.seed_database_incremental()
+    ratings = csv_files / "ratings.csv"
+    ratings.write_text(ratings.read_text().replace("1,1,3.0,", "1,1,0.5,") + "9,4,4.5,964990000\n")
+
+    seed.seed_database_incremental()
+
+    assert table_counts() == {"movies": 4, "users": 9, "ratings": 25}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT score FROM ratings WHERE user_id = 1 AND movie_id = 1")).scalar() == 0.5
+
+
+def test_full_seed_resets_the_incremental_checkpoint(empty_db, csv_files, monkeypatch):
+    seed.seed_database_incremental()
+    assert stored_checkpoint()["completed"]
+
+    monkeypatch.setattr(seed, "TMDB_API_KEY", "test-key")
+    monkeypatch.setattr(seed, "fetch_poster_paths", lambda movie_ids, links: [None] * len(movie_ids))
+    seed.seed_database()
+
+    assert stored_checkpoint() is None
+    assert table_counts() == {"movies": 4, "users": 8, "ratings": 24}
+
+
+def test_disabled_seed_accounts_cannot_log_in(empty_db, csv_files, client):
+    seed.seed_database_incremental()
+
+    response = client.post("/token", data={"username": "user_1@example.com", "password": "password123"})
+
+    assert response.status_code == 401
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT DISTINCT hashed_password FROM users")).scalars().all() == [auth.LOGIN_DISABLED_HASH]
+
+
+def test_titles_are_split_into_title_and_year():
+    titles, years = seed.parse_titles(pd.Series(["Toy Story (1995)", "Show (2007-)", "  Untitled  ", None]))
+
+    assert titles.tolist() == ["Toy Story", "Show", "Untitled", ""]
+    assert years.tolist()[:1] == [1995]
+    assert years.isna().tolist() == [False, True, True, True]
+
+
+def test_movie_rows_are_validated_in_one_pass():
+    movies = pd.DataFrame({
+        "movieId": ["1", "x", "2", "2", "3"],
+        "title": ["Heat (1995)", "Bad Id (1990)", "Jumanji (1995)", "Duplicate (1999)", " "],
+        "genres": ["Action|Crime", "Drama", None, "Comedy", "Drama"],
+    })
+
+    rows = seed.prepare_movie_rows(movies)
+
+    assert rows["id"].tolist() == [1, 2]
+    assert rows["title"].tolist() == ["Heat", "Jumanji"]
+    assert rows["genres"].tolist() == ["Action|Crime", "N/A"]
+
+
+def test_bulk_insert_writes_every_batch_and_stores_nulls(empty_db, monkeypatch):
+    monkeypatch.setattr(seed, "BULK_INSERT_BATCH_SIZE", 3)
+    rows = seed.prepare_movie_rows(pd.DataFrame({
+        "movieId": list(range(1, 8)),
+        "title": [f"Film {movie_id}" + (" (2001)" if movie_id % 2 else "") for movie_id in range(1, 8)],
+        "genres": ["Drama"] * 7,
+    }))
+
+    assert seed.bulk_insert(engine, models.Movie.__table__, rows, stage="movies") == 7
+
+    with engine.connect() as conn:
+        years = dict(conn.execute(text("SELECT id, release_year FROM movies")).all())
+    assert years == {movie_id: 2001 if movie_id % 2 else None for movie_id in range(1, 8)}
+
+
+def test_full_seed_upserts_pairs_repeated_across_chunks(empty_db, csv_files, monkeypatch):
+    ratings = csv_files / "ratings.csv"
+    ratings.write_text(ratings.read_text() + "1,1,0.5,964990000\n") # Repeats (1, 1) in the last chunk
+    monkeypatch.setattr(seed, "TMDB_API_KEY", "test-key")
+    monkeypatch.setattr(seed, "fetch_poster_paths", lambda movie_ids, links: [None] * len(movie_ids))
+
+    seed.seed_database()
+
+    assert table_counts() == {"movies": 4, "users": 8, "ratings": 24}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT score FROM ratings WHERE user_id = 1 AND movie_id = 1")).scalar() == 0.5
+
+
+def test_shared_mode_hashes_the_seed_password_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(seed, "SEED_USER_PASSWORD_MODE", "shared")
+    monkeypatch.setattr(seed, "_seed_password_hash", None)
+    monkeypatch.setattr(seed, "get_password_hash", lambda password: calls.append(password) or auth.get_password_hash(password))
+
+    first = seed.build_user_rows([1, 2, 3])
+    second = seed.build_user_rows([4, 5])
+
+    assert calls == [seed.SEED_USER_PASSWORD]
+    assert set(first["hashed_password"]) | set(second["hashed_password"]) == {seed.seed_password_hash()}
+    assert auth.verify_password(seed.SEED_USER_PASSWORD, first["hashed_password"][0])
+    assert first["email"].tolist() == ["user_1@example.com", "user_2@example.com", "user_3@example.com"]
+
+
+def test_ratings_are_read_in_compact_chunks(csv_files):
+    chunks = list(seed.read_rating_chunks())
+
+    assert [len(chunk) for chunk in chunks] == [10, 10, 4]
+    assert chunks[0].dtypes.astype(str).to_dict() == seed.RATINGS_DTYPES
+
+
+def test_rating_chunks_are_validated():
+    chunk = pd.DataFrame({
+        "userId": [1, 1, 2, 3, 1],
+        "movieId": [10, 11, 10, 10, 10],
+        "rating": [4.0, 3.0, 9.0, 2.0, 1.5],
+        "timestamp": [0, 60, 0, 0, 120],
+    })
+
+    rows = seed.clean_rating_chunk(chunk, movie_ids=[10, 11], user_ids={1, 2})
+
+    assert rows[["user_id", "movie_id", "score"]].values.tolist() == [[1, 11, 3.0], [1, 10, 1.5]] # Last repeat wins
+    assert rows["rated_at"].tolist() == [pd.Timestamp(60, unit="s", tz="UTC"), pd.Timestamp(120, unit="s", tz="UTC")]
+
+
+def test_full_seed_reports_every_stage(empty_db, csv_files, monkeypatch, capsys):
+    monkeypatch.setattr(seed, "TMDB_API_KEY", "test-key")
+    monkeypatch.setattr(seed, "fetch_poster_paths", lambda movie_ids, links: [None] * len(movie_ids))
+
+    seed.seed_database()
+
+    output = capsys.readouterr().out
+    assert output.count("Processed ") == 3 # One progress line per chunk
+    for stage in ("movies", "users", "ratings"):
+        assert f"[{stage}] Inserted" in output and "peak memory" in output
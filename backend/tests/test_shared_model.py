@@ -0,0 +1,46 @@
+import time
+
+import numpy as np
+
+import ml_engine
+import model_store
+
+
+def test_memory_mapped_arrays_are_read_only_views_of_the_files():
+    model_store.save_artifact("test", {"factors": np.ones((4, 2))}, {})
+
+    loaded, _ = model_store.load_artifact("test", mmap=True)
+
+    assert isinstance(loaded["factors"], np.memmap)
+    assert not loaded["factors"].flags.writeable
+
+
+def test_published_model_serves_from_the_shared_mapping(sample_db, db):
+    ml_engine.load_or_train_collaborative_model(db)
+    model = ml_engine.collab_model
+
+    for array in (model.user_factors, model.item_factors, model.ratings.item_index, model.ratings.scores):
+        assert isinstance(array, np.memmap)
+
+
+def test_worker_maps_a_version_published_by_another_worker(sample_db, db, monkeypatch):
+    ml_engine.load_or_train_collaborative_model(db)
+    previous = ml_engine.collab_model
+    other_worker_version = ml_engine.save_collaborative_artifact(previous) # Only LATEST changes for this process
+
+    monkeypatch.setattr(ml_engine, "_last_reload_check", 0.0)
+    ml_engine.maybe_reload_collaborative_model()
+
+    assert ml_engine.collab_model is not previous
+    assert ml_engine.collab_model.artifact_version == other_worker_version
+
+
+def test_reload_check_is_rate_limited(sample_db, db, monkeypatch):
+    ml_engine.load_or_train_collaborative_model(db)
+    previous = ml_engine.collab_model
+    ml_engine.save_collaborative_artifact(previous)
+
+    monkeypatch.setattr(ml_engine, "_last_reload_check", time.monotonic())
+    ml_engine.maybe_reload_collaborative_model()
+
+    assert ml_engine.collab_model is previous
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+import ml_engine
+from conftest import join_background_threads
+
+
+def random_tfidf(n_movies=30, n_terms=12, seed=1):
+    rng = np.random.default_rng(seed)
+    dense = rng.random((n_movies, n_terms)) * (rng.random((n_movies, n_terms)) < 0.4)
+    norms = np.linalg.norm(dense, axis=1, keepdims=True)
+    return sparse.csr_matrix(np.divide(dense, norms, out=np.zeros_like(dense), where=norms > 0))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 512])
+def test_table_matches_brute_force_for_any_chunk_size(chunk_size):
+    matrix = random_tfidf()
+    similarity = (matrix @ matrix.T).toarray()
+    np.fill_diagonal(similarity, -1.0)
+
+    rows, scores = ml_engine.compute_similarity_table(matrix, top_k=5, chunk_size=chunk_size)
+
+    for movie_row in range(matrix.shape[0]):
+        expected = ml_engine._top_n_indices(similarity[movie_row], 5)
+        assert rows[movie_row].tolist() == expected.tolist()
+        assert np.allclose(scores[movie_row], similarity[movie_row, expected])
+        assert movie_row not in rows[movie_row]
+
+
+def test_top_k_is_capped_by_the_catalog_size():
+    rows, _ = ml_engine.compute_similarity_table(random_tfidf(n_movies=4), top_k=50)
+    assert rows.shape == (4, 3)
+
+
+def test_top_n_breaks_ties_by_lower_index():
+    scores = np.array([0.5, 0.9, 0.5, 0.1, 0.5])
+    assert ml_engine._top_n_indices(scores, 3).tolist() == [1, 0, 2]
+    assert ml_engine._top_n_indices(scores, 0).tolist() == []
+
+
+def test_table_lookup_matches_single_row_scoring(sample_db, db):
+    index = ml_engine.get_content_index(db)
+    join_background_threads("similarity-table")
+    with_table = ml_engine.content_index
+    assert with_table.neighbor_rows is not None
+
+    for movie_id in (1, 10, 26):
+        assert ml_engine._content_neighbors(with_table, movie_id, 8) == ml_engine._content_neighbors(index, movie_id, 8)
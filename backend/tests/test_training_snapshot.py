@@ -0,0 +1,42 @@
+import numpy as np
+
+import database
+import ml_engine
+import training_snapshot
+from conftest import sample_ratings
+
+
+def test_snapshot_round_trips_every_rating(sample_db, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(training_snapshot, "SNAPSHOT_FETCH_SIZE", 7) # Several fetchmany() blocks
+    path = str(tmp_path / "training" / "ratings.npz")
+
+    assert training_snapshot.export_ratings_snapshot(db, path) == path
+    user_ids, movie_ids, scores = training_snapshot.load_ratings_snapshot(path)
+
+    assert (user_ids.dtype, movie_ids.dtype, scores.dtype) == (np.int32, np.int32, np.float32)
+    exported = sorted(zip(user_ids.tolist(), movie_ids.tolist(), scores.tolist()))
+    assert exported == sorted(sample_ratings())
+    assert not list(tmp_path.glob("training/*.tmp*"))
+
+
+def test_export_runs_through_the_query_counter(sample_db, db, tmp_path):
+    with database.track_queries() as counter:
+        training_snapshot.export_ratings_snapshot(db, str(tmp_path / "ratings.npz"))
+
+    assert counter.count == 1
+
+
+def test_empty_ratings_table_exports_nothing(empty_db, db, tmp_path):
+    path = str(tmp_path / "ratings.npz")
+
+    assert training_snapshot.export_ratings_snapshot(db, path) is None
+    assert not (tmp_path / "ratings.npz").exists()
+
+
+def test_model_is_trained_from_the_snapshot(sample_db, db):
+    model = ml_engine.fit_collaborative_model(db)
+
+    user_ids, movie_ids, _ = training_snapshot.load_ratings_snapshot(training_snapshot.TRAINING_SNAPSHOT_PATH)
+    assert model.ratings_count == len(sample_ratings())
+    assert sorted(model.raw_item_ids.tolist()) == sorted(set(movie_ids.tolist()))
+    assert sorted(model.ratings.raw_user_ids.tolist()) == sorted(set(user_ids.tolist()))
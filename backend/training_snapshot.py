@@ -0,0 +1,83 @@
+import os
+import time
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Iterator, Optional, Tuple
+import models
+import model_store
+
+# --- Configuration ---
+# Training data export: the ratings table is streamed out with a three-column
+# Core select (no ORM objects) into a columnar .npz snapshot, which the trainer
+# then loads as plain arrays. On PostgreSQL the rows come from a named server-side
+# cursor, skipping Row construction; other backends stream the SQLAlchemy result.
+# The snapshot is rewritten before every training run.
+TRAINING_SNAPSHOT_PATH = os.getenv("TRAINING_SNAPSHOT_PATH", os.path.join(model_store.MODEL_ARTIFACT_DIR, "training", "ratings.npz"))
+SNAPSHOT_FETCH_SIZE = int(os.getenv("SNAPSHOT_FETCH_SIZE", "50000")) # Rows per fetchmany() block
+
+SNAPSHOT_ROW_DTYPE = np.dtype([("user_id", np.int32), ("movie_id", np.int32), ("score", np.float32)])
+RatingColumns = Tuple[np.ndarray, np.ndarray, np.ndarray] # (user_ids int32, movie_ids int32, scores float32)
+
+
+def _postgres_blocks(db: Session, statement) -> Iterator[list]:
+    """Row blocks from a named (server-side) DB-API cursor: nothing is buffered client-side and no Row objects are built."""
+    cursor = db.connection().connection.dbapi_connection.cursor(name="ratings_snapshot")
+    try:
+        cursor.execute(str(statement.compile(dialect=db.get_bind().dialect)))
+        while True:
+            rows = cursor.fetchmany(SNAPSHOT_FETCH_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def _streamed_blocks(db: Session, statement) -> Iterator[list]:
+    """Row blocks from a streamed SQLAlchemy result (other backends)."""
+    result = db.connection().execution_options(stream_results=True, yield_per=SNAPSHOT_FETCH_SIZE).execute(statement)
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+
+def _read_rating_columns(db: Session) -> RatingColumns:
+    """Streams (user_id, movie_id, score) out of the ratings table in blocks of SNAPSHOT_FETCH_SIZE rows."""
+    statement = select(models.Rating.user_id, models.Rating.movie_id, models.Rating.score)
+    if db.get_bind().dialect.name == "postgresql":
+        blocks = _postgres_blocks(db, statement)
+    else:
+        blocks = _streamed_blocks(db, statement)
+    user_parts, movie_parts, score_parts = [], [], []
+    for rows in blocks:
+        block = np.fromiter(rows, dtype=SNAPSHOT_ROW_DTYPE, count=len(rows))
+        user_parts.append(block["user_id"])
+        movie_parts.append(block["movie_id"])
+        score_parts.append(block["score"])
+    if not user_parts:
+        return np.empty(0, np.int32), np.empty(0, np.int32), np.empty(0, np.float32)
+    return np.concatenate(user_parts), np.concatenate(movie_parts), np.concatenate(score_parts)
+
+
+def export_ratings_snapshot(db: Session, path: str = TRAINING_SNAPSHOT_PATH) -> Optional[str]:
+    """
+    Writes all ratings to a columnar .npz snapshot (temp file + rename).
+    Returns the snapshot path, or None if the table is empty.
+    """
+    start_time = time.time()
+    user_ids, movie_ids, scores = _read_rating_columns(db)
+    if scores.size == 0:
+        return None
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, user_ids=user_ids, movie_ids=movie_ids, scores=scores)
+    os.replace(tmp_path, path)
+    print(f"Training snapshot: Exported {scores.size} ratings in {time.time() - start_time:.2f} seconds.") # Keep essential status messages
+    return path
+
+
+def load_ratings_snapshot(path: str = TRAINING_SNAPSHOT_PATH) -> RatingColumns:
+    """Loads the (user_ids, movie_ids, scores) columns of a snapshot."""
+    with np.load(path, allow_pickle=False) as snapshot:
+        return snapshot["user_ids"], snapshot["movie_ids"], snapshot["scores"]